@@ -0,0 +1,276 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, List, Any, Optional
+
+# 流水分析中需要分组统计的键列
+AGGREGATE_KEYS = ['对方户名', '交易类型', '交易渠道', '核心交易日期', '交易小时']
+
+# 需要额外计算最大/最小交易金额的键列
+EXTREMA_KEYS = {'对方户名'}
+
+# 取值范围固定的整数键列，直接作为bincount的下标，无需因子化
+FIXED_RANGE_KEYS = {'交易小时': 24}
+
+# 需要按首次出现顺序记录去重取值的列（合并多批数据时按顺序求并集）
+DISTINCT_COLUMNS = {'对方户名': ['对方账号', '对方行名']}
+
+# 可直接相加的聚合数组；max/min分别取较大/较小值
+SUM_ARRAYS = ['count', 'sum', 'income', 'expense', 'income_count', 'expense_count',
+              'income_amount_count', 'expense_amount_count']
+
+# 以分为单位累加的金额数组，状态中保持为int64，只在生成分析表时换算为元
+CENT_WEIGHTS = {'sum', 'income', 'expense'}
+
+# 金额分布图使用的金额样本上限：超过时保留等概率的随机样本，累计状态的大小与历史行数无关
+AMOUNT_SAMPLE_SIZE = 50000
+
+def to_cents(amount: pd.Series) -> pd.Series:
+    """
+    将以元为单位的金额转换为以分为单位的Int64（缺失值保留为NA），保证求和精确
+    """
+    values = pd.to_numeric(amount, errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(values)
+    cents = np.round(np.where(missing, 0.0, values) * 100).astype(np.int64)
+    return pd.Series(pd.arrays.IntegerArray(cents, missing), index=amount.index)
+
+def amount_arrays(df: pd.DataFrame) -> tuple:
+    """
+    返回以分为单位的带符号金额（int64，缺失为0）和金额是否有效的掩码
+    """
+    cents = df['交易金额_分']
+    signed = cents.to_numpy(dtype=np.int64, na_value=0) * df['借贷方向'].to_numpy(dtype=np.int64)
+    return signed, cents.notna().to_numpy()
+
+def signed_amounts(df: pd.DataFrame) -> np.ndarray:
+    """
+    带符号的交易金额（元，贷为正，缺失为NaN），用于绘图
+    """
+    signed, has_amount = amount_arrays(df)
+    return np.where(has_amount, signed / 100, np.nan)
+
+def sample_amounts(amounts: np.ndarray, size: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    金额的可合并样本：不超过size个时全部保留，否则等概率抽取size个（保持原有顺序）
+    population 为样本代表的总行数，合并时按行数加权
+    """
+    size = AMOUNT_SAMPLE_SIZE if size is None else size
+    population = len(amounts)
+    values = np.asarray(amounts, dtype=np.float64)
+    if population > size:
+        values = values[np.sort(np.random.default_rng(seed).choice(population, size, replace=False))]
+    return {'values': values, 'population': population}
+
+def merge_amount_samples(left: Dict[str, Any], right: Dict[str, Any],
+                         size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    合并两份金额样本，结果仍是合并后全部行的等概率样本：
+    按超几何分布决定从两边各抽取多少个，再从各自的样本中无放回抽取
+    随机种子由两边的行数决定，相同的合并顺序得到相同的样本
+    """
+    size = AMOUNT_SAMPLE_SIZE if size is None else size
+    population = left['population'] + right['population']
+    if population <= size:
+        return {'values': np.concatenate([left['values'], right['values']]), 'population': population}
+
+    rng = np.random.default_rng([left['population'], right['population']])
+    take_left = int(rng.hypergeometric(left['population'], right['population'], size))
+    parts = []
+    for sample, take in [(left['values'], take_left), (right['values'], size - take_left)]:
+        parts.append(sample[np.sort(rng.choice(len(sample), take, replace=False))])
+    return {'values': np.concatenate(parts), 'population': population}
+
+def build_aggregate_state(df: pd.DataFrame, keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    单次遍历的共享聚合：各键列只因子化一次，同时计算每个键值的
+    交易次数、净金额、收入、支出等数组，供所有分析表使用
+    金额以整数分累加（float64在2^53分以内精确），状态中的金额均为int64分，
+    合并时按整数相加，只在生成分析表时换算为元
+    """
+    if keys is None:
+        keys = AGGREGATE_KEYS
+
+    signed, has_amount = amount_arrays(df)
+    amount = np.abs(signed)
+    flag_codes, flags = pd.factorize(df['交易借贷标志'])
+    flags = list(flags)
+    is_credit = flag_codes == flags.index('贷') if '贷' in flags else np.zeros(len(df), dtype=bool)
+    is_debit = flag_codes == flags.index('借') if '借' in flags else np.zeros(len(df), dtype=bool)
+
+    # 各行的权重列，缺失金额按pandas聚合的习惯跳过
+    weights = {
+        'count': has_amount.astype(float),
+        'sum': signed.astype(float),
+        'income': np.where(is_credit & has_amount, amount, 0).astype(float),
+        'expense': np.where(is_debit & has_amount, amount, 0).astype(float),
+        'income_count': is_credit.astype(float),
+        'expense_count': is_debit.astype(float),
+        'income_amount_count': (is_credit & has_amount).astype(float),
+        'expense_amount_count': (is_debit & has_amount).astype(float)
+    }
+    # 最大/最小交易按元计算，缺失金额为NaN
+    signed_yuan = np.where(has_amount, signed / 100, np.nan)
+
+    state = {
+        'row_count': len(df),
+        'totals': {
+            'income': int(np.where(is_credit, amount, 0).sum()),
+            'expense': int(np.where(is_debit, amount, 0).sum()),
+            'net': int(signed.sum()),
+            'amount_sum': int(amount[has_amount].sum()),
+            'amount_count': int(has_amount.sum()),
+            'flag_counts': {str(flag): int(count) for flag, count in
+                            zip(flags, np.bincount(flag_codes[flag_codes >= 0], minlength=len(flags)))}
+        },
+        'keys': {}
+    }
+
+    for key in keys:
+        series = df[key]
+        if key in FIXED_RANGE_KEYS:
+            codes, uniques = _fixed_range_codes(series, FIXED_RANGE_KEYS[key])
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            codes, uniques = _category_codes(series)
+        else:
+            codes, uniques = pd.factorize(series, sort=True)
+        state['keys'][key] = _aggregate_codes(codes, len(uniques), weights, signed_yuan,
+                                              with_extrema=key in EXTREMA_KEYS)
+        state['keys'][key]['uniques'] = uniques
+        if key in DISTINCT_COLUMNS:
+            state['keys'][key]['distinct'] = {
+                column: _distinct_values(df[column], codes, len(uniques))
+                for column in DISTINCT_COLUMNS[key]
+            }
+
+    return state
+
+def _distinct_values(values: pd.Series, codes: np.ndarray, size: int) -> List[List[str]]:
+    """
+    按分组编码列出指定列的去重取值（组内按首次出现顺序），缺失值显示为'nan'
+    """
+    # category列直接使用类别编码去重
+    value_codes, labels = pd.factorize(values, use_na_sentinel=False)
+    pairs = pd.DataFrame({'code': codes, 'value': value_codes})
+    pairs = pairs[pairs['code'] >= 0].drop_duplicates()
+    groups: List[List[str]] = [[] for _ in range(size)]
+    if pairs.empty:
+        return groups
+
+    # 稳定排序保持组内首次出现顺序，再按组边界切片
+    pair_codes = pairs['code'].to_numpy()
+    order = np.argsort(pair_codes, kind='stable')
+    sorted_codes = pair_codes[order]
+    labels = np.asarray(labels, dtype=object).astype(str)[pairs['value'].to_numpy()[order]].tolist()
+    bounds = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1], True]).tolist()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        groups[sorted_codes[start]] = labels[start:end]
+    return groups
+
+def merge_aggregate_states(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合并两份聚合状态（如历史数据与新追加的数据），结果与对合并后的数据直接聚合一致
+    各键列按取值的并集对齐后相加，max/min取较大/较小值，去重取值按先左后右的顺序求并集，
+    两边都带有金额样本时合并为有上限的等概率样本；耗时只与键值数量有关，与原始行数无关
+    """
+    totals = {name: left['totals'][name] + right['totals'][name]
+              for name in ['income', 'expense', 'net', 'amount_sum', 'amount_count']}
+    flag_counts = dict(left['totals']['flag_counts'])
+    for flag, count in right['totals']['flag_counts'].items():
+        flag_counts[flag] = flag_counts.get(flag, 0) + count
+    totals['flag_counts'] = flag_counts
+
+    merged = {'row_count': left['row_count'] + right['row_count'], 'totals': totals, 'keys': {}}
+    if 'amount_sample' in left and 'amount_sample' in right:
+        merged['amount_sample'] = merge_amount_samples(left['amount_sample'], right['amount_sample'])
+    for key in left['keys'].keys() & right['keys'].keys():
+        merged['keys'][key] = _merge_key(left['keys'][key], right['keys'][key])
+    return merged
+
+def _merge_key(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    合并同一键列的聚合数组，键值按排序后的并集排列，与factorize(sort=True)一致
+    """
+    uniques = pd.Index(left['uniques']).union(pd.Index(right['uniques']))
+    left_at = uniques.get_indexer(pd.Index(left['uniques']))
+    right_at = uniques.get_indexer(pd.Index(right['uniques']))
+    size = len(uniques)
+
+    merged: Dict[str, Any] = {'uniques': np.asarray(uniques, dtype=left['uniques'].dtype)}
+    for name in SUM_ARRAYS:
+        values = np.zeros(size, dtype=left[name].dtype)
+        values[left_at] += left[name]
+        values[right_at] += right[name]
+        merged[name] = values
+    if 'max' in left:
+        for name, combine in [('max', np.fmax), ('min', np.fmin)]:
+            values = np.full(size, np.nan)
+            values[left_at] = left[name]
+            values[right_at] = combine(values[right_at], right[name])
+            merged[name] = values
+    if 'distinct' in left:
+        merged['distinct'] = {}
+        for column, left_groups in left['distinct'].items():
+            groups: List[List[str]] = [[] for _ in range(size)]
+            for position, values in zip(left_at.tolist(), left_groups):
+                groups[position] = values
+            for position, values in zip(right_at.tolist(), right['distinct'][column]):
+                # dict保持插入顺序，相当于有序集合的并集
+                groups[position] = list(dict.fromkeys(groups[position] + values))
+            merged['distinct'][column] = groups
+    return merged
+
+def _category_codes(values: pd.Series) -> tuple:
+    """
+    category列直接使用类别编码，去掉未出现的类别；类别按字典序排列，与factorize(sort=True)一致
+    """
+    categorical = values.cat.remove_unused_categories()
+    if not categorical.cat.categories.is_monotonic_increasing:
+        categorical = categorical.cat.reorder_categories(categorical.cat.categories.sort_values())
+    return (categorical.cat.codes.to_numpy(dtype=np.int64),
+            np.asarray(categorical.cat.categories, dtype=object))
+
+def _fixed_range_codes(values: pd.Series, size: int) -> tuple:
+    """
+    将0..size-1范围内的整数列直接作为编码，超出范围或为空的记为-1
+    """
+    numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    in_range = (numeric >= 0) & (numeric < size)
+    codes = np.where(in_range, numeric, -1).astype(np.int64)
+    return codes, np.arange(size)
+
+def _aggregate_codes(codes: np.ndarray, size: int, weights: Dict[str, np.ndarray],
+                     signed: np.ndarray, with_extrema: bool = False) -> Dict[str, Any]:
+    """
+    基于因子化编码用np.bincount计算每个键值的聚合数组
+    """
+    valid = codes >= 0  # 排除空键
+    valid_codes = codes[valid]
+
+    arrays = {}
+    for name, values in weights.items():
+        arrays[name] = np.bincount(valid_codes, weights=values[valid], minlength=size)
+    # bincount的结果为float64，分和次数都是精确的整数，转回int64便于合并时整数相加
+    for name in SUM_ARRAYS:
+        arrays[name] = np.rint(arrays[name]).astype(np.int64)
+
+    if with_extrema:
+        arrays['max'], arrays['min'] = _group_extrema(valid_codes, signed[valid], size)
+
+    return arrays
+
+def _group_extrema(codes: np.ndarray, values: np.ndarray, size: int) -> tuple:
+    """
+    按编码排序后用reduceat计算每组的最大值和最小值（忽略NaN）
+    """
+    group_max = np.full(size, np.nan)
+    group_min = np.full(size, np.nan)
+    if len(codes) == 0:
+        return group_max, group_min
+
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    present = sorted_codes[starts]
+    group_max[present] = np.fmax.reduceat(sorted_values, starts)
+    group_min[present] = np.fmin.reduceat(sorted_values, starts)
+    return group_max, group_min
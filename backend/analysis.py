@@ -1,83 +1,188 @@
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # 强制使用非交互式后端
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.font_manager import FontProperties, fontManager
-import matplotlib.ticker as ticker
 import warnings
-from datetime import datetime
 import os
-from typing import Dict, List, Any, Tuple
+import time
+from typing import Dict, List, Any, Tuple, Optional, Callable
+from aggregation import build_aggregate_state, to_cents
+from ingestion import read_excel_columns, TRANSACTION_COLUMNS
+from frame_cache import file_digest, load_cached_frame, store_cached_frame
+from result_store import save_result
+from charts import build_chart_data, chart_file_names
+from reports import report_file_name
+from instrumentation import StageTimings
+from transaction_store import store_enabled, store_transactions
 
-# 设置中文字体支持
-plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
-plt.rcParams['figure.figsize'] = (25, 10)
 warnings.filterwarnings('ignore')
 
-def process_transaction_data(file_path: str, filename: str) -> Dict[str, Any]:
+# 预处理后转为category的文本列
+CATEGORY_COLUMNS = ['交易借贷标志', '对方户名', '对方账号', '对方行名', '现转标志', '交易类型', '交易渠道']
+
+# 预处理后保留的列；交易金额由交易金额_分代替，核心交易时间已合并到交易时间
+PREPROCESSED_COLUMNS = CATEGORY_COLUMNS + ['借贷方向', '交易金额_分', '核心交易日期', '交易时间', '交易小时']
+
+# 格式错误的行在响应中最多列出的行数
+MALFORMED_SAMPLE_ROWS = 20
+
+def process_transaction_data(file_path: str, filename: str, digest: Optional[str] = None,
+                             progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
     """
     处理银行流水数据并生成分析结果
+    progress 为可选的阶段回调，用于后台任务汇报进度
     """
     try:
-        # 读取Excel文件
-        df = pd.read_excel(file_path)
+        timings = StageTimings('transaction')
+        _report_stage(progress, 'read')
         
-        # 检查文件是否为空
-        if df.empty:
-            raise ValueError("Excel文件为空")
+        df, parse_info, digest = load_transaction_frame(file_path, filename, digest, timings)
         
-        # 检查必要的列是否存在
-        required_columns = ['交易借贷标志', '交易金额', '对方户名', '对方账号', '对方行名', 
-                          '现转标志', '交易类型', '交易渠道', '核心交易日期', '核心交易时间']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise KeyError(f"缺少必要的列: {', '.join(missing_columns)}")
+        _report_stage(progress, 'analyze')
+        rows = len(df)
         
-        # 数据预处理
-        df = preprocess_data(df)
+        # 共享聚合：各键列只因子化并扫描一次
+        with timings.stage('aggregate_state', rows):
+            state = build_aggregate_state(df)
         
         # 执行各项分析
-        counterparty_stats = analyze_counterparties(df)
-        total_stats = calculate_total_stats(df)
-        transaction_type_stats = analyze_transaction_types(df)
-        channel_stats = analyze_channels(df)
-        daily_transactions = analyze_daily_trends(df)
-        hourly_stats = analyze_hourly_trends(df)
-        
-        # 生成可视化图表
-        chart_files = generate_charts(df, counterparty_stats, transaction_type_stats, 
-                                     channel_stats, daily_transactions, hourly_stats, filename)
+        tables = build_analysis_tables(state, timings, rows)
         
-        # 生成Excel报告
-        report_file = generate_excel_report(counterparty_stats, total_stats, 
-                                          transaction_type_stats, channel_stats, 
-                                          daily_transactions, hourly_stats, filename)
+        _report_stage(progress, 'store')
         
-        return {
-            'counterparty_stats': counterparty_stats,
-            'total_stats': total_stats,
-            'transaction_type_stats': transaction_type_stats,
-            'channel_stats': channel_stats,
-            'daily_transactions': daily_transactions,
-            'hourly_stats': hourly_stats,
-            'chart_files': chart_files,
-            'report_file': report_file,
-            'filename': filename
-        }
+        # 保存分析结果，图表在首次访问/api/charts时按需渲染
+        analysis_id = digest[:24]
+        with timings.stage('chart_data', rows):
+            chart_data = build_chart_data(df, tables['counterparty_stats'],
+                                          tables['transaction_type_stats'], tables['channel_stats'],
+                                          tables['daily_transactions'], tables['hourly_stats'])
+        # 可选：写入本地交易明细存储，供后续按条件查询
+        store_dataset = None
+        if store_enabled():
+            with timings.stage('transaction_store', rows):
+                store_transactions(analysis_id, digest, df)
+            store_dataset = analysis_id
+        result = store_analysis(analysis_id, filename, tables, chart_data, [parse_info], timings)
+        result['store_dataset'] = store_dataset
+        return result
     except Exception as e:
         # 重新抛出异常以便上层处理
         print(f'文件处理出现意外错误: {str(e)}')
         raise e
 
+def load_transaction_frame(file_path: str, filename: str, digest: Optional[str],
+                           timings: StageTimings) -> Tuple[pd.DataFrame, Dict[str, Any], str]:
+    """
+    读取并预处理流水文件，按文件内容摘要优先使用Parquet缓存
+    返回预处理后的DataFrame、解析信息和内容摘要
+    """
+    # 按文件内容摘要查找已预处理的缓存
+    if digest is None:
+        with timings.stage('hash'):
+            digest = file_digest(file_path)
+    load_start = time.perf_counter()
+    with timings.stage('cache_load') as record:
+        cached = load_cached_frame(digest)
+        record['rows'] = len(cached[0]) if cached is not None else 0
+    
+    # 命中缓存时的解析信息与首次解析一致：文件名为上传时的名称，行数和列数为原始文件中读取的数量
+    if cached is not None:
+        df, metadata = cached
+        parse_info = {'file': filename, 'engine': 'cache', 'rows': metadata.get('rows', len(df)),
+                      'columns': metadata.get('columns', len(TRANSACTION_COLUMNS)),
+                      'seconds': round(time.perf_counter() - load_start, 4),
+                      'malformed_rows': metadata.get('malformed_rows', {'count': 0, 'rows': []})}
+        return df, parse_info, digest
+    
+    # 读取Excel文件（只解析分析所需的列）
+    required_columns = TRANSACTION_COLUMNS
+    with timings.stage('read') as record:
+        df, parse_info = read_excel_columns(file_path, required_columns)
+        record['rows'] = len(df)
+    parse_info['file'] = filename
+    
+    # 检查文件是否为空
+    if df.empty:
+        raise ValueError("Excel文件为空")
+    
+    # 检查必要的列是否存在
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise KeyError(f"缺少必要的列: {', '.join(missing_columns)}")
+    
+    # 数据预处理
+    with timings.stage('preprocess', len(df)):
+        df = preprocess_data(df)
+    parse_info['malformed_rows'] = df.attrs['malformed_rows']
+    with timings.stage('cache_store', len(df)):
+        store_cached_frame(digest, df, {key: parse_info[key] for key in ['rows', 'columns', 'malformed_rows']})
+    return df, parse_info, digest
+
+def build_analysis_tables(state: Dict[str, Any], timings: Optional[StageTimings] = None,
+                          rows: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    由聚合状态生成全部分析表，不再访问原始流水
+    """
+    if timings is None:
+        timings = StageTimings('transaction')
+    rows = state['row_count'] if rows is None else rows
+    tables = {}
+    for name, stage, func in [('counterparty_stats', 'analyze_counterparties', analyze_counterparties),
+                              ('total_stats', 'calculate_total_stats', calculate_total_stats),
+                              ('transaction_type_stats', 'analyze_transaction_types', analyze_transaction_types),
+                              ('channel_stats', 'analyze_channels', analyze_channels),
+                              ('daily_transactions', 'analyze_daily_trends', analyze_daily_trends),
+                              ('hourly_stats', 'analyze_hourly_trends', analyze_hourly_trends)]:
+        with timings.stage(stage, rows):
+            tables[name] = func(None, state)
+    return tables
+
+def store_analysis(analysis_id: str, filename: str, tables: Dict[str, pd.DataFrame],
+                   chart_data: Dict[str, Any], parse_stats: List[Dict[str, Any]],
+                   timings: StageTimings) -> Dict[str, Any]:
+    """
+    保存分析表和绘图数据，返回分析结果；图表和Excel报告在首次请求时生成
+    """
+    with timings.stage('store', len(tables['counterparty_stats'])):
+        save_result(analysis_id, {'analysis_id': analysis_id, 'filename': filename,
+                                  'tables': tables, 'chart_data': chart_data})
+    chart_files = chart_file_names(analysis_id)
+    # Excel报告在首次下载时生成
+    report_file = report_file_name(analysis_id)
+    
+    return {
+        **tables,
+        'analysis_id': analysis_id,
+        'chart_files': chart_files,
+        'report_file': report_file,
+        'parse_stats': parse_stats,
+        'timings': timings.as_dict(),
+        'filename': filename
+    }
+
+def _report_stage(progress: Optional[Callable[[str], None]], stage: str) -> None:
+    """
+    汇报当前处理阶段
+    """
+    if progress is not None:
+        progress(stage)
+
 def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     """
-    数据预处理
+    数据预处理，输出紧凑的列类型：文本列转为category，借贷方向为int8，
+    交易金额以分为单位存为Int64，分组统计直接使用类别编码
     """
-    # 交易金额正负转换（贷为正，借为负）
-    df['交易金额_正负'] = np.where(df['交易借贷标志'] == '贷', df['交易金额'], -df['交易金额'])
+    # 由整数日期和时间直接计算时间戳，格式错误的行剔除并记录
+    dates, timestamps, hours, malformed = parse_timestamps(df['核心交易日期'], df['核心交易时间'])
+    report = malformed_rows_report(df, malformed)
+    if report['count']:
+        print(f"剔除{report['count']}行日期或时间格式错误的数据")
+        if report['count'] == len(df):
+            raise ValueError('核心交易日期或核心交易时间格式错误，没有可分析的数据')
+        keep = ~malformed
+        df = df[keep].copy()
+        dates, timestamps, hours = dates[keep], timestamps[keep], hours[keep]
+    df['核心交易日期'] = dates
+    df['交易时间'] = timestamps
+    df['交易小时'] = hours
     
     # 现转标志处理
     df.loc[df['现转标志']=='现','对方行名']='取现'
@@ -85,33 +190,98 @@ def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
     # 转换对方账号为字符串
     df['对方账号'] = df['对方账号'].astype(str)
     
-    # 转换日期时间格式
-    df['核心交易日期'] = pd.to_datetime(df['核心交易日期'], format='%Y%m%d')
-    df['交易时间'] = pd.to_datetime(df['核心交易日期'].astype(str) + ' ' + 
-                                 df['核心交易时间'].astype(str).str.zfill(6), 
-                                 format='%Y-%m-%d %H%M%S')
-    df['交易小时'] = df['交易时间'].dt.hour
+    # 交易金额正负方向（贷为正，其余为负）及以分为单位的金额
+    df['借贷方向'] = np.where(df['交易借贷标志'] == '贷', 1, -1).astype(np.int8)
+    df['交易金额_分'] = to_cents(df['交易金额'])
     
+    # 低基数文本列转为category，只保留分析所需的列
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype('category')
+    df = df[PREPROCESSED_COLUMNS]
+    # 格式错误的行由load_transaction_frame写入解析信息和缓存的元数据
+    df.attrs['malformed_rows'] = report
     return df
 
-def analyze_counterparties(df: pd.DataFrame) -> pd.DataFrame:
+def parse_timestamps(dates: pd.Series, times: pd.Series) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    由整数形式的核心交易日期（YYYYMMDD，也接受Excel日期）和核心交易时间（HHMMSS）
+    直接做整数运算得到交易日期、交易时间和交易小时，不生成中间字符串
+    返回的最后一项为日期或时间格式错误的行掩码，这些行的其他结果无意义
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        days = dates.to_numpy(dtype='datetime64[D]')
+        date_ok = ~np.isnat(days)
+    else:
+        ymd = pd.to_numeric(dates, errors='coerce').to_numpy(dtype=float)
+        date_ok = np.isfinite(ymd) & (ymd == np.floor(ymd))
+        value = np.where(date_ok, ymd, 19700101).astype(np.int64)
+        year, month, day = value // 10000, value // 100 % 100, value % 100
+        date_ok &= (year >= 1900) & (year <= 2200) & (month >= 1) & (month <= 12) & (day >= 1)
+        months = np.where(date_ok, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+        days = months.astype('datetime64[D]') + np.where(date_ok, day - 1, 0)
+        # 日期超出当月天数（如20240230）
+        date_ok &= days < (months + 1).astype('datetime64[D]')
+
+    hms = pd.to_numeric(times, errors='coerce').to_numpy(dtype=float)
+    time_ok = np.isfinite(hms) & (hms == np.floor(hms)) & (hms >= 0)
+    value = np.where(time_ok, hms, 0).astype(np.int64)
+    hour, minute, second = value // 10000, value // 100 % 100, value % 100
+    time_ok &= (hour < 24) & (minute < 60) & (second < 60)
+
+    malformed = ~(date_ok & time_ok)
+    days = np.where(malformed, np.datetime64(0, 'D'), days)
+    seconds = np.where(malformed, 0, hour * 3600 + minute * 60 + second)
+    timestamps = days.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+    return (days.astype('datetime64[ns]'), timestamps.astype('datetime64[ns]'),
+            np.where(malformed, 0, hour).astype(np.int8), malformed)
+
+def malformed_rows_report(df: pd.DataFrame, malformed: np.ndarray) -> Dict[str, Any]:
+    """
+    汇总日期或时间格式错误的行：总数及前MALFORMED_SAMPLE_ROWS行的Excel行号和原始值
+    """
+    positions = np.flatnonzero(malformed)
+    rows = []
+    for position in positions[:MALFORMED_SAMPLE_ROWS].tolist():
+        rows.append({
+            # Excel行号：第1行为表头
+            'row': position + 2,
+            '核心交易日期': str(df['核心交易日期'].iat[position]),
+            '核心交易时间': str(df['核心交易时间'].iat[position])
+        })
+    return {'count': len(positions), 'rows': rows}
+
+def analyze_counterparties(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     分析交易对手
     """
-    counterparty_stats = df.groupby('对方户名').agg(
-        对方账号 = ('对方账号', lambda x: '-'.join(x.unique().astype(str))),
-        对方行名 = ('对方行名', lambda x: '-'.join(x.unique().astype(str))),
-        交易次数=('交易金额_正负', 'count'),
-        总交易金额=('交易金额_正负', 'sum'),
-        总收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].sum()),
-        总支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].sum()),
-        收入次数=('交易借贷标志', lambda x: (x == '贷').sum()),
-        支出次数=('交易借贷标志', lambda x: (x == '借').sum()),
-        平均收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].mean()),
-        平均支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].mean()),
-        最大交易=('交易金额_正负', 'max'),
-        最小交易=('交易金额_正负', 'min')
-    ).reset_index().sort_values('交易次数', ascending=False)
+    if state is None:
+        state = build_aggregate_state(df, keys=['对方户名'])
+    agg = state['keys']['对方户名']
+
+    income = _yuan(agg['income'])
+    expense = _yuan(agg['expense'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_income = income / agg['income_amount_count']
+        avg_expense = expense / agg['expense_amount_count']
+
+    counterparty_stats = pd.DataFrame({
+        '交易次数': agg['count'],
+        '总交易金额': _yuan(agg['sum']),
+        '总收入': income,
+        '总支出': expense,
+        '收入次数': agg['income_count'],
+        '支出次数': agg['expense_count'],
+        '平均收入': avg_income,
+        '平均支出': avg_expense,
+        '最大交易': agg['max'],
+        '最小交易': agg['min']
+    }, index=pd.Index(agg['uniques'], name='对方户名'))
+
+    # 对方账号/对方行名按首次出现顺序去重后用'-'连接
+    distinct = agg['distinct']
+    counterparty_stats.insert(0, '对方行名', ['-'.join(values) for values in distinct['对方行名']])
+    counterparty_stats.insert(0, '对方账号', ['-'.join(values) for values in distinct['对方账号']])
+    counterparty_stats = counterparty_stats.reset_index().sort_values('交易次数', ascending=False)
     
     # 处理NaN值
     counterparty_stats['平均收入'] = counterparty_stats['平均收入'].fillna(0)
@@ -129,189 +299,87 @@ def analyze_counterparties(df: pd.DataFrame) -> pd.DataFrame:
     
     return counterparty_stats
 
-def calculate_total_stats(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_total_stats(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     计算整体统计
     """
+    if state is None:
+        state = build_aggregate_state(df, keys=[])
+    totals = state['totals']
+
     total_stats = pd.DataFrame({
         '统计指标': ['总交易次数', '总收入', '总支出', '净收入', '平均交易额'],
         '数值': [
-            len(df),
-            df[df['交易借贷标志'] == '贷']['交易金额'].sum(),
-            df[df['交易借贷标志'] == '借']['交易金额'].sum(),
-            df['交易金额_正负'].sum(),
-            df['交易金额'].mean()
+            state['row_count'],
+            _yuan(totals['income']),
+            _yuan(totals['expense']),
+            _yuan(totals['net']),
+            _yuan(totals['amount_sum']) / totals['amount_count'] if totals['amount_count'] else np.nan
         ]
     })
     return total_stats
 
-def analyze_transaction_types(df: pd.DataFrame) -> pd.DataFrame:
+def _yuan(cents: Any) -> Any:
+    """
+    将聚合状态中以分为单位的整数金额换算为元，只在生成分析表时调用
+    """
+    return cents / 100
+
+def _count_and_sum_table(state: Dict[str, Any], key: str, sum_column: str) -> pd.DataFrame:
+    """
+    从共享聚合状态中取出某个键列的交易次数和净金额
+    """
+    agg = state['keys'][key]
+    return pd.DataFrame({
+        key: agg['uniques'],
+        '交易次数': agg['count'],
+        sum_column: _yuan(agg['sum'])
+    })
+
+def analyze_transaction_types(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     分析交易类型
     """
-    transaction_type_stats = df.groupby('交易类型').agg(
-        交易次数=('交易金额', 'count'),
-        总金额=('交易金额_正负', 'sum')
-    ).reset_index().sort_values('交易次数', ascending=False)
-    return transaction_type_stats
+    if state is None:
+        state = build_aggregate_state(df, keys=['交易类型'])
+    transaction_type_stats = _count_and_sum_table(state, '交易类型', '总金额')
+    return transaction_type_stats.sort_values('交易次数', ascending=False)
 
-def analyze_channels(df: pd.DataFrame) -> pd.DataFrame:
+def analyze_channels(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     分析交易渠道
     """
-    channel_stats = df.groupby('交易渠道').agg(
-        交易次数=('交易金额', 'count'),
-        总金额=('交易金额_正负', 'sum')
-    ).reset_index().sort_values('交易次数', ascending=False)
-    return channel_stats
+    if state is None:
+        state = build_aggregate_state(df, keys=['交易渠道'])
+    channel_stats = _count_and_sum_table(state, '交易渠道', '总金额')
+    return channel_stats.sort_values('交易次数', ascending=False)
 
-def analyze_daily_trends(df: pd.DataFrame) -> pd.DataFrame:
+def analyze_daily_trends(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     分析每日交易趋势
     """
-    daily_transactions = df.groupby('核心交易日期').agg(
-        交易次数=('交易金额', 'count'),
-        净流量=('交易金额_正负', 'sum')
-    ).reset_index()
-    return daily_transactions
+    if state is None:
+        state = build_aggregate_state(df, keys=['核心交易日期'])
+    return _count_and_sum_table(state, '核心交易日期', '净流量')
 
-def analyze_hourly_trends(df: pd.DataFrame) -> pd.DataFrame:
+def analyze_hourly_trends(df: pd.DataFrame, state: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     """
     分析每小时交易趋势
     """
-    hourly_stats = df.groupby('交易小时').agg(
-        总收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].sum()),
-        总支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].sum()),
-        收入次数=('交易借贷标志', lambda x: (x == '贷').sum()),
-        支出次数=('交易借贷标志', lambda x: (x == '借').sum())
-    ).reset_index()
-    
-    # 补全24小时
-    all_hours = pd.DataFrame({'交易小时': range(24)})
-    hourly_stats = all_hours.merge(hourly_stats, on='交易小时', how='left').fillna(0)
+    # 交易小时为固定的0-23，bincount结果本身就是完整的24行
+    if state is None:
+        state = build_aggregate_state(df, keys=['交易小时'])
+    agg = state['keys']['交易小时']
+
+    hourly_stats = pd.DataFrame({
+        '交易小时': agg['uniques'],
+        '总收入': _yuan(agg['income']),
+        '总支出': _yuan(agg['expense']),
+        '收入次数': agg['income_count'],
+        '支出次数': agg['expense_count']
+    })
     
     # 计算净流量
     hourly_stats['净流量'] = hourly_stats['总收入'] - hourly_stats['总支出']
     
     return hourly_stats
-
-def generate_charts(df: pd.DataFrame, counterparty_stats: pd.DataFrame, transaction_type_stats: pd.DataFrame, 
-                   channel_stats: pd.DataFrame, daily_transactions: pd.DataFrame, 
-                   hourly_stats: pd.DataFrame, filename: str) -> List[str]:
-    """
-    生成所有图表
-    """
-    chart_files = []
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # 1. 主要分析图表
-    fig, axes = plt.subplots(3, 2, figsize=(20, 18))
-    
-    # 交易对手金额分布（前10）
-    top_counterparties = counterparty_stats.head(10)
-    colors = ['green' if x > 0 else 'red' for x in top_counterparties['总交易金额']]
-    sns.barplot(x='总交易金额', y='对方户名', data=top_counterparties, 
-                palette=colors, ax=axes[0, 0])
-    axes[0, 0].set_title('TOP10交易对手净交易金额')
-    
-    # 交易类型分布
-    sns.barplot(x='交易次数', y='交易类型', data=transaction_type_stats.head(5), ax=axes[0, 1])
-    axes[0, 1].set_title('TOP5交易类型次数')
-    
-    # 每日交易趋势
-    axes[1, 0].plot(daily_transactions['核心交易日期'], daily_transactions['净流量'], 'b-o')
-    axes[1, 0].set_title('每日资金净流量趋势')
-    axes[1, 0].tick_params(axis='x', rotation=45)
-    axes[1, 0].yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: f'{x/10000:.1f}万'))
-    axes[1, 0].grid(True, linestyle='--', alpha=0.7)
-    
-    # 交易渠道分布
-    sns.barplot(x='交易次数', y='交易渠道', data=channel_stats.head(5), ax=axes[1, 1])
-    axes[1, 1].set_title('TOP5交易渠道使用次数')
-    
-    # 借贷分布
-    debit_credit = df['交易借贷标志'].value_counts()
-    axes[2, 0].pie(debit_credit, labels=debit_credit.index, autopct='%1.1f%%',
-                   colors=['#ff9999','#66b3ff'], startangle=90)
-    axes[2, 0].set_title('借贷交易比例')
-    
-    # 金额分布直方图
-    sns.histplot(df['交易金额_正负'], bins=30, kde=True, ax=axes[2, 1])
-    axes[2, 1].set_title('交易金额分布')
-    axes[2, 1].axvline(0, color='r', linestyle='--')
-    
-    plt.tight_layout()
-    chart1_file = f'{timestamp}_{filename}_main_analysis.png'
-    chart1_path = os.path.join('static/charts', chart1_file)
-    plt.savefig(chart1_path, dpi=300, bbox_inches='tight')
-    plt.close()
-    chart_files.append(chart1_file)
-    
-    # 2. 每小时分析图表
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
-    
-    # 金额堆叠柱状图
-    axes[0, 0].bar(hourly_stats['交易小时'], hourly_stats['总收入'], 
-                   color='#66c2a5', label='收入')
-    axes[0, 0].bar(hourly_stats['交易小时'], -hourly_stats['总支出'], 
-                   color='#fc8d62', label='支出')
-    axes[0, 0].axhline(0, color='black', linewidth=0.5)
-    axes[0, 0].set_title('各小时收入支出金额对比')
-    axes[0, 0].legend()
-    axes[0, 0].grid(axis='y', linestyle='--', alpha=0.7)
-    
-    # 净流量趋势线
-    axes[0, 1].plot(hourly_stats['交易小时'], hourly_stats['净流量'], 
-                    'b-o', linewidth=2, markersize=6)
-    axes[0, 1].axhline(0, color='red', linestyle='--')
-    axes[0, 1].set_title('各小时资金净流量')
-    axes[0, 1].grid(True, linestyle='--', alpha=0.5)
-    
-    # 交易次数柱状图
-    axes[1, 0].bar(hourly_stats['交易小时'], hourly_stats['收入次数'], 
-                   color='#8da0cb', alpha=0.7, label='收入次数')
-    axes[1, 0].bar(hourly_stats['交易小时'], hourly_stats['支出次数'], 
-                   color='#e78ac3', alpha=0.7, label='支出次数', 
-                   bottom=hourly_stats['收入次数'])
-    axes[1, 0].set_title('各小时交易次数分布')
-    axes[1, 0].legend()
-    axes[1, 0].grid(axis='y', linestyle='--', alpha=0.5)
-    
-    # 全天收入支出对比
-    total_income = hourly_stats['总收入'].sum()
-    total_expense = hourly_stats['总支出'].sum()
-    axes[1, 1].pie([total_income, total_expense], 
-                   labels=[f'总收入\n{total_income:,.2f}', f'总支出\n{total_expense:,.2f}'],
-                   colors=['#66c2a5', '#fc8d62'], autopct='%1.1f%%')
-    axes[1, 1].set_title('全天收入支出总额对比')
-    
-    plt.tight_layout()
-    chart2_file = f'{timestamp}_{filename}_hourly_analysis.png'
-    chart2_path = os.path.join('static/charts', chart2_file)
-    plt.savefig(chart2_path, dpi=300, bbox_inches='tight')
-    plt.close()
-    chart_files.append(chart2_file)
-    
-    return chart_files
-
-def generate_excel_report(counterparty_stats: pd.DataFrame, total_stats: pd.DataFrame, 
-                         transaction_type_stats: pd.DataFrame, channel_stats: pd.DataFrame, 
-                         daily_transactions: pd.DataFrame, hourly_stats: pd.DataFrame, 
-                         filename: str) -> str:
-    """
-    生成Excel报告
-    """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    report_file = f'{timestamp}_{filename}_report.xlsx'
-    report_path = os.path.join('outputs', report_file)
-    
-    with pd.ExcelWriter(report_path) as writer:
-        counterparty_stats.to_excel(writer, sheet_name='交易对手统计', index=False)
-        total_stats.to_excel(writer, sheet_name='整体统计', index=False)
-        transaction_type_stats.to_excel(writer, sheet_name='交易类型分析', index=False)
-        channel_stats.to_excel(writer, sheet_name='交易渠道分析', index=False)
-        daily_transactions.to_excel(writer, sheet_name='每日交易趋势', index=False)
-        hourly_stats.to_excel(writer, sheet_name='每小时分析', index=False)
-    
-    return report_file
-    
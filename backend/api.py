@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, g
 from flask_cors import CORS
 import os
 import warnings
@@ -6,17 +6,75 @@ import pandas as pd
 import zipfile
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from analysis import process_transaction_data
-from network_analysis import process_network_data
+from werkzeug.exceptions import RequestEntityTooLarge
+import shutil
+import re
+import time
+from frame_cache import configure_frame_cache
+from instrumentation import record_timings, observe_request, render_metrics
+from result_store import configure_result_store, load_result
+from result_views import query_table
+from uploads import (StreamingRequest, UploadError, UploadOffsetError, configure_uploads,
+                     save_upload, create_upload_session, upload_status, append_chunk,
+                     complete_upload)
+from reports import REPORT_FORMATS, get_or_build_report
+from tasks import (run_transaction_analysis, run_network_analysis, run_account_append,
+                   preload_pipelines, TRANSACTION_STAGES, NETWORK_STAGES)
+from transaction_store import (configure_transaction_store, store_enabled, query_transactions,
+                               aggregate_transactions, list_datasets, delete_dataset)
+from incremental import (configure_account_store, validate_account_id, load_account_state,
+                         account_summary, delete_account_state)
+from jobs import (configure_jobs, submit_job, get_job, job_status, queue_info,
+                  JobQueueFullError)
 import secrets
+import uuid
 from typing import Dict, Any, List, Tuple, Optional
 
 app = Flask(__name__)
+app.request_class = StreamingRequest  # 上传文件边接收边写盘并计算摘要
 CORS(app)  # 允许跨域请求
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# 单次请求（及单个文件）的大小上限，默认1GB；更大的文件可使用分块上传接口
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))
+# 上传读写块大小和未完成分块上传的保留秒数
+app.config['UPLOAD_CHUNK_SIZE'] = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+app.config['UPLOAD_SESSION_TTL'] = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+# 预处理结果缓存（按上传内容摘要存储为Parquet，按容量LRU淘汰）
+app.config['FRAME_CACHE_FOLDER'] = os.environ.get('FRAME_CACHE_FOLDER', os.path.join('cache', 'frames'))
+app.config['FRAME_CACHE_MAX_BYTES'] = int(os.environ.get('FRAME_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+app.config['FRAME_CACHE_ENABLED'] = os.environ.get('FRAME_CACHE_ENABLED', '1') != '0'
+# 后台任务队列（mode=job）：工作进程数、最大排队任务数、结果保留秒数
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+app.config['JOB_QUEUE_DEPTH'] = int(os.environ.get('JOB_QUEUE_DEPTH', 16))
+app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 3600))
+# 网络分析多文件并行解析的进程数
+app.config['NETWORK_LOAD_WORKERS'] = int(os.environ.get('NETWORK_LOAD_WORKERS', os.cpu_count() or 1))
+# 网络图默认节点上限和最低交易金额，可由请求参数node_limit/min_amount覆盖
+app.config['NETWORK_NODE_LIMIT'] = int(os.environ.get('NETWORK_NODE_LIMIT', 150))
+app.config['NETWORK_MIN_AMOUNT'] = float(os.environ.get('NETWORK_MIN_AMOUNT', 200000))
+# 网络图模式：top只保留金额最大的节点，summary按社区聚合为可展开的超级节点，可由请求参数graph_mode覆盖
+app.config['NETWORK_GRAPH_MODE'] = os.environ.get('NETWORK_GRAPH_MODE', 'top')
+# 中心性分析：近似介数中心性的采样源点数、时间预算（秒）、auto模式下计算精确值的最大节点数
+app.config['CENTRALITY_SAMPLE_SIZE'] = int(os.environ.get('CENTRALITY_SAMPLE_SIZE', 256))
+app.config['CENTRALITY_TIME_BUDGET'] = float(os.environ.get('CENTRALITY_TIME_BUDGET', 10))
+app.config['CENTRALITY_EXACT_MAX_NODES'] = int(os.environ.get('CENTRALITY_EXACT_MAX_NODES', 2000))
+# 资金路径和环路追踪：默认最大边数、单次查询最多返回的结果数和时间预算上限（秒）
+app.config['TRACE_MAX_HOPS'] = int(os.environ.get('TRACE_MAX_HOPS', 6))
+app.config['TRACE_MAX_RESULTS'] = int(os.environ.get('TRACE_MAX_RESULTS', 100))
+app.config['TRACE_TIME_BUDGET'] = float(os.environ.get('TRACE_TIME_BUDGET', 1.0))
+# 分析结果存储（图表按需渲染时读取），按容量LRU淘汰
+app.config['RESULT_FOLDER'] = os.environ.get('RESULT_FOLDER', os.path.join('outputs', 'results'))
+app.config['RESULT_STORE_MAX_BYTES'] = int(os.environ.get('RESULT_STORE_MAX_BYTES', 1024 * 1024 * 1024))
+# 增量分析：每个账户的累计聚合状态的存储目录
+app.config['ACCOUNT_STATE_FOLDER'] = os.environ.get('ACCOUNT_STATE_FOLDER', os.path.join('outputs', 'accounts'))
+# 可选的本地交易明细存储（SQLite），开启后上传的流水保留在本地并可按条件查询
+app.config['TRANSACTION_STORE_ENABLED'] = os.environ.get('TRANSACTION_STORE_ENABLED', '0') == '1'
+app.config['TRANSACTION_STORE_PATH'] = os.environ.get('TRANSACTION_STORE_PATH', os.path.join('outputs', 'transactions.sqlite3'))
+# 分析流程依赖的绘图和网络分析库默认在首次使用时才导入，使服务快速启动；
+# 设为1时在启动时（及后台任务的工作进程中）预先导入，适合以--preload方式预派生工作进程
+app.config['PRELOAD_PIPELINES'] = os.environ.get('PRELOAD_PIPELINES', '0') == '1'
 
 # 确保上传和输出目录存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -24,6 +82,20 @@ os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 os.makedirs('static/charts', exist_ok=True)
 os.makedirs('static/networks', exist_ok=True)
 
+configure_frame_cache(app.config['FRAME_CACHE_FOLDER'], app.config['FRAME_CACHE_MAX_BYTES'],
+                      app.config['FRAME_CACHE_ENABLED'])
+configure_jobs(app.config['JOB_WORKERS'], app.config['JOB_QUEUE_DEPTH'],
+               app.config['JOB_RESULT_TTL'],
+               preload_pipelines if app.config['PRELOAD_PIPELINES'] else None)
+configure_result_store(app.config['RESULT_FOLDER'], app.config['RESULT_STORE_MAX_BYTES'])
+configure_account_store(app.config['ACCOUNT_STATE_FOLDER'])
+configure_transaction_store(app.config['TRANSACTION_STORE_PATH'], app.config['TRANSACTION_STORE_ENABLED'])
+configure_uploads(app.config['UPLOAD_FOLDER'], app.config['MAX_CONTENT_LENGTH'],
+                  app.config['UPLOAD_CHUNK_SIZE'], app.config['UPLOAD_SESSION_TTL'])
+
+if app.config['PRELOAD_PIPELINES']:
+    preload_pipelines()
+
 warnings.filterwarnings('ignore')
 
 ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
@@ -31,89 +103,220 @@ ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def _job_mode_requested() -> bool:
+    """请求是否要求以后台任务方式处理（mode=job）"""
+    return request.values.get('mode') == 'job'
+
+def _submit_background_job(kind: str, func, args: tuple, stages: List[str]) -> Tuple[Dict[str, Any], int]:
+    """提交后台任务，返回任务ID和查询地址"""
+    try:
+        job_id = submit_job(kind, func, args, stages)
+        # 任务在工作进程中执行，结束后把阶段耗时计入主进程的指标
+        get_job(job_id)['future'].add_done_callback(
+            lambda future: record_timings(future.result()['timings']) if future.exception() is None else None)
+    except JobQueueFullError as e:
+        _cleanup_upload(args[0])
+        return jsonify({'error': str(e)}), 503
+    return jsonify({
+        'message': '文件已接收，正在后台分析',
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result',
+        'queue': queue_info()
+    }), 202
+
+def _with_optional_timings(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """请求带有timings=1时保留各阶段的耗时和内存信息，否则从响应中移除"""
+    if request.values.get('timings') in ('1', 'true'):
+        return response_data
+    return {key: value for key, value in response_data.items() if key != 'timings'}
+
+def _cleanup_upload(path: str) -> None:
+    """清理上传的临时文件或文件夹"""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+def _network_options() -> Dict[str, Any]:
+    """读取网络图节点上限、最低交易金额、网络图模式和中心性分析模式参数，参数非法时抛出ValueError"""
+    raw_limit = request.values.get('node_limit', '')
+    raw_amount = request.values.get('min_amount', '')
+    node_limit = int(raw_limit) if raw_limit != '' else app.config['NETWORK_NODE_LIMIT']
+    min_amount = float(raw_amount) if raw_amount != '' else app.config['NETWORK_MIN_AMOUNT']
+    if node_limit <= 0 or min_amount < 0:
+        raise ValueError('node_limit必须为正整数，min_amount不能为负数')
+    
+    # 网络图模式：summary时节点上限同时是每层展开的节点上限，至少为3（含外部节点）
+    graph_mode = request.values.get('graph_mode') or app.config['NETWORK_GRAPH_MODE']
+    if graph_mode not in ('top', 'summary'):
+        raise ValueError('graph_mode只能为top或summary')
+    if graph_mode == 'summary' and node_limit < 3:
+        raise ValueError('summary模式的node_limit不能小于3')
+    
+    # 中心性分析模式：auto（按节点数自动选择）、exact、approximate
+    analytics_mode = request.values.get('analytics_mode', 'auto')
+    if analytics_mode not in ('auto', 'exact', 'approximate'):
+        raise ValueError('analytics_mode只能为auto、exact或approximate')
+    centrality_options = {
+        'mode': analytics_mode,
+        'sample_size': app.config['CENTRALITY_SAMPLE_SIZE'],
+        'time_budget': app.config['CENTRALITY_TIME_BUDGET'],
+        'exact_max_nodes': app.config['CENTRALITY_EXACT_MAX_NODES']
+    }
+    return {'node_limit': node_limit, 'min_amount': min_amount, 'graph_mode': graph_mode,
+            'centrality_options': centrality_options}
+
+def _trace_options() -> Dict[str, Any]:
+    """读取路径追踪的最大边数、最低金额、结果数和时间预算参数（不超过配置的上限），参数非法时抛出ValueError"""
+    max_hops = int(request.args.get('max_hops') or app.config['TRACE_MAX_HOPS'])
+    min_amount = float(request.args.get('min_amount') or 0)
+    limit = min(int(request.args.get('limit') or app.config['TRACE_MAX_RESULTS']),
+                app.config['TRACE_MAX_RESULTS'])
+    time_budget = min(float(request.args.get('time_budget') or app.config['TRACE_TIME_BUDGET']),
+                      app.config['TRACE_TIME_BUDGET'])
+    if min_amount < 0:
+        raise ValueError('min_amount不能为负数')
+    return {'max_hops': max_hops, 'min_amount': min_amount, 'limit': limit, 'time_budget': time_budget}
+
+def _transaction_error_response(e: Exception) -> Tuple[Dict[str, Any], int]:
+    """将流水分析异常转换为错误响应"""
+    if isinstance(e, FileNotFoundError):
+        return jsonify({'error': '找不到上传的文件，请重新上传'}), 404
+    if isinstance(e, pd.errors.EmptyDataError):
+        return jsonify({'error': 'Excel文件为空或格式不正确'}), 400
+    if isinstance(e, (pd.errors.ParserError, ValueError)):
+        if 'Excel' in str(e) or 'workbook' in str(e).lower():
+            return jsonify({'error': 'Excel文件损坏或格式不正确'}), 400
+        return jsonify({'error': f'数据格式错误: {str(e)}，请检查文件内容'}), 400
+    if isinstance(e, KeyError):
+        return jsonify({'error': f'Excel文件缺少必要的列: {str(e)}，请检查文件格式'}), 400
+    return jsonify({'error': f'文件处理出现意外错误: {str(e)}'}), 500
+
+def _network_error_response(e: Exception) -> Tuple[Dict[str, Any], int]:
+    """将网络分析异常转换为错误响应"""
+    return jsonify({'error': f'网络图处理出现错误: {str(e)}'}), 500
+
+def _start_transaction_analysis(file_path: str, filename: str, digest: str) -> Tuple[Dict[str, Any], int]:
+    """按请求的模式同步执行或提交后台流水分析"""
+    # 任务模式：提交到后台进程池，立即返回任务ID
+    if _job_mode_requested():
+        return _submit_background_job('transaction', run_transaction_analysis,
+                                      (file_path, filename, digest), TRANSACTION_STAGES)
+    
+    # 处理文件并生成分析结果（run_transaction_analysis结束后会清理临时文件）
+    try:
+        response_data = run_transaction_analysis(file_path, filename, digest)
+        record_timings(response_data['timings'])
+        return jsonify(_with_optional_timings(response_data))
+    except Exception as e:
+        return _transaction_error_response(e)
+
 @app.route('/api/health', methods=['GET'])
 def health_check() -> Dict[str, str]:
     """健康检查接口"""
     return jsonify({'status': 'ok', 'message': '后端API服务正常运行'})
 
+def _receive_upload() -> Tuple[Optional[Tuple[str, str, str]], Optional[Tuple[Dict[str, Any], int]]]:
+    """接收表单中的单个Excel文件，返回(保存路径, 文件名, 内容摘要)或错误响应"""
+    # 检查是否有文件上传
+    if 'file' not in request.files:
+        return None, (jsonify({'error': '请选择要上传的文件'}), 400)
+    
+    file = request.files['file']
+    if file.filename == '':
+        return None, (jsonify({'error': '请选择要上传的文件'}), 400)
+    
+    # 检查文件格式
+    if not file or not allowed_file(file.filename):
+        return None, (jsonify({'error': '只支持Excel文件格式(.xlsx, .xls)'}), 400)
+    
+    # 保存文件（接收时已流式写入上传目录，并同时计算内容摘要）
+    filename = secure_filename(file.filename)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_filename = f"{timestamp}_{filename}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    
+    try:
+        _, digest = save_upload(file, file_path)
+    except Exception as e:
+        return None, (jsonify({'error': '文件保存失败，请重试'}), 500)
+    return (file_path, filename, digest), None
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file() -> Tuple[Dict[str, Any], int]:
     """流水分析文件上传接口"""
     try:
-        # 检查是否有文件上传
-        if 'file' not in request.files:
-            return jsonify({'error': '请选择要上传的文件'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': '请选择要上传的文件'}), 400
-        
-        # 检查文件格式
-        if not file or not allowed_file(file.filename):
-            return jsonify({'error': '只支持Excel文件格式(.xlsx, .xls)'}), 400
-        
-        # 检查文件大小
-        if len(file.read()) > app.config['MAX_CONTENT_LENGTH']:
-            return jsonify({'error': '文件过大，请上传小于16MB的文件'}), 400
-        
-        # 重置文件指针
-        file.seek(0)
-        
-        # 保存文件
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        upload, error = _receive_upload()
+        if error is not None:
+            return error
         
+        return _start_transaction_analysis(*upload)
+                
+    except RequestEntityTooLarge as e:
+        return api_file_too_large(e)
+    except Exception as e:
+        return jsonify({'error': f'系统错误: {str(e)}'}), 500
+
+@app.route('/api/accounts/<account_id>/statements', methods=['POST'])
+def append_account_statement(account_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    增量分析：把新的流水文件合并到账户的累计聚合状态，返回更新后的完整分析结果
+    响应与/api/upload相同，另含account（已合并的文件、日期范围）和appended；支持mode=job
+    """
+    try:
         try:
-            file.save(file_path)
-        except Exception as e:
-            return jsonify({'error': '文件保存失败，请重试'}), 500
+            validate_account_id(account_id)
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
         
-        # 处理文件并生成分析结果
+        upload, error = _receive_upload()
+        if error is not None:
+            return error
+        file_path, filename, digest = upload
+        
+        if _job_mode_requested():
+            return _submit_background_job('transaction', run_account_append,
+                                          (file_path, filename, digest, account_id), TRANSACTION_STAGES)
         try:
-            result = process_transaction_data(file_path, filename)
-            
-            # 转换结果为JSON可序列化格式
-            response_data = {
-                'message': '文件分析完成！',
-                'filename': filename,
-                'report_file': result['report_file'],
-                'chart_files': result['chart_files'],
-                'total_stats': result['total_stats'].to_dict('records'),
-                'counterparty_stats': result['counterparty_stats'].head(10).to_dict('records'),
-                'transaction_type_stats': result['transaction_type_stats'].to_dict('records'),
-                'channel_stats': result['channel_stats'].to_dict('records'),
-                'daily_transactions': result['daily_transactions'].to_dict('records'),
-                'hourly_stats': result['hourly_stats'].to_dict('records')
-            }
-            
-            return jsonify(response_data)
-            
-        except FileNotFoundError:
-            return jsonify({'error': '找不到上传的文件，请重新上传'}), 404
-        except pd.errors.EmptyDataError:
-            return jsonify({'error': 'Excel文件为空或格式不正确'}), 400
-        except (pd.errors.ParserError, ValueError) as e:
-            if 'Excel' in str(e) or 'workbook' in str(e).lower():
-                return jsonify({'error': 'Excel文件损坏或格式不正确'}), 400
-            else:
-                return jsonify({'error': f'数据格式错误: {str(e)}，请检查文件内容'}), 400
-        except KeyError as e:
-            return jsonify({'error': f'Excel文件缺少必要的列: {str(e)}，请检查文件格式'}), 400
+            response_data = run_account_append(file_path, filename, digest, account_id)
+            record_timings(response_data['timings'])
+            return jsonify(_with_optional_timings(response_data))
         except Exception as e:
-            return jsonify({'error': f'文件处理出现意外错误: {str(e)}'}), 500
-        finally:
-            # 清理临时文件
-            try:
-                if os.path.exists(file_path):   
-                    os.remove(file_path)
-            except:
-                pass
+            return _transaction_error_response(e)
                 
+    except RequestEntityTooLarge as e:
+        return api_file_too_large(e)
     except Exception as e:
         return jsonify({'error': f'系统错误: {str(e)}'}), 500
 
+@app.route('/api/accounts/<account_id>', methods=['GET'])
+def get_account(account_id: str) -> Tuple[Dict[str, Any], int]:
+    """查询账户累计状态：已合并的文件、总行数、日期范围和最新的analysis_id"""
+    try:
+        state = load_account_state(account_id)
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    if state is None:
+        return jsonify({'error': '账户不存在，请先上传流水'}), 404
+    return jsonify(account_summary(state))
+
+@app.route('/api/accounts/<account_id>', methods=['DELETE'])
+def delete_account(account_id: str) -> Tuple[Dict[str, Any], int]:
+    """删除账户的累计状态，之后的追加从头开始"""
+    try:
+        if not delete_account_state(account_id):
+            return jsonify({'error': '账户不存在'}), 404
+        # 交易明细存储中以账户标识为数据集的记录一并删除，避免重新追加时被当作已写入
+        if store_enabled():
+            delete_dataset(account_id)
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    return jsonify({'message': '账户累计状态已删除', 'account_id': account_id})
+
 @app.route('/api/upload_network', methods=['POST'])
 def upload_network_files() -> Tuple[Dict[str, Any], int]:
     """网络分析文件上传接口"""
@@ -126,78 +329,321 @@ def upload_network_files() -> Tuple[Dict[str, Any], int]:
         if not files or all(file.filename == '' for file in files):
             return jsonify({'error': '请选择要上传的文件'}), 400
         
-        # 创建临时文件夹
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], f"network_{timestamp}")
+        # 读取节点上限和金额阈值参数
+        try:
+            network_options = _network_options()
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+        
+        # 创建临时文件夹（名称带随机后缀，同一秒内的多次上传互不覆盖）
+        network_name = f"network_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
+        temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], network_name)
         os.makedirs(temp_folder, exist_ok=True)
         
-        # 保存所有文件
+        # 保存所有文件；保存失败或提前返回时删除已保存的文件
         saved_files = []
-        for file in files:
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                file_path = os.path.join(temp_folder, filename)
-                file.save(file_path)
-                saved_files.append(filename)
-            elif file.filename != '':
-                return jsonify({'error': f'文件 {file.filename} 格式不支持，只支持Excel文件'}), 400
+        try:
+            for file in files:
+                if file and file.filename != '' and allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
+                    file_path = os.path.join(temp_folder, filename)
+                    save_upload(file, file_path)
+                    saved_files.append(filename)
+                elif file.filename != '':
+                    _cleanup_upload(temp_folder)
+                    return jsonify({'error': f'文件 {file.filename} 格式不支持，只支持Excel文件'}), 400
+        except BaseException:
+            _cleanup_upload(temp_folder)
+            raise
         
         if not saved_files:
+            _cleanup_upload(temp_folder)
             return jsonify({'error': '没有有效的Excel文件'}), 400
         
-        # 处理网络数据
+        # 任务模式：提交到后台进程池，立即返回任务ID
+        if _job_mode_requested():
+            return _submit_background_job('network', run_network_analysis,
+                                          (temp_folder, network_name, saved_files,
+                                           app.config['NETWORK_LOAD_WORKERS'], network_options),
+                                          NETWORK_STAGES)
+        
+        # 处理网络数据（run_network_analysis结束后会清理临时文件夹）
         try:
-            result = process_network_data(temp_folder, f"network_{timestamp}")
-            print(result)
-            # 转换结果为JSON可序列化格式
-            response_data = {
-                'message': '网络图分析完成！',
-                'html_file': result['html_file'],
-                'node_count': result['node_count'],
-                'edge_count': result['edge_count'],
-                'filename': result['filename'],
-                'stats': result['stats'],
-                'network_analysis': result['network_analysis'],
-                'uploaded_files': saved_files
-            }
-            
-            return jsonify(response_data)
-            
+            response_data = run_network_analysis(temp_folder, network_name, saved_files,
+                                                 app.config['NETWORK_LOAD_WORKERS'], network_options)
+            record_timings(response_data['timings'])
+            return jsonify(_with_optional_timings(response_data))
         except Exception as e:
-            return jsonify({'error': f'网络图处理出现错误: {str(e)}'}), 500
-        finally:
-            # 清理临时文件夹
-            try:
-                import shutil
-                if os.path.exists(temp_folder):
-                    shutil.rmtree(temp_folder)
-            except:
-                pass
+            return _network_error_response(e)
                 
+    except RequestEntityTooLarge as e:
+        return api_file_too_large(e)
+    except Exception as e:
+        return jsonify({'error': f'系统错误: {str(e)}'}), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def create_chunked_upload() -> Tuple[Dict[str, Any], int]:
+    """
+    创建分块上传会话，参数：filename（文件名）、size（文件总字节数）
+    """
+    try:
+        data = request.get_json(silent=True) or request.values
+        filename = secure_filename(data.get('filename', ''))
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': '只支持Excel文件格式(.xlsx, .xls)'}), 400
+        try:
+            size = int(data.get('size', 0))
+            session = create_upload_session(filename, size)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+        
+        session['upload_url'] = f"/api/uploads/{session['upload_id']}"
+        session['complete_url'] = f"/api/uploads/{session['upload_id']}/complete"
+        return jsonify(session), 201
+    except Exception as e:
+        return jsonify({'error': f'系统错误: {str(e)}'}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id: str) -> Tuple[Dict[str, Any], int]:
+    """查询分块上传进度，断线续传时从返回的offset继续"""
+    try:
+        return jsonify(upload_status(upload_id))
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT', 'PATCH'])
+def put_chunk(upload_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    上传一个分块，请求体为原始字节，起始位置由查询参数offset或请求头Upload-Offset指定
+    """
+    try:
+        raw_offset = request.args.get('offset', request.headers.get('Upload-Offset', ''))
+        try:
+            offset = int(raw_offset)
+        except ValueError:
+            return jsonify({'error': '参数错误: 缺少分块起始位置offset'}), 400
+        
+        session = append_chunk(upload_id, offset, request.stream)
+        return jsonify(session)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except UploadOffsetError as e:
+        return jsonify({'error': str(e), 'offset': e.expected}), 409
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'系统错误: {str(e)}'}), 500
 
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    完成分块上传并开始流水分析，支持mode=job以后台任务方式处理
+    """
+    try:
+        try:
+            session = upload_status(upload_id)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{session['filename']}")
+            session, digest = complete_upload(upload_id, file_path)
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return _start_transaction_analysis(file_path, session['filename'], digest)
+    except Exception as e:
+        return jsonify({'error': f'系统错误: {str(e)}'}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id: str) -> Tuple[Dict[str, Any], int]:
+    """查询后台任务状态和阶段进度"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id: str) -> Tuple[Dict[str, Any], int]:
+    """获取后台任务的分析结果，未完成时返回202"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    
+    future = job['future']
+    if not future.done():
+        return jsonify(job_status(job)), 202
+    
+    error = future.exception()
+    if error is not None:
+        if job['kind'] == 'transaction':
+            return _transaction_error_response(error)
+        return _network_error_response(error)
+    
+    return jsonify(_with_optional_timings(future.result()))
+
+@app.route('/api/analyses/<analysis_id>/tables/<table>', methods=['GET'])
+def get_analysis_table(analysis_id: str, table: str) -> Tuple[Dict[str, Any], int]:
+    """
+    分页查询保存的分析表（counterparty_stats、transaction_type_stats、channel_stats、
+    daily_transactions、hourly_stats、total_stats）
+    查询参数：page、page_size、sort（任意列名）、order（asc/desc）、name（键列包含）、
+    min_amount/max_amount、amount_column
+    """
+    try:
+        result = load_result(analysis_id)
+        if result is None:
+            return jsonify({'error': '分析结果不存在或已过期，请重新上传文件'}), 404
+        try:
+            return jsonify(query_table(analysis_id, result, table, request.args))
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'查询失败: {str(e)}'}), 500
+
+@app.route('/api/analyses/<analysis_id>/counterparties', methods=['GET'])
+def get_counterparties(analysis_id: str) -> Tuple[Dict[str, Any], int]:
+    """分页查询交易对手统计，参数同/api/analyses/<analysis_id>/tables/counterparty_stats"""
+    return get_analysis_table(analysis_id, 'counterparty_stats')
+
+def _store_unavailable() -> Optional[Tuple[Dict[str, Any], int]]:
+    """交易明细存储未开启时返回错误响应"""
+    if not store_enabled():
+        return jsonify({'error': '交易明细存储未开启（TRANSACTION_STORE_ENABLED=1）'}), 404
+    return None
+
+@app.route('/api/store/datasets', methods=['GET'])
+def get_store_datasets() -> Tuple[Dict[str, Any], int]:
+    """列出交易明细存储中的数据集"""
+    error = _store_unavailable()
+    if error is not None:
+        return error
+    return jsonify({'datasets': list_datasets()})
+
+@app.route('/api/store/<dataset>/transactions', methods=['GET'])
+def get_store_transactions(dataset: str) -> Tuple[Dict[str, Any], int]:
+    """
+    分页查询交易明细
+    查询参数：counterparty、counterparty_like、date_from、date_to、min_amount、max_amount、
+    direction、type、channel、sort（time/amount/counterparty，前缀'-'降序）、page、page_size
+    """
+    error = _store_unavailable()
+    if error is not None:
+        return error
+    try:
+        return jsonify(query_transactions(dataset, request.args))
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'查询失败: {str(e)}'}), 500
+
+@app.route('/api/store/<dataset>/aggregate', methods=['GET'])
+def get_store_aggregate(dataset: str) -> Tuple[Dict[str, Any], int]:
+    """
+    按维度汇总交易明细，group_by为counterparty/date/month/hour/type/channel/direction，
+    筛选参数与明细查询相同，limit限制返回的分组数
+    """
+    error = _store_unavailable()
+    if error is not None:
+        return error
+    try:
+        return jsonify(aggregate_transactions(dataset, request.args.get('group_by', 'counterparty'),
+                                              request.args))
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'查询失败: {str(e)}'}), 500
+
+@app.route('/api/store/<dataset>', methods=['DELETE'])
+def delete_store_dataset(dataset: str) -> Tuple[Dict[str, Any], int]:
+    """删除数据集的全部交易明细"""
+    error = _store_unavailable()
+    if error is not None:
+        return error
+    try:
+        return jsonify({'dataset': dataset, 'deleted_rows': delete_dataset(dataset)})
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+
+# 按需生成的报告文件名：<分析ID>_report.xlsx
+REPORT_NAME_PATTERN = re.compile(r'^([0-9a-f]{8,64})_report\.xlsx$')
+
 @app.route('/api/download/<filename>')
 def download_file(filename: str):
-    """文件下载接口"""
+    """
+    文件下载接口，分析报告在首次下载时生成并缓存
+    查询参数：format（xlsx/csv/parquet），csv和parquet为每个工作表一个文件的zip压缩包
+    """
     try:
-        file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
-        if not os.path.exists(file_path):
-            return jsonify({'error': '请求的文件不存在'}), 404
-        
-        return send_file(file_path, as_attachment=True)
+        match = REPORT_NAME_PATTERN.match(filename)
+        if not match:
+            # 兼容已生成的报告文件
+            file_path = os.path.join(app.config['OUTPUT_FOLDER'], secure_filename(filename))
+            if not os.path.exists(file_path):
+                return jsonify({'error': '请求的文件不存在'}), 404
+            return send_file(os.path.abspath(file_path), as_attachment=True)
+        analysis_id = match.group(1)
+        fmt = request.args.get('format', 'xlsx')
+
+        result = load_result(analysis_id)
+        if result is None:
+            return jsonify({'error': '分析结果不存在或已过期，请重新上传文件'}), 404
+
+        try:
+            report_path = get_or_build_report(analysis_id, result['tables'], fmt)
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+
+        # 下载文件名沿用上传时的文件名
+        extension, mimetype = REPORT_FORMATS[fmt]
+        download_name = f"{os.path.splitext(result['filename'])[0]}_report.{extension}"
+        return send_file(os.path.abspath(report_path), mimetype=mimetype,
+                         as_attachment=True, download_name=download_name)
     except Exception as e:
         return jsonify({'error': f'文件下载失败: {str(e)}'}), 500
 
+# 按需渲染的图表文件名：<分析ID>_<图表名称>[.png|.svg]
+CHART_NAME_PATTERN = re.compile(r'^([0-9a-f]{8,64})_(main_analysis|hourly_analysis)(?:\.(png|svg))?$')
+
 @app.route('/api/charts/<filename>')
 def get_chart(filename: str):
-    """获取图表文件"""
+    """
+    获取图表文件，首次请求时按分析结果渲染并缓存
+    查询参数：format（png/svg/preview）、dpi、width、height（英寸）
+    """
     try:
-        file_path = os.path.join('static/charts', filename)
-        if not os.path.exists(file_path):
+        file_path = os.path.join('static/charts', secure_filename(filename))
+        if os.path.exists(file_path):
+            return send_file(file_path)
+
+        match = CHART_NAME_PATTERN.match(filename)
+        if not match:
             return jsonify({'error': '请求的图表不存在'}), 404
-        
-        return send_file(file_path)
+        analysis_id, name, extension = match.groups()
+
+        result = load_result(analysis_id)
+        if result is None:
+            return jsonify({'error': '分析结果不存在或已过期，请重新上传文件'}), 404
+
+        from charts import CHART_FORMATS, CHART_RENDERERS, resolve_chart_options, submit_chart
+        try:
+            fmt = request.args.get('format', extension or 'png')
+            dpi = request.args.get('dpi', type=int)
+            width = request.args.get('width', type=float)
+            height = request.args.get('height', type=float)
+            dpi, figsize = resolve_chart_options(name, fmt, dpi, width, height)
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+
+        future = submit_chart(analysis_id, name, result['chart_data'], fmt, dpi, figsize)
+        if width is None and height is None:
+            # 前端通常会接着请求同一分析的其他图表，按相同格式和分辨率并行预渲染
+            for other in CHART_RENDERERS:
+                if other != name:
+                    submit_chart(analysis_id, other, result['chart_data'], fmt, dpi)
+        chart_path = future.result()
+        return send_file(os.path.abspath(chart_path), mimetype=CHART_FORMATS[fmt])
     except Exception as e:
         return jsonify({'error': f'图表获取失败: {str(e)}'}), 500
 
@@ -213,6 +659,92 @@ def get_network(filename: str):
     except Exception as e:
         return jsonify({'error': f'网络图获取失败: {str(e)}'}), 500
 
+@app.route('/api/networks/<network_id>/groups/<group>', methods=['GET'])
+def expand_network_group(network_id: str, group: str) -> Tuple[Dict[str, Any], int]:
+    """
+    展开摘要网络图中的超级节点：group为超级节点路径（如c3、c3.1），root为顶层
+    返回其成员划分后的下一层节点和边，与其他节点的往来汇总到外部节点，节点数不超过上传时的node_limit
+    """
+    try:
+        result = load_result(network_id)
+        if result is None or result.get('kind') != 'network' or result['root_groups'] is None:
+            return jsonify({'error': '网络图摘要不存在或已过期，请以graph_mode=summary重新上传文件'}), 404
+        
+        # 社区检测依赖networkx，首次使用时才导入
+        from graph_summary import build_group_view, view_records
+        try:
+            view = build_group_view(result['grouped'], group, result['node_limit'], result['root_groups'])
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+        return jsonify({**view_records(view), 'network_id': network_id})
+    except Exception as e:
+        return jsonify({'error': f'网络图展开失败: {str(e)}'}), 500
+
+def _load_flow_index(network_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[Dict[str, Any], int]]]:
+    """读取网络分析保存的资金流向索引，不存在时返回错误响应"""
+    result = load_result(network_id)
+    if result is None or result.get('kind') != 'network':
+        return None, (jsonify({'error': '网络分析结果不存在或已过期，请重新上传文件'}), 404)
+    if result['flow_index'] is None:
+        return None, (jsonify({'error': '该网络分析没有资金流向数据（缺少证件号码列）'}), 404)
+    return result['flow_index'], None
+
+@app.route('/api/networks/<network_id>/paths', methods=['GET'])
+def trace_network_paths(network_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    资金路径追踪：查找从source到target的资金流转路径
+    查询参数：source、target（证件号码或对方户名）、max_hops、min_amount（每条边的最低金额）、limit、time_budget
+    """
+    try:
+        index, error = _load_flow_index(network_id)
+        if error is not None:
+            return error
+        from flow_tracing import trace_paths
+        try:
+            source, target = request.args.get('source'), request.args.get('target')
+            if not source or not target:
+                raise ValueError('请指定source和target')
+            return jsonify(trace_paths(index, source, target, **_trace_options()))
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'路径追踪失败: {str(e)}'}), 500
+
+@app.route('/api/networks/<network_id>/cycles', methods=['GET'])
+def trace_network_cycles(network_id: str) -> Tuple[Dict[str, Any], int]:
+    """
+    资金回流（环路）检测：指定node时只查找经过该节点的环路，否则按流量从大到小查找全图的环路
+    查询参数：node、max_hops、min_amount、limit、time_budget
+    """
+    try:
+        index, error = _load_flow_index(network_id)
+        if error is not None:
+            return error
+        from flow_tracing import find_cycles
+        try:
+            return jsonify(find_cycles(index, request.args.get('node') or None, **_trace_options()))
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'环路检测失败: {str(e)}'}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus格式的指标：各分析阶段和各接口的耗时直方图"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def _start_request_timer() -> None:
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    if 'request_start' in g:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(endpoint, request.method, response.status_code,
+                        time.perf_counter() - g.request_start)
+    return response
+
 @app.errorhandler(404)
 def api_not_found(e) -> Tuple[Dict[str, str], int]:
     return jsonify({'error': 'API接口不存在'}), 404
@@ -223,7 +755,8 @@ def api_internal_error(e) -> Tuple[Dict[str, str], int]:
 
 @app.errorhandler(413)
 def api_file_too_large(e) -> Tuple[Dict[str, str], int]:
-    return jsonify({'error': '文件过大，请上传小于16MB的文件'}), 413
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'文件过大，请上传小于{limit_mb}MB的文件，或使用分块上传接口'}), 413
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    app.run(debug=True, port=5000, host='0.0.0.0', threaded=True)
\ No newline at end of file
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Callable, Tuple
+import numpy as np
+import pandas as pd
+import networkx as nx
+
+from synthetic_data import make_statement, write_statement_xlsx, write_network_files, XLSX_MAX_ROWS
+from ingestion import read_excel_columns, iter_excel_files, TRANSACTION_COLUMNS, NETWORK_COLUMNS
+from aggregation import build_aggregate_state
+from analysis import (preprocess_data, analyze_counterparties, calculate_total_stats,
+                      analyze_transaction_types, analyze_channels, analyze_daily_trends,
+                      analyze_hourly_trends)
+from charts import build_chart_data, render_chart, load_plotting, DEFAULT_DPI
+from reports import write_excel_report, write_csv_report
+from network_analysis import (limit_network_edges, create_network_graph, generate_network_stats,
+                              flow_graph_from_edges, analyze_flow_graph,
+                              DEFAULT_NODE_LIMIT, DEFAULT_MIN_AMOUNT)
+from network_partials import reduce_network_frame, merge_partial_stream
+from flow_tracing import build_flow_index
+from centrality import compute_centrality
+
+DEFAULT_SIZES = [10000, 100000, 500000, 2000000]
+# 超过该行数时不生成xlsx文件，跳过读取阶段（写入大文件本身非常耗时，且单个工作表有行数上限）
+DEFAULT_READ_MAX_ROWS = 200000
+
+TRANSACTION_STAGES = ['read', 'preprocess', 'aggregate_state', 'analyze_counterparties',
+                      'calculate_total_stats', 'analyze_transaction_types', 'analyze_channels',
+                      'analyze_daily_trends', 'analyze_hourly_trends', 'chart_data',
+                      'chart_main_analysis', 'chart_hourly_analysis', 'report_xlsx', 'report_csv']
+NETWORK_STAGES = ['read', 'reduce_merge', 'aggregate', 'network_html', 'network_stats', 'graph_build',
+                  'centrality', 'network_analysis', 'flow_index']
+
+def _measure(func: Callable[..., Any], repeat: int,
+             setup: Optional[Callable[[], tuple]] = None) -> Tuple[Any, List[float]]:
+    """
+    执行repeat次并返回最后一次的结果和每次耗时；setup的耗时不计入
+    """
+    result = None
+    runs = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        result = func(*args)
+        runs.append(time.perf_counter() - start)
+    return result, runs
+
+class StageRecorder:
+    """
+    收集各阶段耗时，只执行被选中的阶段
+    """
+
+    def __init__(self, pipeline: str, rows: int, repeat: int, stages: Optional[List[str]] = None):
+        self.pipeline = pipeline
+        self.rows = rows
+        self.repeat = repeat
+        self.stages = stages
+        self.results: List[Dict[str, Any]] = []
+
+    def wanted(self, stage: str) -> bool:
+        return self.stages is None or stage in self.stages
+
+    def run(self, stage: str, func: Callable[..., Any],
+            setup: Optional[Callable[[], tuple]] = None, force: bool = False) -> Any:
+        """
+        计时执行一个阶段；force为True时即使未选中也执行（后续阶段依赖其结果），但不记录
+        """
+        if not self.wanted(stage):
+            if not force:
+                return None
+            args = setup() if setup is not None else ()
+            return func(*args)
+
+        result, runs = _measure(func, self.repeat, setup)
+        median = statistics.median(runs)
+        self.results.append({
+            'pipeline': self.pipeline,
+            'stage': stage,
+            'rows': self.rows,
+            'seconds': round(median, 6),
+            'min_seconds': round(min(runs), 6),
+            'runs': [round(r, 6) for r in runs],
+            'rows_per_second': round(self.rows / median, 1) if median > 0 and self.rows else None
+        })
+        print(f'  {self.pipeline:<12} {stage:<26} {median:10.4f}秒')
+        return result
+
+def bench_transaction(df: pd.DataFrame, workdir: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    流水分析各阶段：读取、预处理、聚合、各analyze_*、图表渲染和报告生成
+    """
+    rows = len(df)
+    recorder = StageRecorder('transaction', rows, args.repeat, args.stages)
+
+    if rows <= min(args.read_max_rows, XLSX_MAX_ROWS) and recorder.wanted('read'):
+        path = write_statement_xlsx(df[TRANSACTION_COLUMNS], os.path.join(workdir, f'flow_{rows}.xlsx'))
+        raw = recorder.run('read', lambda: read_excel_columns(path, TRANSACTION_COLUMNS)[0])
+    else:
+        raw = df[TRANSACTION_COLUMNS]
+
+    # 预处理会修改传入的DataFrame，每次计时前复制一份
+    data = recorder.run('preprocess', preprocess_data, setup=lambda: (raw.copy(),), force=True)
+    state = recorder.run('aggregate_state', lambda: build_aggregate_state(data), force=True)
+
+    tables = {}
+    for stage, func in [('analyze_counterparties', analyze_counterparties),
+                        ('calculate_total_stats', calculate_total_stats),
+                        ('analyze_transaction_types', analyze_transaction_types),
+                        ('analyze_channels', analyze_channels),
+                        ('analyze_daily_trends', analyze_daily_trends),
+                        ('analyze_hourly_trends', analyze_hourly_trends)]:
+        tables[stage] = recorder.run(stage, lambda func=func: func(data, state), force=True)
+
+    chart_data = recorder.run('chart_data', lambda: build_chart_data(
+        data, tables['analyze_counterparties'], tables['analyze_transaction_types'],
+        tables['analyze_channels'], tables['analyze_daily_trends'],
+        tables['analyze_hourly_trends']), force=True)
+    # 绘图库在首次渲染时才导入，先加载以免导入耗时计入第一个图表
+    load_plotting()
+    for name in ['main_analysis', 'hourly_analysis']:
+        recorder.run(f'chart_{name}', lambda name=name: render_chart(name, chart_data, 'png', args.chart_dpi))
+
+    report_tables = {
+        'counterparty_stats': tables['analyze_counterparties'],
+        'total_stats': tables['calculate_total_stats'],
+        'transaction_type_stats': tables['analyze_transaction_types'],
+        'channel_stats': tables['analyze_channels'],
+        'daily_transactions': tables['analyze_daily_trends'],
+        'hourly_stats': tables['analyze_hourly_trends']
+    }
+    recorder.run('report_xlsx', lambda: write_excel_report(report_tables, os.path.join(workdir, 'report.xlsx')))
+    recorder.run('report_csv', lambda: write_csv_report(report_tables, os.path.join(workdir, 'report.csv.zip')))
+    return recorder.results
+
+def _network_chunks(df: pd.DataFrame, files: int) -> List[pd.DataFrame]:
+    """
+    按账户拆分为多个分块，与write_network_files生成的文件一致
+    """
+    accounts = df['证件号码'].unique()
+    return [df[df['证件号码'].isin(group)] for group in np.array_split(accounts, min(files, len(accounts)))]
+
+def bench_network(df: pd.DataFrame, workdir: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    网络分析各阶段，与process_network_data的流程一致：
+    逐个文件读取并归约为部分聚合后合并（read含解析；reduce_merge为内存中的分块，不含解析）、
+    过滤和限制节点、网络图生成、由合并后的边建图、中心性、完整的网络分析和路径追踪索引
+    """
+    rows = len(df)
+    recorder = StageRecorder('network', rows, args.repeat, args.stages)
+    network_df = df[NETWORK_COLUMNS]
+
+    if rows <= args.read_max_rows and recorder.wanted('read'):
+        folder = os.path.join(workdir, f'network_{rows}')
+        paths = write_network_files(network_df, folder, args.network_files)
+        recorder.run('read', lambda: merge_partial_stream(
+            partial for partial, _ in iter_excel_files(paths, NETWORK_COLUMNS, workers=args.load_workers,
+                                                       reduce=reduce_network_frame)))
+
+    # 归约会原地修改分块（对方户名为空时改为取现），每次计时前重新复制
+    chunks = _network_chunks(network_df, args.network_files)
+    merged = recorder.run(
+        'reduce_merge', lambda parts: merge_partial_stream(reduce_network_frame(part) for part in parts),
+        setup=lambda: ([chunk.copy() for chunk in chunks],), force=True)
+
+    grouped, all_parties = recorder.run(
+        'aggregate', lambda: limit_network_edges(merged['grouped'], args.node_limit, args.min_amount),
+        force=True)
+    recorder.run('network_html', lambda: create_network_graph(grouped, all_parties))
+    recorder.run('network_stats', lambda: generate_network_stats(grouped, all_parties))
+
+    centrality_options = {'mode': args.analytics_mode, 'sample_size': args.sample_size,
+                          'time_budget': args.time_budget}
+    build_graph = lambda: flow_graph_from_edges(merged['flow_edges'], merged['holders'], merged['counterparties'])
+    if recorder.wanted('centrality'):
+        G = recorder.run('graph_build', build_graph, force=True)
+        recorder.run('centrality', lambda: compute_centrality(G, **centrality_options))
+    else:
+        recorder.run('graph_build', build_graph)
+    recorder.run('network_analysis', lambda: analyze_flow_graph(build_graph(), centrality_options))
+    recorder.run('flow_index', lambda: build_flow_index(merged['flow_edges']))
+    return recorder.results
+
+# 启动耗时：新的解释器导入api并响应一次健康检查，PRELOAD_PIPELINES=1时同时预先导入全部分析流程
+STARTUP_SCRIPT = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+import api
+assert api.app.test_client().get('/api/health').status_code == 200
+print(','.join(m for m in ('matplotlib', 'seaborn', 'networkx', 'pyvis') if m in sys.modules))
+'''
+
+def _start_api(workdir: str, preload: bool) -> str:
+    """
+    在子进程中启动api（工作目录为临时目录，避免在源码目录下创建上传和输出目录），返回已加载的重量级库
+    """
+    env = dict(os.environ, PRELOAD_PIPELINES='1' if preload else '0')
+    completed = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, os.path.dirname(os.path.abspath(__file__))],
+                               cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return completed.stdout.strip()
+
+def bench_startup(workdir: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    服务启动耗时：默认的延迟导入（startup_lazy）与启动时预先导入全部分析流程（startup_preload）对比
+    """
+    recorder = StageRecorder('startup', 0, args.repeat, args.stages)
+    for stage, preload in [('startup_lazy', False), ('startup_preload', True)]:
+        loaded = recorder.run(stage, lambda preload=preload: _start_api(workdir, preload))
+        if loaded is not None:
+            print(f"  {'':<12} {'已加载':<26} {loaded or '无'}")
+    return recorder.results
+
+def _environment() -> Dict[str, Any]:
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'networkx': nx.__version__
+    }
+
+def compare_results(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                    threshold: float) -> List[Dict[str, Any]]:
+    """
+    按(流程, 阶段, 行数)与基准结果比较，返回耗时增加超过threshold比例的阶段
+    """
+    base = {(r['pipeline'], r['stage'], r['rows']): r['seconds'] for r in baseline}
+    regressions = []
+    print(f"\n{'流程':<12} {'阶段':<26} {'行数':>9} {'基准':>10} {'当前':>10} {'变化':>8}")
+    for r in current:
+        key = (r['pipeline'], r['stage'], r['rows'])
+        if key not in base or base[key] <= 0:
+            continue
+        ratio = r['seconds'] / base[key] - 1
+        flag = ' !' if ratio > threshold else ''
+        print(f"{r['pipeline']:<12} {r['stage']:<26} {r['rows']:>9} {base[key]:>10.4f} "
+              f"{r['seconds']:>10.4f} {ratio:>+7.1%}{flag}")
+        if ratio > threshold:
+            regressions.append({'pipeline': r['pipeline'], 'stage': r['stage'], 'rows': r['rows'],
+                                'baseline': base[key], 'seconds': r['seconds'], 'change': round(ratio, 4)})
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='流水分析和网络分析各阶段的性能基准测试')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='逗号分隔的行数列表')
+    parser.add_argument('--pipelines', default='transaction,network',
+                        help='要测试的流程（transaction、network，startup为服务启动耗时）')
+    parser.add_argument('--stages', default=None, help='只测试指定的阶段（逗号分隔），默认全部')
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数，结果取中位数')
+    parser.add_argument('--counterparty-ratio', type=float, default=0.05, help='交易对手数量占行数的比例')
+    parser.add_argument('--accounts', type=int, default=20, help='账户数量')
+    parser.add_argument('--density', type=float, default=1.0, help='每个账户交易过的对手比例')
+    parser.add_argument('--account-overlap', type=float, default=0.1, help='对手为其他账户持有人的比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--read-max-rows', type=int, default=DEFAULT_READ_MAX_ROWS,
+                        help='超过该行数时跳过Excel读取阶段')
+    parser.add_argument('--network-files', type=int, default=4, help='网络分析拆分的文件数')
+    parser.add_argument('--load-workers', type=int, default=None, help='并行读取的进程数')
+    parser.add_argument('--chart-dpi', type=int, default=DEFAULT_DPI, help='图表渲染分辨率')
+    parser.add_argument('--node-limit', type=int, default=DEFAULT_NODE_LIMIT)
+    parser.add_argument('--min-amount', type=float, default=DEFAULT_MIN_AMOUNT)
+    parser.add_argument('--analytics-mode', default='auto', choices=['auto', 'exact', 'approximate'])
+    parser.add_argument('--sample-size', type=int, default=256)
+    parser.add_argument('--time-budget', type=float, default=10.0)
+    parser.add_argument('--output', default='benchmark_results.json', help='结果输出的JSON文件')
+    parser.add_argument('--compare', default=None, help='用于比较的基准结果JSON文件')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='耗时增加超过该比例时视为性能退化')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    pipelines = [p.strip() for p in args.pipelines.split(',') if p.strip()]
+    args.stages = [s.strip() for s in args.stages.split(',')] if args.stages else None
+    benches = {'transaction': bench_transaction, 'network': bench_network}
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='east_benchmark_')
+    try:
+        if 'startup' in pipelines:
+            results.extend(bench_startup(workdir, args))
+        for rows in sizes:
+            start = time.perf_counter()
+            df = make_statement(rows, max(1, int(rows * args.counterparty_ratio)), args.accounts,
+                                args.density, args.account_overlap, seed=args.seed)
+            print(f'{rows}行模拟数据生成完成，耗时{time.perf_counter() - start:.2f}秒')
+            for pipeline in pipelines:
+                if pipeline in benches:
+                    results.extend(benches[pipeline](df, workdir, args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {'environment': _environment(), 'parameters': vars(args), 'results': results}
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f)['results'], args.threshold)
+        output['regressions'] = regressions
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已写入 {args.output}')
+    if regressions:
+        print(f'{len(regressions)}个阶段耗时增加超过{args.threshold:.0%}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+import io
+import os
+import threading
+import pandas as pd
+import numpy as np
+import warnings
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
+from instrumentation import observe_stage
+from frame_cache import evict_lru_files
+from aggregation import signed_amounts
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+warnings.filterwarnings('ignore')
+
+CHART_FOLDER = os.path.join('static', 'charts')
+
+# 图表缓存目录的容量上限，超过时按最近使用时间淘汰
+CHART_CACHE_MAX_BYTES = int(os.environ.get('CHART_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# 图表渲染线程数；图表使用独立的Figure对象而非pyplot全局状态，可在多个线程中同时渲染
+CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', 4))
+
+# 图表名称及默认尺寸（英寸）
+CHART_SIZES = {
+    'main_analysis': (20, 18),
+    'hourly_analysis': (16, 12)
+}
+
+# 输出格式：png为原始分辨率，preview为低分辨率预览图
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'preview': 'image/png'
+}
+DEFAULT_DPI = 300
+PREVIEW_DPI = 60
+MAX_DPI = 600
+
+# 请求的分辨率和尺寸取最接近的允许值，限制每次分析可能产生的缓存文件数
+CHART_DPIS = (60, 100, 150, 200, 300, 600)
+CHART_INCHES = (4, 8, 12, 16, 20, 24, 32, 40)
+
+def build_chart_data(df: pd.DataFrame, counterparty_stats: pd.DataFrame,
+                     transaction_type_stats: pd.DataFrame, channel_stats: pd.DataFrame,
+                     daily_transactions: pd.DataFrame, hourly_stats: pd.DataFrame) -> Dict[str, Any]:
+    """
+    提取绘图所需的数据，供按需渲染时使用（不保留完整的流水数据）
+    """
+    return assemble_chart_data(df['交易借贷标志'].value_counts().loc[lambda counts: counts > 0],
+                               signed_amounts(df), counterparty_stats, transaction_type_stats,
+                               channel_stats, daily_transactions, hourly_stats)
+
+def assemble_chart_data(debit_credit: pd.Series, amounts: np.ndarray, counterparty_stats: pd.DataFrame,
+                        transaction_type_stats: pd.DataFrame, channel_stats: pd.DataFrame,
+                        daily_transactions: pd.DataFrame, hourly_stats: pd.DataFrame) -> Dict[str, Any]:
+    """
+    由借贷笔数、带符号金额和各分析表组装绘图数据，增量分析时不需要原始流水
+    """
+    return {
+        'top_counterparties': counterparty_stats.head(10)[['对方户名', '总交易金额']],
+        'top_transaction_types': transaction_type_stats.head(5),
+        'top_channels': channel_stats.head(5),
+        'daily_transactions': daily_transactions,
+        'hourly_stats': hourly_stats,
+        'debit_credit': debit_credit,
+        'signed_amounts': amounts
+    }
+
+_render_lock = threading.Lock()
+_render_pool: Optional[ThreadPoolExecutor] = None
+_inflight: Dict[str, Future] = {}
+
+# matplotlib和seaborn导入耗时数秒，首次渲染图表时才加载，提取图表数据不依赖它们
+_plotting_lock = threading.Lock()
+_plotting: Optional[SimpleNamespace] = None
+
+def load_plotting() -> SimpleNamespace:
+    """
+    加载绘图库并设置中文字体，返回包含Figure、FigureCanvasAgg、sns、ticker的命名空间
+    """
+    global _plotting
+    with _plotting_lock:
+        if _plotting is None:
+            import matplotlib
+            matplotlib.use('Agg')  # 强制使用非交互式后端
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            import matplotlib.ticker as ticker
+            import seaborn as sns
+
+            # 设置中文字体支持
+            matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
+            matplotlib.rcParams['axes.unicode_minus'] = False
+            matplotlib.rcParams['figure.figsize'] = (25, 10)
+            _plotting = SimpleNamespace(Figure=Figure, FigureCanvasAgg=FigureCanvasAgg,
+                                        sns=sns, ticker=ticker)
+        return _plotting
+
+def _new_figure(figsize: Tuple[float, float]) -> 'Figure':
+    """
+    创建绑定Agg画布的独立Figure，不注册到pyplot，无需手动关闭
+    """
+    plotting = load_plotting()
+    fig = plotting.Figure(figsize=figsize)
+    plotting.FigureCanvasAgg(fig)
+    return fig
+
+def render_main_analysis(chart_data: Dict[str, Any], figsize: Tuple[float, float]) -> 'Figure':
+    """
+    主要分析图表
+    """
+    plotting = load_plotting()
+    sns, ticker = plotting.sns, plotting.ticker
+    fig = _new_figure(figsize)
+    axes = fig.subplots(3, 2)
+
+    # 交易对手金额分布（前10）
+    top_counterparties = chart_data['top_counterparties']
+    colors = ['green' if x > 0 else 'red' for x in top_counterparties['总交易金额']]
+    sns.barplot(x='总交易金额', y='对方户名', data=top_counterparties,
+                palette=colors, ax=axes[0, 0])
+    axes[0, 0].set_title('TOP10交易对手净交易金额')
+
+    # 交易类型分布
+    sns.barplot(x='交易次数', y='交易类型', data=chart_data['top_transaction_types'], ax=axes[0, 1])
+    axes[0, 1].set_title('TOP5交易类型次数')
+
+    # 每日交易趋势
+    daily_transactions = chart_data['daily_transactions']
+    axes[1, 0].plot(daily_transactions['核心交易日期'], daily_transactions['净流量'], 'b-o')
+    axes[1, 0].set_title('每日资金净流量趋势')
+    axes[1, 0].tick_params(axis='x', rotation=45)
+    axes[1, 0].yaxis.set_major_formatter(ticker.FuncFormatter(lambda x, pos: f'{x/10000:.1f}万'))
+    axes[1, 0].grid(True, linestyle='--', alpha=0.7)
+
+    # 交易渠道分布
+    sns.barplot(x='交易次数', y='交易渠道', data=chart_data['top_channels'], ax=axes[1, 1])
+    axes[1, 1].set_title('TOP5交易渠道使用次数')
+
+    # 借贷分布
+    debit_credit = chart_data['debit_credit']
+    axes[2, 0].pie(debit_credit, labels=debit_credit.index, autopct='%1.1f%%',
+                   colors=['#ff9999','#66b3ff'], startangle=90)
+    axes[2, 0].set_title('借贷交易比例')
+
+    # 金额分布直方图
+    sns.histplot(chart_data['signed_amounts'], bins=30, kde=True, ax=axes[2, 1])
+    axes[2, 1].set_title('交易金额分布')
+    axes[2, 1].axvline(0, color='r', linestyle='--')
+
+    fig.tight_layout()
+    return fig
+
+def render_hourly_analysis(chart_data: Dict[str, Any], figsize: Tuple[float, float]) -> 'Figure':
+    """
+    每小时分析图表
+    """
+    hourly_stats = chart_data['hourly_stats']
+    fig = _new_figure(figsize)
+    axes = fig.subplots(2, 2)
+
+    # 金额堆叠柱状图
+    axes[0, 0].bar(hourly_stats['交易小时'], hourly_stats['总收入'],
+                   color='#66c2a5', label='收入')
+    axes[0, 0].bar(hourly_stats['交易小时'], -hourly_stats['总支出'],
+                   color='#fc8d62', label='支出')
+    axes[0, 0].axhline(0, color='black', linewidth=0.5)
+    axes[0, 0].set_title('各小时收入支出金额对比')
+    axes[0, 0].legend()
+    axes[0, 0].grid(axis='y', linestyle='--', alpha=0.7)
+
+    # 净流量趋势线
+    axes[0, 1].plot(hourly_stats['交易小时'], hourly_stats['净流量'],
+                    'b-o', linewidth=2, markersize=6)
+    axes[0, 1].axhline(0, color='red', linestyle='--')
+    axes[0, 1].set_title('各小时资金净流量')
+    axes[0, 1].grid(True, linestyle='--', alpha=0.5)
+
+    # 交易次数柱状图
+    axes[1, 0].bar(hourly_stats['交易小时'], hourly_stats['收入次数'],
+                   color='#8da0cb', alpha=0.7, label='收入次数')
+    axes[1, 0].bar(hourly_stats['交易小时'], hourly_stats['支出次数'],
+                   color='#e78ac3', alpha=0.7, label='支出次数',
+                   bottom=hourly_stats['收入次数'])
+    axes[1, 0].set_title('各小时交易次数分布')
+    axes[1, 0].legend()
+    axes[1, 0].grid(axis='y', linestyle='--', alpha=0.5)
+
+    # 全天收入支出对比
+    total_income = hourly_stats['总收入'].sum()
+    total_expense = hourly_stats['总支出'].sum()
+    axes[1, 1].pie([total_income, total_expense],
+                   labels=[f'总收入\n{total_income:,.2f}', f'总支出\n{total_expense:,.2f}'],
+                   colors=['#66c2a5', '#fc8d62'], autopct='%1.1f%%')
+    axes[1, 1].set_title('全天收入支出总额对比')
+
+    fig.tight_layout()
+    return fig
+
+CHART_RENDERERS = {
+    'main_analysis': render_main_analysis,
+    'hourly_analysis': render_hourly_analysis
+}
+
+def chart_file_names(analysis_id: str) -> List[str]:
+    """
+    返回某次分析的图表文件名，访问/api/charts/<文件名>时按需渲染
+    """
+    return [f'{analysis_id}_{name}.png' for name in CHART_SIZES]
+
+def _nearest(value: float, allowed: Tuple[float, ...]) -> float:
+    """
+    取最接近的允许值，距离相同时取较小的值
+    """
+    return min(allowed, key=lambda candidate: (abs(candidate - value), candidate))
+
+def resolve_chart_options(name: str, fmt: str = 'png', dpi: Optional[int] = None,
+                          width: Optional[float] = None,
+                          height: Optional[float] = None) -> Tuple[int, Tuple[float, float]]:
+    """
+    校验并补全图表的分辨率和尺寸参数，并取最接近的允许值，非法时抛出ValueError
+    """
+    if name not in CHART_RENDERERS:
+        raise ValueError(f'不存在的图表: {name}')
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f'不支持的图表格式: {fmt}')
+
+    default_width, default_height = CHART_SIZES[name]
+    if dpi is None:
+        dpi = PREVIEW_DPI if fmt == 'preview' else DEFAULT_DPI
+    width = width or default_width
+    height = height or default_height
+    if not (10 <= dpi <= MAX_DPI) or not (1 <= width <= 40) or not (1 <= height <= 40):
+        raise ValueError(f'dpi需在10-{MAX_DPI}之间，宽高需在1-40英寸之间')
+    inches = tuple(sorted(set(CHART_INCHES) | {default_width, default_height}))
+    return (int(_nearest(dpi, CHART_DPIS)),
+            (float(_nearest(width, inches)), float(_nearest(height, inches))))
+
+def render_chart(name: str, chart_data: Dict[str, Any], fmt: str = 'png', dpi: int = DEFAULT_DPI,
+                 figsize: Optional[Tuple[float, float]] = None) -> bytes:
+    """
+    渲染单个图表并返回图片内容
+    """
+    fig = CHART_RENDERERS[name](chart_data, figsize or CHART_SIZES[name])
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='svg' if fmt == 'svg' else 'png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+def _get_render_pool() -> ThreadPoolExecutor:
+    global _render_pool
+    with _render_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=max(1, CHART_RENDER_WORKERS),
+                                              thread_name_prefix='chart-render')
+        return _render_pool
+
+def _render_to_file(cache_path: str, name: str, chart_data: Dict[str, Any], fmt: str,
+                    dpi: int, figsize: Tuple[float, float]) -> str:
+    with observe_stage('transaction', f'chart_{name}'):
+        content = render_chart(name, chart_data, fmt, dpi, figsize)
+    os.makedirs(CHART_FOLDER, exist_ok=True)
+    temp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, cache_path)
+    evict_lru_files(CHART_FOLDER, ('.png', '.svg'), CHART_CACHE_MAX_BYTES, keep=cache_path)
+    return cache_path
+
+def _forget_inflight(cache_path: str) -> None:
+    with _render_lock:
+        _inflight.pop(cache_path, None)
+
+def submit_chart(analysis_id: str, name: str, chart_data: Dict[str, Any], fmt: str = 'png',
+                 dpi: Optional[int] = None, figsize: Optional[Tuple[float, float]] = None) -> Future:
+    """
+    提交图表渲染任务，返回结果为缓存文件路径的Future
+    缓存键包含分析ID、图表名称、格式、分辨率和尺寸（均取允许值）；已缓存时直接返回，
+    同一缓存键正在渲染时复用该任务，避免并发请求重复渲染
+    """
+    dpi, figsize = resolve_chart_options(name, fmt, dpi, *(figsize or (None, None)))
+    extension = 'svg' if fmt == 'svg' else 'png'
+    cache_name = f'{analysis_id}_{name}_{fmt}_{dpi}dpi_{figsize[0]:g}x{figsize[1]:g}.{extension}'
+    cache_path = os.path.join(CHART_FOLDER, cache_name)
+
+    pool = _get_render_pool()
+    with _render_lock:
+        if cache_path in _inflight:
+            return _inflight[cache_path]
+        try:
+            # 命中缓存时更新修改时间，淘汰时按最近使用排序
+            os.utime(cache_path, None)
+            future = Future()
+            future.set_result(cache_path)
+            return future
+        except OSError:
+            pass
+        future = pool.submit(_render_to_file, cache_path, name, chart_data, fmt, dpi, figsize)
+        _inflight[cache_path] = future
+    # 渲染结束（含失败）后移除，失败的任务不会被后续请求复用
+    future.add_done_callback(lambda _: _forget_inflight(cache_path))
+    return future
+
+def get_or_render_chart(analysis_id: str, name: str, chart_data: Dict[str, Any], fmt: str,
+                        dpi: int, figsize: Tuple[float, float]) -> str:
+    """
+    返回缓存的图表文件路径，首次请求时渲染并写入缓存
+    """
+    return submit_chart(analysis_id, name, chart_data, fmt, dpi, figsize).result()
+
+def render_charts(analysis_id: str, chart_data: Dict[str, Any], fmt: str = 'png',
+                  dpi: Optional[int] = None) -> Dict[str, str]:
+    """
+    在线程池中并行渲染全部图表（默认尺寸），返回图表名称到缓存文件路径的映射
+    """
+    futures = {name: submit_chart(analysis_id, name, chart_data, fmt, dpi) for name in CHART_RENDERERS}
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,251 @@
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple
+try:
+    from scipy.sparse import csr_array
+    from scipy.sparse.csgraph import connected_components
+except ImportError:
+    csr_array = None
+
+# 路径追踪的默认参数
+DEFAULT_MAX_HOPS = 6  # 路径或环路的最大边数
+MAX_HOPS_LIMIT = 12  # 允许请求的最大边数
+DEFAULT_MAX_RESULTS = 100  # 最多返回的路径或环路数
+DEFAULT_TIME_BUDGET = 1.0  # 单次查询的时间预算（秒）
+
+# 每搜索这么多步检查一次时间预算
+_DEADLINE_CHECK_STEPS = 1024
+
+def build_flow_index(edges: pd.DataFrame) -> Dict[str, Any]:
+    """
+    将资金流向边表(source, target, weight)转换为CSR形式的正向和反向邻接数组
+    节点按总流量从大到小编号，每个节点的出边（入边）按金额从大到小排列，
+    搜索时金额低于阈值即可停止扫描该节点剩余的边，并优先找到金额大的路径
+    """
+    codes, nodes = pd.factorize(pd.concat([edges['source'], edges['target']], ignore_index=True))
+    n = len(nodes)
+    m = len(edges)
+    sources, targets = codes[:m], codes[m:]
+    weights = edges['weight'].to_numpy(dtype=np.float64)
+
+    # 按总流量（流入+流出）重新编号
+    flow = np.bincount(sources, weights, minlength=n) + np.bincount(targets, weights, minlength=n)
+    order = np.lexsort((np.arange(n), -flow))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    sources, targets = rank[sources], rank[targets]
+
+    def csr(rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        positions = np.lexsort((-weights, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return indptr, cols[positions].astype(np.int32), weights[positions]
+
+    out_ptr, out_idx, out_w = csr(sources, targets)
+    in_ptr, in_idx, in_w = csr(targets, sources)
+    return {
+        'nodes': pd.Index(nodes[order]),
+        'flow': flow[order],
+        'out_ptr': out_ptr, 'out_idx': out_idx, 'out_w': out_w,
+        'in_ptr': in_ptr, 'in_idx': in_idx, 'in_w': in_w
+    }
+
+def _node_id(index: Dict[str, Any], name: str) -> int:
+    """
+    节点名称转换为编号，不存在（或没有资金往来）时抛出ValueError
+    """
+    position = index['nodes'].get_indexer([name])[0]
+    if position < 0:
+        raise ValueError(f'节点不存在或没有资金往来: {name}')
+    return int(position)
+
+def _adjacency_lists(index: Dict[str, Any], direction: str) -> Tuple[List[int], List[int], List[float]]:
+    """
+    搜索在Python中逐个访问元素，使用列表比逐个读取numpy数组快；转换结果缓存在索引中
+    direction 为out（出边）或in（入边）
+    """
+    key = f'{direction}_lists'
+    if key not in index:
+        index[key] = (index[f'{direction}_ptr'].tolist(), index[f'{direction}_idx'].tolist(),
+                      index[f'{direction}_w'].tolist())
+    return index[key]
+
+def _hops_to(index: Dict[str, Any], goal: int, max_hops: int, min_amount: float, min_node: int = -1,
+             labels: Optional[List[int]] = None) -> Dict[int, int]:
+    """
+    反向按层BFS，返回max_hops条边内能到达goal的节点及其最少边数，用于剪枝
+    min_node、labels 限制只经过编号大于min_node、且与goal属于同一强连通分量的节点
+    """
+    ptr, idx, weights = _adjacency_lists(index, 'in')
+    dist = {goal: 0}
+    frontier = [goal]
+    for hop in range(1, max_hops + 1):
+        reached = []
+        for v in frontier:
+            for pos in range(ptr[v], ptr[v + 1]):
+                # 入边按金额降序排列，低于阈值后该节点剩余的边都不满足
+                if weights[pos] < min_amount:
+                    break
+                u = idx[pos]
+                if u in dist or u <= min_node or (labels is not None and labels[u] != labels[goal]):
+                    continue
+                dist[u] = hop
+                reached.append(u)
+        if not reached:
+            break
+        frontier = reached
+    return dist
+
+def _search(ptr: List[int], idx: List[int], weights: List[float], start: int, goal: int,
+            dist: Dict[int, int], max_hops: int, min_amount: float, limit: int, deadline: float,
+            min_node: int = -1) -> Tuple[List[Tuple[List[int], List[float]]], Optional[str]]:
+    """
+    从start出发深度优先搜索到goal的简单路径（start等于goal时为经过start的环路）
+    dist 为各节点到goal的最少边数，剩余边数不足时不再深入；min_node 限制只经过编号更大的节点
+    返回找到的(节点编号, 各边金额)列表和提前结束的原因（limit/time_budget，完整搜索时为None）
+    """
+    results = []
+    path = [start]
+    amounts: List[float] = []
+    on_path = {start}
+    stack = [ptr[start]]
+    steps = 0
+    while stack:
+        steps += 1
+        if steps % _DEADLINE_CHECK_STEPS == 0 and time.perf_counter() > deadline:
+            return results, 'time_budget'
+        u = path[-1]
+        pos = stack[-1]
+        # 出边按金额降序排列，低于阈值后该节点剩余的边都不满足
+        if pos >= ptr[u + 1] or weights[pos] < min_amount:
+            stack.pop()
+            on_path.discard(path.pop())
+            if amounts:
+                amounts.pop()
+            continue
+        stack[-1] = pos + 1
+        v = idx[pos]
+        hops = len(path)
+        if v == goal:
+            results.append((path + [v], amounts + [weights[pos]]))
+            if len(results) >= limit:
+                return results, 'limit'
+            continue
+        if v in on_path or v <= min_node or hops >= max_hops:
+            continue
+        remaining = dist.get(v)
+        if remaining is None or hops + remaining > max_hops:
+            continue
+        path.append(v)
+        on_path.add(v)
+        amounts.append(weights[pos])
+        stack.append(ptr[v])
+    return results, None
+
+def _path_records(index: Dict[str, Any], found: List[Tuple[List[int], List[float]]]) -> List[Dict[str, Any]]:
+    """
+    转换为节点名称，按瓶颈金额（路径上最小的边金额，即可能沿该路径流转的最大金额）从大到小排序
+    """
+    names = index['nodes']
+    records = [{
+        'nodes': [names[node] for node in nodes],
+        'amounts': amounts,
+        'hops': len(amounts),
+        'bottleneck': min(amounts)
+    } for nodes, amounts in found]
+    records.sort(key=lambda record: (-record['bottleneck'], record['hops']))
+    return records
+
+def _validate(max_hops: int, limit: int, time_budget: float) -> None:
+    if not (1 <= max_hops <= MAX_HOPS_LIMIT) or limit < 1 or time_budget <= 0:
+        raise ValueError(f'max_hops需在1-{MAX_HOPS_LIMIT}之间，limit和time_budget必须为正数')
+
+def trace_paths(index: Dict[str, Any], source: str, target: str, max_hops: int = DEFAULT_MAX_HOPS,
+                min_amount: float = 0, limit: int = DEFAULT_MAX_RESULTS,
+                time_budget: float = DEFAULT_TIME_BUDGET) -> Dict[str, Any]:
+    """
+    查找从source到target、不超过max_hops条边、每条边金额不低于min_amount的资金流转路径（简单路径）
+    达到limit条或超过时间预算时停止，truncated标明结果是否完整
+    """
+    _validate(max_hops, limit, time_budget)
+    start_time = time.perf_counter()
+    start, goal = _node_id(index, source), _node_id(index, target)
+    dist = _hops_to(index, goal, max_hops, min_amount)
+    found, reason = [], None
+    if start in dist:
+        ptr, idx, weights = _adjacency_lists(index, 'out')
+        found, reason = _search(ptr, idx, weights, start, goal, dist, max_hops, min_amount,
+                                limit, start_time + time_budget)
+    return {
+        'source': source,
+        'target': target,
+        'max_hops': max_hops,
+        'min_amount': min_amount,
+        'paths': _path_records(index, found),
+        'truncated': reason is not None,
+        'truncated_reason': reason,
+        'seconds': round(time.perf_counter() - start_time, 4)
+    }
+
+def _strong_components(index: Dict[str, Any], min_amount: float) -> np.ndarray:
+    """
+    金额不低于min_amount的边构成的强连通分量编号，环路只可能出现在同一分量内；未安装scipy时视为一个分量
+    """
+    n = len(index['nodes'])
+    if csr_array is None:
+        return np.zeros(n, dtype=np.int64)
+    ptr, idx, weights = index['out_ptr'], index['out_idx'], index['out_w']
+    rows = np.repeat(np.arange(n), np.diff(ptr))
+    keep = weights >= min_amount
+    graph = csr_array((np.ones(int(keep.sum())), (rows[keep], idx[keep])), shape=(n, n))
+    return connected_components(graph, directed=True, connection='strong')[1]
+
+def find_cycles(index: Dict[str, Any], node: Optional[str] = None, max_hops: int = DEFAULT_MAX_HOPS,
+                min_amount: float = 0, limit: int = DEFAULT_MAX_RESULTS,
+                time_budget: float = DEFAULT_TIME_BUDGET) -> Dict[str, Any]:
+    """
+    查找资金回流的简单环路（不超过max_hops条边，每条边金额不低于min_amount）
+    指定node时只查找经过该节点的环路；否则按总流量从大到小依次以各节点为起点，
+    每个环路只从其中编号最小（流量最大）的节点出发找到一次
+    """
+    _validate(max_hops, limit, time_budget)
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget
+    ptr, idx, weights = _adjacency_lists(index, 'out')
+
+    found: List[Tuple[List[int], List[float]]] = []
+    reason = None
+    if node is not None:
+        start = _node_id(index, node)
+        dist = _hops_to(index, start, max_hops, min_amount)
+        found, reason = _search(ptr, idx, weights, start, start, dist, max_hops, min_amount,
+                                limit, deadline)
+    else:
+        labels = _strong_components(index, min_amount)
+        sizes = np.bincount(labels)
+        # 自环（付款方与收款方相同）单独构成环路
+        rows = np.repeat(np.arange(len(labels)), np.diff(index['out_ptr']))
+        self_loops = np.zeros(len(labels), dtype=bool)
+        self_loops[rows[(index['out_idx'] == rows) & (index['out_w'] >= min_amount)]] = True
+        candidates = np.flatnonzero((sizes[labels] > 1) | self_loops).tolist()
+        labels = labels.tolist()
+        for start in candidates:
+            if time.perf_counter() > deadline:
+                reason = 'time_budget'
+                break
+            dist = _hops_to(index, start, max_hops, min_amount, start, labels)
+            cycles, reason = _search(ptr, idx, weights, start, start, dist, max_hops, min_amount,
+                                     limit - len(found), deadline, min_node=start)
+            found.extend(cycles)
+            if reason is not None:
+                break
+    return {
+        'node': node,
+        'max_hops': max_hops,
+        'min_amount': min_amount,
+        'cycles': _path_records(index, found),
+        'truncated': reason is not None,
+        'truncated_reason': reason,
+        'seconds': round(time.perf_counter() - start_time, 4)
+    }
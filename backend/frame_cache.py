@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple, Union
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# 预处理结构变化时递增，使旧缓存自动失效
+CACHE_VERSION = 3
+
+# 解析信息（原始行数、列数、格式错误的行）以JSON写入Parquet文件的键值元数据，
+# 不依赖DataFrame.attrs能否随Parquet保存（pandas 2.1之前不支持）
+METADATA_KEY = b'east_parse_info'
+
+# 缓存配置，可由api.py通过configure_frame_cache覆盖
+CACHE_SETTINGS = {
+    'folder': os.environ.get('FRAME_CACHE_FOLDER', os.path.join('cache', 'frames')),
+    'max_bytes': int(os.environ.get('FRAME_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024)),
+    'enabled': os.environ.get('FRAME_CACHE_ENABLED', '1') != '0'
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def configure_frame_cache(folder: Optional[str] = None, max_bytes: Optional[int] = None,
+                          enabled: Optional[bool] = None) -> None:
+    """
+    设置缓存目录、容量上限和开关
+    """
+    if folder is not None:
+        CACHE_SETTINGS['folder'] = folder
+    if max_bytes is not None:
+        CACHE_SETTINGS['max_bytes'] = int(max_bytes)
+    if enabled is not None:
+        CACHE_SETTINGS['enabled'] = bool(enabled)
+
+def cache_available() -> bool:
+    """
+    缓存是否可用（需要pyarrow支持Parquet读写）
+    """
+    return CACHE_SETTINGS['enabled'] and pyarrow is not None
+
+def file_digest(file_path: str) -> str:
+    """
+    分块计算上传文件内容的SHA-256摘要
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(CACHE_SETTINGS['folder'], f'{digest}_v{CACHE_VERSION}.parquet')
+
+def load_cached_frame(digest: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    按内容摘要读取已预处理的DataFrame及写入时保存的解析信息，未命中返回None
+    """
+    if not cache_available():
+        return None
+
+    path = _cache_path(digest)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = pyarrow.parquet.read_table(path)
+        metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+        df = table.to_pandas()
+        # 更新访问时间，作为LRU淘汰依据
+        os.utime(path, None)
+        return df, metadata
+    except Exception as e:
+        print(f"读取缓存失败，将重新解析: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+def store_cached_frame(digest: str, df: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    将预处理后的DataFrame以Parquet格式写入缓存，并按容量淘汰旧条目
+    metadata 为随文件保存的解析信息（需可序列化为JSON），命中缓存时原样返回
+    """
+    if not cache_available():
+        return
+
+    os.makedirs(CACHE_SETTINGS['folder'], exist_ok=True)
+    path = _cache_path(digest)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            METADATA_KEY: json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8')
+        })
+        pyarrow.parquet.write_table(table, temp_path)
+        os.replace(temp_path, path)
+    except Exception as e:
+        print(f"写入缓存失败: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+
+    evict_cache()
+
+def evict_cache(max_bytes: Optional[int] = None) -> List[str]:
+    """
+    按最近使用时间淘汰缓存文件，直到总大小不超过上限
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_SETTINGS['max_bytes']
+    return evict_lru_files(CACHE_SETTINGS['folder'], '.parquet', max_bytes)
+
+def evict_lru_files(folder: str, suffix: Union[str, Tuple[str, ...]], max_bytes: int,
+                    keep: Optional[str] = None) -> List[str]:
+    """
+    删除目录中最久未使用（修改时间最早）的指定后缀文件，直到总大小不超过上限
+    suffix 可以是多个后缀组成的元组；keep 为不删除的文件（如刚生成、即将返回的文件）
+    """
+    if not os.path.isdir(folder):
+        return []
+
+    entries = []
+    for name in os.listdir(folder):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            removed.append(os.path.basename(path))
+        except OSError:
+            pass
+    return removed
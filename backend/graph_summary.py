@@ -0,0 +1,216 @@
+import re
+import numpy as np
+import pandas as pd
+import networkx as nx
+from typing import Dict, List, Any, Optional
+try:
+    from community import community_louvain
+except ImportError:
+    community_louvain = None
+
+# Louvain的随机种子：固定后同一数据的划分结果不变，展开超级节点时可以重新计算下层划分
+LOUVAIN_SEED = 42
+
+# 顶层摘要的路径；超级节点路径为c<序号>，下层依次追加.<序号>，如c3.1
+ROOT_GROUP = 'root'
+GROUP_PATH_PATTERN = re.compile(r'^c\d+(\.\d+)*$')
+
+# 展开超级节点时，与其他节点之间的资金往来汇总到该节点
+EXTERNAL_NODE = 'external'
+
+# 超级节点说明中列出的成员数
+GROUP_SAMPLE_SIZE = 5
+
+# 摘要模式下每层至少需要的节点数：展开时需为外部节点预留一个位置
+MIN_SUMMARY_NODES = 3
+
+def detect_communities(G: nx.Graph, seed: Optional[int] = None) -> Dict[Any, int]:
+    """
+    Louvain社区检测，返回节点到社区编号的映射
+    优先使用python-louvain，未安装时使用networkx自带的实现
+    """
+    if community_louvain is not None:
+        return community_louvain.best_partition(G, random_state=seed)
+    communities = nx.community.louvain_communities(G, weight='weight', seed=seed)
+    return {node: cid for cid, nodes in enumerate(communities) for node in nodes}
+
+def party_flows(grouped: pd.DataFrame) -> pd.Series:
+    """
+    每个节点（账户名称或对方户名）的总交易金额，账户名称与对方户名相同的记录只计一次
+    """
+    amounts = grouped['交易金额']
+    flows = amounts.groupby(grouped['账户名称']).sum().add(
+        amounts.groupby(grouped['对方户名']).sum(), fill_value=0)
+
+    self_loops = grouped['账户名称'] == grouped['对方户名']
+    if self_loops.any():
+        flows = flows.sub(
+            amounts[self_loops].groupby(grouped.loc[self_loops, '账户名称']).sum(), fill_value=0)
+    return flows
+
+def _ranked_members(grouped: pd.DataFrame) -> List[str]:
+    """
+    全部节点按总交易金额从大到小排列（金额相同时按名称），作为划分和展示的顺序
+    """
+    flows = party_flows(grouped)
+    order = np.lexsort((flows.index.astype(str), -flows.to_numpy()))
+    return list(flows.index[order])
+
+def _partition_members(grouped: pd.DataFrame, members: List[str], limit: int,
+                       seed: int) -> List[List[str]]:
+    """
+    将成员划分为不超过limit个子集，成员不超过limit个时每个成员单独成为一个子集
+    按成员之间的交易（金额为权重，不分方向）做Louvain社区检测；社区过多时金额最小的社区合并为一个，
+    无法划分（只有一个社区）时金额最大的limit-1个成员单独列出，其余合并为一个
+    """
+    if len(members) <= limit:
+        return [[member] for member in members]
+
+    member_set = set(members)
+    source = grouped['账户名称']
+    target = grouped['对方户名']
+    inner = grouped[source.isin(member_set) & target.isin(member_set) & (source != target)]
+    a = inner['账户名称'].astype(str).to_numpy()
+    b = inner['对方户名'].astype(str).to_numpy()
+    pairs = pd.DataFrame({
+        'u': np.where(a < b, a, b),
+        'v': np.where(a < b, b, a),
+        'weight': inner['交易金额'].abs().to_numpy()
+    }).groupby(['u', 'v'], sort=False)['weight'].sum().reset_index()
+    G = nx.from_pandas_edgelist(pairs, 'u', 'v', edge_attr='weight')
+    G.add_nodes_from(members)
+
+    partition = detect_communities(G, seed)
+    communities: Dict[int, List[str]] = {}
+    for member in members:
+        communities.setdefault(partition[member], []).append(member)
+    if len(communities) == 1:
+        return [[member] for member in members[:limit - 1]] + [members[limit - 1:]]
+
+    # 社区按内部交易金额从大到小排列（相同时按金额最大的成员），成员保持按金额排序
+    rank = {member: i for i, member in enumerate(members)}
+    weights = dict(G.degree(weight='weight'))
+    groups = sorted(communities.values(),
+                    key=lambda group: (-sum(weights[member] for member in group), rank[group[0]]))
+    if len(groups) > limit:
+        merged = [member for group in groups[limit - 1:] for member in group]
+        groups = groups[:limit - 1] + [sorted(merged, key=rank.get)]
+    return groups
+
+def _validate_limit(node_limit: int) -> None:
+    if node_limit < MIN_SUMMARY_NODES:
+        raise ValueError(f'摘要模式的node_limit不能小于{MIN_SUMMARY_NODES}')
+
+def summary_groups(grouped: pd.DataFrame, node_limit: int, seed: int = LOUVAIN_SEED) -> List[List[str]]:
+    """
+    顶层划分：全部节点划分为不超过node_limit个超级节点或单独的节点
+    """
+    _validate_limit(node_limit)
+    return _partition_members(grouped, _ranked_members(grouped), node_limit, seed)
+
+def group_members(grouped: pd.DataFrame, group: str, node_limit: int,
+                  root_groups: Optional[List[List[str]]] = None, seed: int = LOUVAIN_SEED) -> List[str]:
+    """
+    返回超级节点的成员：从顶层划分开始逐层重新划分（结果确定），路径不存在时抛出ValueError
+    root_groups 为已保存的顶层划分，避免对全图重新做社区检测
+    """
+    _validate_limit(node_limit)
+    if group == ROOT_GROUP:
+        return _ranked_members(grouped)
+    if not GROUP_PATH_PATTERN.match(group):
+        raise ValueError(f'超级节点路径格式错误: {group}，应为root或c<序号>[.<序号>...]')
+
+    indices = [int(part) for part in group[1:].split('.')]
+    groups = root_groups if root_groups is not None else summary_groups(grouped, node_limit, seed)
+    for depth, index in enumerate(indices):
+        if index >= len(groups) or len(groups[index]) == 1:
+            raise ValueError(f'不存在的超级节点: {group}')
+        members = groups[index]
+        if depth + 1 < len(indices):
+            groups = _partition_members(grouped, members, node_limit - 1, seed)
+    return members
+
+def _node_record(node_id: str, members: List[str], path: Optional[str]) -> Dict[str, Any]:
+    if node_id == EXTERNAL_NODE:
+        return {'id': node_id, 'label': '外部', 'type': 'external', 'group': None, 'member_count': None}
+    if path is None:
+        return {'id': node_id, 'label': str(members[0]), 'type': 'party', 'group': None, 'member_count': 1}
+    return {
+        'id': node_id,
+        'label': f'{members[0]}等{len(members)}个',
+        'type': 'group',
+        'group': path,
+        'member_count': len(members),
+        'members_sample': members[:GROUP_SAMPLE_SIZE]
+    }
+
+def build_group_view(grouped: pd.DataFrame, group: str, node_limit: int,
+                     root_groups: Optional[List[List[str]]] = None,
+                     seed: int = LOUVAIN_SEED) -> Dict[str, Any]:
+    """
+    生成一层摘要：group的成员划分为子超级节点或单独的节点（不超过node_limit个，非顶层时含一个外部节点），
+    成员之间及与外部的全部交易按(起点, 借贷标志, 终点)汇总为边，金额合计与原始交易一致
+    子超级节点内部的交易汇总为自环，可通过展开该超级节点查看明细
+    """
+    members = group_members(grouped, group, node_limit, root_groups, seed)
+    if group == ROOT_GROUP:
+        groups = root_groups if root_groups is not None else summary_groups(grouped, node_limit, seed)
+        prefix = 'c'
+    else:
+        groups = _partition_members(grouped, members, node_limit - 1, seed)
+        prefix = f'{group}.'
+
+    node_of: Dict[str, str] = {}
+    nodes = []
+    for index, child in enumerate(groups):
+        path = f'{prefix}{index}' if len(child) > 1 else None
+        node_id = f'group:{path}' if path is not None else f'party:{child[0]}'
+        node_of.update((member, node_id) for member in child)
+        nodes.append(_node_record(node_id, child, path))
+
+    # 只保留与该层成员有关的交易，另一端不在成员中时记为外部节点
+    source = grouped['账户名称'].map(node_of)
+    target = grouped['对方户名'].map(node_of)
+    incident = source.notna() | target.notna()
+    level = pd.DataFrame({
+        '账户名称': source[incident].fillna(EXTERNAL_NODE).astype(str).to_numpy(),
+        '交易借贷标志': grouped.loc[incident, '交易借贷标志'].astype(str).to_numpy(),
+        '对方户名': target[incident].fillna(EXTERNAL_NODE).astype(str).to_numpy(),
+        '交易金额': grouped.loc[incident, '交易金额'].to_numpy()
+    })
+    edges = level.groupby(['账户名称', '交易借贷标志', '对方户名'], sort=False).agg(
+        交易金额=('交易金额', 'sum'), 关系数=('交易金额', 'size')).reset_index()
+    if (edges[['账户名称', '对方户名']] == EXTERNAL_NODE).any(axis=None):
+        nodes.append(_node_record(EXTERNAL_NODE, [], None))
+
+    # 每个节点的总金额（自环只计一次）及内部交易金额
+    flows = party_flows(edges)
+    internal = edges.loc[edges['账户名称'] == edges['对方户名']].groupby('账户名称')['交易金额'].sum()
+    for node in nodes:
+        node['flow'] = float(flows.get(node['id'], 0))
+        node['internal_flow'] = float(internal.get(node['id'], 0))
+
+    return {
+        'group': group,
+        'parent': None if group == ROOT_GROUP else (group.rsplit('.', 1)[0] if '.' in group else ROOT_GROUP),
+        'node_limit': node_limit,
+        'member_count': len(members),
+        'total_flow': float(edges['交易金额'].sum()),
+        'nodes': nodes,
+        'edges': edges
+    }
+
+def view_records(view: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    转换为JSON格式：边按资金流向给出from/to（借：账户名称到对方户名；贷：对方户名到账户名称）
+    """
+    edges = view['edges']
+    is_debit = (edges['交易借贷标志'] == '借').to_numpy()
+    records = pd.DataFrame({
+        'from': np.where(is_debit, edges['账户名称'], edges['对方户名']),
+        'to': np.where(is_debit, edges['对方户名'], edges['账户名称']),
+        'direction': edges['交易借贷标志'].to_numpy(),
+        'amount': edges['交易金额'].astype(float).to_numpy(),
+        'count': edges['关系数'].astype(int).to_numpy()
+    }).to_dict('records')
+    return {**view, 'edges': records}
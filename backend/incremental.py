@@ -0,0 +1,197 @@
+import os
+import re
+import time
+import pickle
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Callable, Iterator
+from aggregation import build_aggregate_state, merge_aggregate_states, sample_amounts, signed_amounts
+from analysis import load_transaction_frame, build_analysis_tables, store_analysis
+from charts import assemble_chart_data
+from instrumentation import StageTimings
+from transaction_store import store_enabled, store_transactions
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，只使用进程内的锁
+    fcntl = None
+
+# 增量分析状态的存储目录，可由api.py通过configure_account_store覆盖
+ACCOUNT_SETTINGS = {
+    'folder': os.environ.get('ACCOUNT_STATE_FOLDER', os.path.join('outputs', 'accounts'))
+}
+
+# 账户标识只允许字母、数字、下划线和连字符，避免拼接路径时越界
+ACCOUNT_ID_PATTERN = re.compile(r'^[0-9A-Za-z_-]{1,64}$')
+
+_lock = threading.Lock()
+_account_locks: Dict[str, threading.Lock] = {}
+
+def configure_account_store(folder: Optional[str] = None) -> None:
+    """
+    设置增量分析状态的存储目录
+    """
+    if folder is not None:
+        ACCOUNT_SETTINGS['folder'] = folder
+
+def validate_account_id(account_id: str) -> str:
+    """
+    校验账户标识，非法时抛出ValueError
+    """
+    if not ACCOUNT_ID_PATTERN.match(account_id or ''):
+        raise ValueError('账户标识只能包含字母、数字、下划线和连字符，长度不超过64')
+    return account_id
+
+def _state_path(account_id: str) -> str:
+    return os.path.join(ACCOUNT_SETTINGS['folder'], f'{account_id}.pkl')
+
+@contextmanager
+def _account_lock(account_id: str) -> Iterator[None]:
+    """
+    同一账户的追加操作串行执行：进程内用线程锁，后台任务的工作进程之间用文件锁
+    """
+    with _lock:
+        thread_lock = _account_locks.setdefault(account_id, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(ACCOUNT_SETTINGS['folder'], exist_ok=True)
+        with open(f'{_state_path(account_id)}.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_account_state(account_id: str) -> Optional[Dict[str, Any]]:
+    """
+    读取账户的累计聚合状态，不存在时返回None
+    """
+    path = _state_path(validate_account_id(account_id))
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def _save_account_state(account_id: str, state: Dict[str, Any]) -> None:
+    os.makedirs(ACCOUNT_SETTINGS['folder'], exist_ok=True)
+    path = _state_path(account_id)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def delete_account_state(account_id: str) -> bool:
+    """
+    删除账户的累计状态，之后的追加从头开始；返回是否存在
+    """
+    with _account_lock(validate_account_id(account_id)):
+        path = _state_path(account_id)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+def _analysis_id(account_id: str, files: List[Dict[str, Any]]) -> str:
+    """
+    分析ID由账户标识和已合并文件的摘要决定，相同的数据组合得到相同的ID
+    """
+    sha = hashlib.sha256(account_id.encode('utf-8'))
+    for record in files:
+        sha.update(record['digest'].encode('ascii'))
+    return sha.hexdigest()[:24]
+
+def account_summary(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    账户累计状态的概要：已合并的文件、总行数、日期范围和最新的分析ID
+    """
+    dates = state['aggregate']['keys']['核心交易日期']['uniques']
+    return {
+        'account_id': state['account_id'],
+        'analysis_id': state['analysis_id'],
+        'row_count': state['aggregate']['row_count'],
+        'first_date': str(pd.Timestamp(dates[0]).date()) if len(dates) else None,
+        'last_date': str(pd.Timestamp(dates[-1]).date()) if len(dates) else None,
+        'files': state['files'],
+        'updated_at': state['updated_at']
+    }
+
+def _report_stage(progress: Optional[Callable[[str], None]], stage: str) -> None:
+    """
+    汇报当前处理阶段
+    """
+    if progress is not None:
+        progress(stage)
+
+def append_statement(account_id: str, file_path: str, filename: str, digest: Optional[str] = None,
+                     progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    将新的流水文件合并到账户的累计聚合状态，并由合并后的状态重建全部分析表
+    只读取和聚合新文件，历史数据不再重新解析；已合并过的文件（内容摘要相同）不会重复计入
+    """
+    validate_account_id(account_id)
+    timings = StageTimings('transaction')
+    _report_stage(progress, 'read')
+
+    existing = load_account_state(account_id)
+    already_merged = (digest is not None and existing is not None and
+                      any(record['digest'] == digest for record in existing['files']))
+    parse_stats = []
+    partial = None
+    if not already_merged:
+        df, parse_info, digest = load_transaction_frame(file_path, filename, digest, timings)
+        parse_stats.append(parse_info)
+        _report_stage(progress, 'analyze')
+        with timings.stage('aggregate_state', len(df)):
+            partial = build_aggregate_state(df)
+            # 金额分布图只需要有上限的样本，累计状态不保存逐行金额
+            partial['amount_sample'] = sample_amounts(signed_amounts(df))
+        # 可选：以账户标识为数据集写入交易明细存储，已写入过的文件自动跳过
+        if store_enabled():
+            with timings.stage('transaction_store', len(df)):
+                store_transactions(account_id, digest, df)
+        del df
+    else:
+        _report_stage(progress, 'analyze')
+
+    with _account_lock(account_id):
+        state = load_account_state(account_id)
+        appended = partial is not None and (
+            state is None or all(record['digest'] != digest for record in state['files']))
+        if appended:
+            if state is None:
+                state = {'account_id': account_id, 'files': [], 'aggregate': partial}
+            else:
+                with timings.stage('merge_state', partial['row_count']):
+                    state['aggregate'] = merge_aggregate_states(state['aggregate'], partial)
+            state['files'].append({
+                'digest': digest,
+                'filename': filename,
+                'rows': partial['row_count'],
+                'malformed_rows': parse_stats[0]['malformed_rows']['count'],
+                'appended_at': time.time()
+            })
+            state['analysis_id'] = _analysis_id(account_id, state['files'])
+            state['updated_at'] = time.time()
+            _save_account_state(account_id, state)
+    if state is None:
+        raise FileNotFoundError('账户的累计状态已被删除，请重新上传')
+
+    # 分析表只由合并后的聚合状态生成，耗时与键值数量有关，与历史行数无关
+    tables = build_analysis_tables(state['aggregate'], timings)
+
+    _report_stage(progress, 'store')
+    with timings.stage('chart_data', state['aggregate']['row_count']):
+        debit_credit = pd.Series(state['aggregate']['totals']['flag_counts'], dtype=np.int64)
+        chart_data = assemble_chart_data(debit_credit, state['aggregate']['amount_sample']['values'],
+                                         tables['counterparty_stats'], tables['transaction_type_stats'],
+                                         tables['channel_stats'], tables['daily_transactions'],
+                                         tables['hourly_stats'])
+    result = store_analysis(state['analysis_id'], account_id, tables, chart_data, parse_stats, timings)
+    result['account'] = account_summary(state)
+    result['appended'] = appended
+    result['store_dataset'] = account_id if store_enabled() else None
+    return result
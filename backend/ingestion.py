@@ -0,0 +1,125 @@
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Callable, Iterator
+try:
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
+# 流水分析所需的列
+TRANSACTION_COLUMNS = ['交易借贷标志', '交易金额', '对方户名', '对方账号', '对方行名',
+                       '现转标志', '交易类型', '交易渠道', '核心交易日期', '核心交易时间']
+
+# 网络分析所需的列（证件号码为可选列）
+NETWORK_COLUMNS = ['账户名称', '证件号码', '交易借贷标志', '对方户名', '交易金额']
+
+# 预先声明的列类型，避免逐个单元格推断；核心交易日期可能是数值或日期，
+# 核心交易时间按整数参与时间戳计算，两者都保持自动推断
+COLUMN_DTYPES = {
+    '交易借贷标志': str,
+    '交易金额': float,
+    '对方户名': str,
+    '对方账号': str,
+    '对方行名': str,
+    '现转标志': str,
+    '交易类型': str,
+    '交易渠道': str,
+    '账户名称': str,
+    '证件号码': str
+}
+
+# 可通过环境变量指定解析引擎，例如 calamine / openpyxl
+DEFAULT_ENGINE = os.environ.get('EXCEL_ENGINE') or None
+
+# 多文件并行解析的默认进程数
+DEFAULT_LOAD_WORKERS = int(os.environ.get('NETWORK_LOAD_WORKERS', os.cpu_count() or 1))
+
+# 当前进程中并行解析文件的进程数上限，None为不限制；
+# 后台任务的工作进程中由jobs.py按工作进程数设置，避免进程数成为JOB_WORKERS × CPU核数
+LOAD_SETTINGS = {
+    'max_workers': None
+}
+
+def configure_loading(max_workers: Optional[int] = None) -> None:
+    """
+    设置当前进程中并行解析文件的进程数上限
+    """
+    LOAD_SETTINGS['max_workers'] = None if max_workers is None else max(1, int(max_workers))
+
+def resolve_engine(file_path: str, engine: Optional[str] = None) -> str:
+    """
+    选择Excel解析引擎：优先使用calamine，未安装时回退到openpyxl（.xls使用xlrd）
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine:
+        return engine
+    if python_calamine is not None:
+        return 'calamine'
+    return 'xlrd' if file_path.lower().endswith('.xls') else 'openpyxl'
+
+def read_excel_columns(file_path: str, columns: List[str],
+                       engine: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    只读取指定的列并按声明的类型解析，返回DataFrame和解析耗时信息
+    """
+    wanted = set(columns)
+    dtypes = {col: dtype for col, dtype in COLUMN_DTYPES.items() if col in wanted}
+    engine = resolve_engine(file_path, engine)
+
+    start = time.perf_counter()
+    df = pd.read_excel(file_path, usecols=lambda col: col in wanted,
+                       dtype=dtypes, engine=engine)
+    elapsed = time.perf_counter() - start
+
+    parse_info = {
+        'file': os.path.basename(file_path),
+        'engine': engine,
+        'rows': len(df),
+        'columns': len(df.columns),
+        'seconds': round(elapsed, 4)
+    }
+    print(f"读取 {parse_info['file']} 完成: {parse_info['rows']}行, "
+          f"引擎 {engine}, 耗时 {elapsed:.3f}秒")
+    return df, parse_info
+
+def _read_excel_task(args: Tuple[str, List[str], Optional[str], Optional[Callable[[pd.DataFrame], Any]]]
+                     ) -> Tuple[Any, Dict[str, Any]]:
+    file_path, columns, engine, reduce = args
+    df, parse_info = read_excel_columns(file_path, columns, engine)
+    if reduce is None:
+        return df, parse_info
+    # 在工作进程中归约，只把归约结果传回主进程，完整的DataFrame随任务结束释放
+    return reduce(df), parse_info
+
+def iter_excel_files(file_paths: List[str], columns: List[str], workers: Optional[int] = None,
+                     engine: Optional[str] = None,
+                     reduce: Optional[Callable[[pd.DataFrame], Any]] = None) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    使用进程池并行解析多个Excel文件，按输入顺序逐个返回(DataFrame或归约结果, 解析耗时信息)
+    进程数不超过LOAD_SETTINGS['max_workers']，为1时在当前进程中依次解析
+    reduce 为可选的归约函数（需可被pickle，即模块级函数），在工作进程中对每个文件的DataFrame执行
+    """
+    workers = min(workers or DEFAULT_LOAD_WORKERS, len(file_paths))
+    if LOAD_SETTINGS['max_workers'] is not None:
+        workers = min(workers, LOAD_SETTINGS['max_workers'])
+    tasks = [(path, columns, engine, reduce) for path in file_paths]
+
+    if workers <= 1:
+        for task in tasks:
+            yield _read_excel_task(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_read_excel_task, tasks)
+
+def read_excel_files(file_paths: List[str], columns: List[str], workers: Optional[int] = None,
+                     engine: Optional[str] = None) -> Tuple[List[pd.DataFrame], List[Dict[str, Any]]]:
+    """
+    使用进程池并行解析多个Excel文件，每个文件只保留所需的列
+    返回按输入顺序排列的DataFrame列表和解析耗时信息
+    """
+    results = list(iter_excel_files(file_paths, columns, workers, engine))
+    frames = [df for df, _ in results]
+    parse_stats = [info for _, info in results]
+    return frames, parse_stats
@@ -0,0 +1,169 @@
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+try:
+    import resource
+except ImportError:  # Windows没有resource模块，不记录内存峰值
+    resource = None
+
+# 直方图分桶（秒），与Prometheus客户端默认值一致并补充长耗时区间
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    当前进程的内存峰值（MB），Linux下ru_maxrss单位为KB，macOS下为字节
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024, 2)
+
+class StageTimings:
+    """
+    记录一次分析中各阶段的耗时、CPU时间、内存峰值和行数
+    CPU时间为执行该阶段的线程的CPU时间（time.thread_time），并发处理的其他请求不会计入；
+    不包含阶段内其他线程或子进程（如多文件并行解析的进程池）消耗的CPU时间
+    """
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        计时一个阶段；阶段内可通过 record['rows'] = n 补充处理的行数
+        """
+        record = {'stage': name, 'rows': rows}
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_seconds'] = round(time.thread_time() - cpu_start, 6)
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.stages.append(record)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'pipeline': self.pipeline,
+            'wall_seconds': round(time.perf_counter() - self._start, 6),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.stages
+        }
+
+class Histogram:
+    """
+    按标签分组的累积直方图，输出Prometheus文本格式
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            self._series[labels] = series
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['counts'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series['counts']):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+        return lines
+
+class Counter:
+    """
+    按标签分组的累加计数器
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], value: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self._values.items()):
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value:g}')
+        return lines
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+_lock = threading.Lock()
+STAGE_DURATION = Histogram('east_stage_duration_seconds', '分析各阶段的耗时（秒）', ('pipeline', 'stage'))
+STAGE_CPU = Counter('east_stage_cpu_seconds_total', '分析各阶段累计的线程CPU时间（秒）', ('pipeline', 'stage'))
+STAGE_ROWS = Counter('east_stage_rows_total', '分析各阶段累计处理的行数', ('pipeline', 'stage'))
+REQUEST_DURATION = Histogram('east_http_request_duration_seconds', 'API请求耗时（秒）',
+                             ('endpoint', 'method', 'status'))
+
+def record_timings(timings: Optional[Dict[str, Any]]) -> None:
+    """
+    将一次分析的阶段耗时计入全局指标（后台任务的结果回到主进程后调用）
+    """
+    if not timings:
+        return
+    pipeline = timings['pipeline']
+    with _lock:
+        for record in timings['stages']:
+            labels = (pipeline, record['stage'])
+            STAGE_DURATION.observe(labels, record['wall_seconds'])
+            STAGE_CPU.inc(labels, record['cpu_seconds'])
+            if record.get('rows') is not None:
+                STAGE_ROWS.inc(labels, record['rows'])
+
+@contextmanager
+def observe_stage(pipeline: str, stage: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    在当前进程中计时单个阶段并直接计入全局指标，用于按需渲染图表、生成报告等
+    """
+    timings = StageTimings(pipeline)
+    with timings.stage(stage, rows) as record:
+        yield record
+    record_timings(timings.as_dict())
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float) -> None:
+    with _lock:
+        REQUEST_DURATION.observe((endpoint, method, str(status)), seconds)
+
+def render_metrics() -> str:
+    """
+    以Prometheus文本格式输出全部指标
+    """
+    with _lock:
+        lines = []
+        for metric in (STAGE_DURATION, STAGE_CPU, STAGE_ROWS, REQUEST_DURATION):
+            lines.extend(metric.render())
+    peak = peak_rss_mb()
+    if peak is not None:
+        lines.append('# HELP east_process_peak_rss_bytes API进程的内存峰值（字节）')
+        lines.append('# TYPE east_process_peak_rss_bytes gauge')
+        lines.append(f'east_process_peak_rss_bytes {int(peak * 1024 * 1024)}')
+    return '\n'.join(lines) + '\n'
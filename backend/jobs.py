@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Callable
+
+# 任务队列配置，可由api.py通过configure_jobs覆盖
+JOB_SETTINGS = {
+    'workers': int(os.environ.get('JOB_WORKERS', 2)),
+    'max_queue': int(os.environ.get('JOB_QUEUE_DEPTH', 16)),
+    'result_ttl': int(os.environ.get('JOB_RESULT_TTL', 3600)),
+    # 工作进程启动时执行的初始化函数（如预先导入分析流程），为None时不执行
+    'initializer': None
+}
+
+class JobQueueFullError(RuntimeError):
+    """任务队列已满"""
+
+# 工作进程异常退出（内存不足、解析超大文件时崩溃等）导致任务失败时的错误信息
+BROKEN_POOL_ERROR = '工作进程异常退出（可能因内存不足或文件过大），任务未完成，请重新提交或拆分文件'
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_manager = None
+_jobs: Dict[str, Dict[str, Any]] = {}
+
+def configure_jobs(workers: Optional[int] = None, max_queue: Optional[int] = None,
+                   result_ttl: Optional[int] = None,
+                   initializer: Optional[Callable[[], None]] = None) -> None:
+    """
+    设置工作进程数、队列深度、结果保留时间和工作进程的初始化函数
+    """
+    if workers is not None:
+        JOB_SETTINGS['workers'] = max(1, int(workers))
+    if max_queue is not None:
+        JOB_SETTINGS['max_queue'] = max(1, int(max_queue))
+    if result_ttl is not None:
+        JOB_SETTINGS['result_ttl'] = int(result_ttl)
+    if initializer is not None:
+        JOB_SETTINGS['initializer'] = initializer
+
+def nested_load_workers(workers: int) -> int:
+    """
+    后台任务的每个工作进程中并行解析文件可用的进程数：CPU核数按工作进程数均分，至少为1（即依次解析）
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def _init_worker(load_workers: int, initializer: Optional[Callable[[], None]]) -> None:
+    """
+    工作进程的初始化：限制任务内部解析文件的进程数，再执行配置的初始化函数
+    """
+    from ingestion import configure_loading
+    configure_loading(load_workers)
+    if initializer is not None:
+        initializer()
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    首次提交任务时才创建进程池和共享进度字典的管理进程
+    """
+    global _executor, _manager
+    if _manager is None:
+        _manager = multiprocessing.Manager()
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=JOB_SETTINGS['workers'], initializer=_init_worker,
+                                        initargs=(nested_load_workers(JOB_SETTINGS['workers']),
+                                                  JOB_SETTINGS['initializer']))
+    return _executor
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    进程池中有工作进程异常退出后，进程池不再接受任务：关闭并丢弃，下次提交时重新创建
+    """
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False)
+
+def _job_done(job: Dict[str, Any], executor: ProcessPoolExecutor, future: Future) -> None:
+    job['finished_at'] = time.time()
+    if isinstance(future.exception(), BrokenProcessPool):
+        _discard_executor(executor)
+
+def _run_job(func: Callable[..., Dict[str, Any]], progress: Any, args: tuple) -> Dict[str, Any]:
+    """
+    在工作进程中执行任务，并把阶段进度写回共享字典
+    """
+    def report(stage: Optional[str]) -> None:
+        # 进入新阶段时，上一阶段视为已完成
+        if progress['stage'] is not None:
+            progress['completed'] = progress['completed'] + [progress['stage']]
+        progress['stage'] = stage
+        progress['updated_at'] = time.time()
+
+    progress['status'] = 'running'
+    progress['started_at'] = time.time()
+    result = func(*args, progress=report)
+    report(None)
+    return result
+
+def _prune_jobs() -> None:
+    """
+    清理超过保留时间的已结束任务
+    """
+    now = time.time()
+    expired = [job_id for job_id, job in _jobs.items()
+               if job['finished_at'] is not None
+               and now - job['finished_at'] > JOB_SETTINGS['result_ttl']]
+    for job_id in expired:
+        del _jobs[job_id]
+
+def submit_job(kind: str, func: Callable[..., Dict[str, Any]], args: tuple,
+               stages: List[str]) -> str:
+    """
+    提交后台任务并立即返回任务ID，队列已满时抛出JobQueueFullError
+    """
+    with _lock:
+        _prune_jobs()
+        pending = sum(1 for job in _jobs.values() if not job['future'].done())
+        if pending >= JOB_SETTINGS['max_queue']:
+            raise JobQueueFullError(f'任务队列已满（{pending}个任务等待处理），请稍后重试')
+
+        executor = _get_executor()
+        progress = _manager.dict({'status': 'queued', 'stage': None, 'completed': [],
+                                  'started_at': None, 'updated_at': time.time()})
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'stages': stages,
+            'created_at': time.time(),
+            'finished_at': None,
+            'progress': progress
+        }
+        try:
+            job['future'] = executor.submit(_run_job, func, progress, args)
+        except BrokenProcessPool:
+            # 进程池已损坏（之前的任务中有工作进程崩溃）：重新创建后重试一次
+            _discard_executor(executor)
+            executor = _get_executor()
+            job['future'] = executor.submit(_run_job, func, progress, args)
+        job['future'].add_done_callback(lambda future: _job_done(job, executor, future))
+        _jobs[job_id] = job
+    return job_id
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        return _jobs.get(job_id)
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    汇总任务状态和各阶段进度
+    """
+    future: Future = job['future']
+    progress = dict(job['progress'])
+    completed = progress['completed']
+
+    if future.done():
+        status = 'failed' if future.exception() is not None else 'finished'
+    else:
+        status = progress['status']
+
+    info = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': status,
+        'stage': progress['stage'],
+        'stages': [{'name': stage, 'done': stage in completed} for stage in job['stages']],
+        'progress': 100 if status == 'finished' else int(100 * len(completed) / len(job['stages'])),
+        'created_at': job['created_at'],
+        'started_at': progress['started_at'],
+        'finished_at': job['finished_at']
+    }
+    if status == 'failed':
+        error = future.exception()
+        info['error'] = BROKEN_POOL_ERROR if isinstance(error, BrokenProcessPool) else str(error)
+    return info
+
+def queue_info() -> Dict[str, Any]:
+    with _lock:
+        pending = sum(1 for job in _jobs.values() if not job['future'].done())
+    return {
+        'workers': JOB_SETTINGS['workers'],
+        'max_queue': JOB_SETTINGS['max_queue'],
+        'pending': pending
+    }
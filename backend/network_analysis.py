@@ -1,113 +1,231 @@
 import os
+import uuid
 import pandas as pd
+import numpy as np
 import networkx as nx
 from pyvis.network import Network
 import warnings
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Set, Union
-try:
-    from community import community_louvain
-except ImportError:
-    community_louvain = None
+from typing import Dict, List, Any, Optional, Set, Tuple, Union, Callable
+from ingestion import iter_excel_files, NETWORK_COLUMNS
+from network_partials import (normalize_counterparties, group_party_amounts, build_flow_edges,
+                              reduce_network_frame, merge_partial_stream)
+from centrality import compute_centrality
+from instrumentation import StageTimings
+from result_store import save_result
+from graph_summary import (ROOT_GROUP, party_flows, detect_communities, summary_groups,
+                           build_group_view, view_records)
+from flow_tracing import build_flow_index
 
 warnings.filterwarnings('ignore')
 
-def process_network_data(folder_path: str, output_filename: str) -> Dict[str, Any]:
+DEFAULT_NODE_LIMIT = 150  # 网络图最大节点数
+DEFAULT_MIN_AMOUNT = 200000  # 最低交易金额限制
+
+# 网络图模式：top只保留金额最大的node_limit个节点；summary将社区聚合为超级节点，不丢弃任何资金往来
+GRAPH_MODES = ('top', 'summary')
+
+# 超级节点的形状，可展开查看下一层
+GROUP_NODE_SHAPE = 'diamond'
+
+def process_network_data(folder_path: str, output_filename: str,
+                         progress: Optional[Callable[[str], None]] = None,
+                         load_workers: Optional[int] = None,
+                         node_limit: int = DEFAULT_NODE_LIMIT,
+                         min_amount: float = DEFAULT_MIN_AMOUNT,
+                         centrality_options: Optional[Dict[str, Any]] = None,
+                         graph_mode: str = 'top') -> Dict[str, Any]:
     """
     处理网络数据文件夹中的所有Excel文件，生成资金流向网络图
-    限制节点数不超过150个
+    限制节点数不超过node_limit个（默认150），只保留累计金额不低于min_amount的交易关系
+    graph_mode 为top时丢弃金额较小的节点；为summary时按社区聚合为超级节点，
+    超级节点可通过/api/networks/<network_id>/groups/<路径>逐层展开
+    资金流向图的邻接索引同样按network_id保存，供路径和环路追踪查询
+    progress 为可选的阶段回调，用于后台任务汇报进度
+    load_workers 为并行解析文件的进程数
+    centrality_options 为中心性分析的模式、采样数和时间预算
     """
     try:
+        timings = StageTimings('network')
+        _report_stage(progress, 'read')
+        
         # 1. 读取所有xlsx文件
         all_files = [f for f in os.listdir(folder_path) if f.endswith('.xlsx')]
         if not all_files:
             raise ValueError("在指定文件夹中未找到Excel文件")
         
-        df_list = []
-        for file in all_files:
-            file_path = os.path.join(folder_path, file)
-            df = pd.read_excel(file_path)
-            df_list.append(df)
+        # 多进程并行解析，每个文件在工作进程中归约为部分聚合后再逐个合并，
+        # 不保留全部流水，内存占用取决于不同交易关系的数量而非总行数
+        file_paths = [os.path.join(folder_path, file) for file in all_files]
+        parse_stats = []
+        def file_partials():
+            for partial, parse_info in iter_excel_files(file_paths, NETWORK_COLUMNS, workers=load_workers,
+                                                        reduce=reduce_network_frame):
+                parse_stats.append(parse_info)
+                yield partial
+        with timings.stage('read') as record:
+            merged = merge_partial_stream(file_partials())
+            record['rows'] = merged['rows']
         
-        full_df = pd.concat(df_list, ignore_index=True)
+        _report_stage(progress, 'aggregate')
         
-        # 2. 数据预处理
-        # 过滤掉无效的交易对手
-        full_df.loc[full_df['对方户名'] == '', '对方户名'] = '取现'
-        filtered_df = full_df.dropna(subset=['对方户名'])
+        # 2-4. 过滤小额关系并限制节点数量（摘要模式不限制，由超级节点控制节点数）
+        with timings.stage('aggregate', merged['rows']):
+            grouped, all_parties = limit_network_edges(
+                merged['grouped'], node_limit if graph_mode == 'top' else None, min_amount)
         
-        # 只保留借贷标志为"借"或"贷"的记录
-        filtered_df = filtered_df[filtered_df['交易借贷标志'].isin(['借', '贷'])]
+        _report_stage(progress, 'graph')
         
-        # 3. 数据分组聚合
-        limited = 200000  # 最低交易金额限制
-        grouped = filtered_df.groupby(['账户名称', '交易借贷标志', '对方户名'])['交易金额'].sum().reset_index()
-        grouped = grouped[grouped['交易金额'] >= limited]
+        # 摘要模式：社区聚合为超级节点，顶层视图代替原始节点绘图
+        # 摘要的交易关系、顶层划分和资金流向索引按network_id保存，供展开和追踪查询
+        network_id = uuid.uuid4().hex[:24]
+        stored = {'kind': 'network', 'network_id': network_id, 'node_limit': node_limit,
+                  'min_amount': min_amount, 'grouped': None, 'root_groups': None, 'flow_index': None}
+        summary = None
+        display_grouped, display_parties, node_attributes = grouped, all_parties, None
+        if graph_mode == 'summary':
+            with timings.stage('summary', len(grouped)):
+                summary, stored['grouped'], stored['root_groups'] = summarize_network(grouped, node_limit)
+            summary['network_id'] = network_id
+            display_grouped = summary['edges']
+            display_parties = [node['id'] for node in summary['nodes']]
+            node_attributes = summary_node_attributes(summary['nodes'])
+            summary = view_records(summary)
         
-        # 4. 限制节点数量不超过150个
-        all_parties = set(grouped['账户名称'].unique()).union(set(grouped['对方户名'].unique()))
-        
-        # 如果节点数超过150，按交易金额排序，只保留前150个最重要的节点
-        if len(all_parties) > 150:
-            # 计算每个节点的总交易金额
-            party_amounts = {}
-            for party in all_parties:
-                amount = grouped[
-                    (grouped['账户名称'] == party) | (grouped['对方户名'] == party)
-                ]['交易金额'].sum()
-                party_amounts[party] = amount
-            
-            # 按金额排序，保留前150个
-            top_parties = sorted(party_amounts.items(), key=lambda x: x[1], reverse=True)[:150]
-            top_party_names = set([party[0] for party in top_parties])
+        # 5. 创建网络图
+        with timings.stage('network_html', len(display_grouped)):
+            network_html = create_network_graph(display_grouped, display_parties, node_attributes)
+            # 6. 保存HTML文件
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            html_filename = f"{timestamp}_{output_filename}_network.html"
+            html_path = os.path.join('static/networks', html_filename)
             
-            # 过滤数据，只保留前150个节点相关的交易
-            grouped = grouped[
-                (grouped['账户名称'].isin(top_party_names)) & 
-                (grouped['对方户名'].isin(top_party_names))
-            ]
+            # 确保目录存在
+            os.makedirs('static/networks', exist_ok=True)
             
-            all_parties = top_party_names
-        
-        # 5. 创建网络图
-        network_html = create_network_graph(grouped, all_parties)
-        # 6. 保存HTML文件
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        html_filename = f"{timestamp}_{output_filename}_network.html"
-        html_path = os.path.join('static/networks', html_filename)
-        
-        # 确保目录存在
-        os.makedirs('static/networks', exist_ok=True)
-        
-        with open(html_path, 'w', encoding='utf-8') as f:
-            f.write(network_html)
+            with open(html_path, 'w', encoding='utf-8') as f:
+                f.write(network_html)
         
         # 7. 生成统计数据
-        stats = generate_network_stats(grouped, all_parties)
+        with timings.stage('network_stats', len(grouped)):
+            stats = generate_network_stats(grouped, all_parties)
+        
+        _report_stage(progress, 'analysis')
         
         # 8. 进行网络分析（如果数据格式支持）
         network_analysis_result = None
         try:
-            network_analysis_result = perform_network_analysis(full_df)
+            if merged['flow_edges'] is not None:
+                with timings.stage('graph_build', merged['rows']):
+                    G = flow_graph_from_edges(merged['flow_edges'], merged['holders'],
+                                              merged['counterparties'])
+                network_analysis_result = analyze_flow_graph(G, centrality_options, timings)
         except Exception as e:
             print(f"网络分析出现错误: {e}")
             # 如果网络分析失败，继续执行其他功能
         
+        # 9. 资金流向图的CSR邻接索引，用于路径和环路追踪
+        if merged['flow_edges'] is not None and len(merged['flow_edges']):
+            with timings.stage('flow_index', len(merged['flow_edges'])):
+                stored['flow_index'] = build_flow_index(merged['flow_edges'])
+        save_result(network_id, stored)
+        
         return {
+            'network_id': network_id,
             'html_file': html_filename,
             'stats': stats,
             'network_analysis': network_analysis_result,
-            'node_count': len(all_parties),
-            'edge_count': len(grouped),
+            'node_count': len(display_parties),
+            'edge_count': len(display_grouped),
+            'graph_mode': graph_mode,
+            'summary': summary,
+            'node_limit': node_limit,
+            'min_amount': min_amount,
+            'parse_stats': parse_stats,
+            'timings': timings.as_dict(),
             'filename': output_filename
         }
         
     except Exception as e:
         raise e
 
-def create_network_graph(grouped: pd.DataFrame, all_parties: Set[str]) -> str:
+def aggregate_network_edges(full_df: pd.DataFrame, node_limit: Optional[int] = DEFAULT_NODE_LIMIT,
+                            min_amount: float = DEFAULT_MIN_AMOUNT) -> Tuple[pd.DataFrame, Set[str]]:
+    """
+    按(账户名称, 交易借贷标志, 对方户名)汇总交易金额，过滤低于min_amount的关系，
+    节点数超过node_limit时只保留金额最大的节点（node_limit为None时不限制），返回汇总结果和节点集合
+    """
+    # 过滤掉无效的交易对手，只保留借贷标志为"借"或"贷"的记录后分组聚合
+    normalize_counterparties(full_df)
+    return limit_network_edges(group_party_amounts(full_df), node_limit, min_amount)
+
+def limit_network_edges(grouped: pd.DataFrame, node_limit: Optional[int] = DEFAULT_NODE_LIMIT,
+                        min_amount: float = DEFAULT_MIN_AMOUNT) -> Tuple[pd.DataFrame, Set[str]]:
+    """
+    对已汇总的交易关系过滤低于min_amount的记录，节点数超过node_limit时只保留金额最大的节点
+    """
+    grouped = grouped[grouped['交易金额'] >= min_amount]
+    
+    # 限制节点数量不超过node_limit个
+    all_parties = set(grouped['账户名称'].unique()).union(set(grouped['对方户名'].unique()))
+    
+    # 如果节点数超过上限，按交易金额排序，只保留最重要的节点
+    if node_limit is not None and len(all_parties) > node_limit:
+        top_party_names = select_top_parties(grouped, node_limit)
+        
+        # 过滤数据，只保留入选节点之间的交易
+        grouped = grouped[
+            (grouped['账户名称'].isin(top_party_names)) & 
+            (grouped['对方户名'].isin(top_party_names))
+        ]
+        
+        all_parties = top_party_names
+    
+    return grouped, all_parties
+
+def select_top_parties(grouped: pd.DataFrame, node_limit: int) -> Set[str]:
+    """
+    一次性计算每个节点（账户名称或对方户名）的总交易金额，返回金额最大的node_limit个节点
+    """
+    return set(party_flows(grouped).nlargest(node_limit).index)
+
+def summarize_network(grouped: pd.DataFrame,
+                      node_limit: int) -> Tuple[Dict[str, Any], pd.DataFrame, List[List[str]]]:
+    """
+    生成顶层摘要视图，返回视图以及逐层展开时需要的交易关系和顶层划分
+    """
+    grouped = grouped.astype({'账户名称': str, '对方户名': str}).reset_index(drop=True)
+    root_groups = summary_groups(grouped, node_limit)
+    return build_group_view(grouped, ROOT_GROUP, node_limit, root_groups), grouped, root_groups
+
+def summary_node_attributes(nodes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    摘要视图中节点的显示属性：超级节点按成员数放大并在提示中给出路径和主要成员
+    """
+    attributes = {}
+    for node in nodes:
+        title = f"{node['label']}\n总金额: {node['flow']:,.0f}元"
+        if node['type'] == 'group':
+            title += (f"\n内部交易: {node['internal_flow']:,.0f}元\n路径: {node['group']}"
+                      f"\n主要成员: {'、'.join(map(str, node['members_sample']))}")
+            attributes[node['id']] = {'label': node['label'], 'title': title, 'shape': GROUP_NODE_SHAPE,
+                                      'size': 20 + 5 * float(np.log2(node['member_count']))}
+        else:
+            attributes[node['id']] = {'label': node['label'], 'title': title}
+    return attributes
+
+def _report_stage(progress: Optional[Callable[[str], None]], stage: str) -> None:
+    """
+    汇报当前处理阶段
+    """
+    if progress is not None:
+        progress(stage)
+
+def create_network_graph(grouped: pd.DataFrame, all_parties: Set[str],
+                         node_attributes: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
     """
     创建网络图并返回HTML内容
+    node_attributes 为可选的节点显示属性（label、title、shape、size等），覆盖默认值
     """
     # 创建网络图
     net = Network(
@@ -130,7 +248,9 @@ def create_network_graph(grouped: pd.DataFrame, all_parties: Set[str]) -> str:
     
     for party in all_parties:
         node_ids[party] = node_counter
-        net.add_node(node_counter, label=party, title=party, color='#adb5bd')
+        attributes = {'label': party, 'title': party, 'color': '#adb5bd'}
+        attributes.update((node_attributes or {}).get(party, {}))
+        net.add_node(node_counter, **attributes)
         node_counter += 1
     
     # 添加交易边
@@ -262,71 +382,90 @@ def generate_network_stats(grouped: pd.DataFrame, all_parties: Set[str]) -> Dict
         'top_counterparties': counterparty_stats.to_dict('index')
     }
 
-def perform_network_analysis(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
+def build_flow_graph(df: pd.DataFrame) -> nx.DiGraph:
+    """
+    按借贷方向确定边的起止点，并对相同的(起点, 终点)汇总金额后批量建图
+    """
+    return flow_graph_from_edges(build_flow_edges(df), df['证件号码'].dropna().unique(),
+                                 df['对方户名'].dropna().unique())
+
+def flow_graph_from_edges(edges: pd.DataFrame, holders: Optional[Any], counterparties: Any) -> nx.DiGraph:
+    """
+    由汇总后的边表批量建图，并加入所有唯一的"证件号码"和"对方户名"（包括没有有效边的节点）
+    """
+    G = nx.from_pandas_edgelist(edges, source='source', target='target',
+                                edge_attr='weight', create_using=nx.DiGraph)
+    if holders is not None:
+        G.add_nodes_from(holders)
+    G.add_nodes_from(counterparties)
+    return G
+
+def perform_network_analysis(df: pd.DataFrame,
+                             centrality_options: Optional[Dict[str, Any]] = None,
+                             timings: Optional[StageTimings] = None) -> Optional[Dict[str, Any]]:
     """
     使用NetworkX进行深度网络分析
+    centrality_options 为传给compute_centrality的模式、采样数和时间预算
+    timings 为可选的阶段计时记录
     """
+    if timings is None:
+        timings = StageTimings('network')
     try:
         # 检查是否有证件号码列，如果没有则跳过此分析
         if '证件号码' not in df.columns:
             return None
             
-        # 创建有向图
-        G = nx.DiGraph()
-        
-        # 添加节点：所有唯一的"证件号码"和"对方户名"
-        all_nodes = set(df['证件号码'].dropna()).union(set(df['对方户名'].dropna()))
-        G.add_nodes_from(all_nodes)
-        
-        # 添加边：根据"交易借贷标志"确定方向
-        for index, row in df.iterrows():
-            if pd.isna(row['证件号码']) or pd.isna(row['对方户名']):
-                continue
-                
-            if row['交易借贷标志'] == '借':  # 借：资金流入，边从"对方户名"到"证件号码"
-                G.add_edge(row['对方户名'], row['证件号码'], weight=row['交易金额'])
-            elif row['交易借贷标志'] == '贷':  # 贷：资金流出，边从"证件号码"到"对方户名"
-                G.add_edge(row['证件号码'], row['对方户名'], weight=row['交易金额'])
+        with timings.stage('graph_build', len(df)):
+            G = build_flow_graph(df)
+        return analyze_flow_graph(G, centrality_options, timings)
         
+    except Exception as e:
+        print(f"网络分析出现错误: {e}")
+        return None
+
+def analyze_flow_graph(G: nx.DiGraph, centrality_options: Optional[Dict[str, Any]] = None,
+                       timings: Optional[StageTimings] = None) -> Optional[Dict[str, Any]]:
+    """
+    对资金流向图做连通分量、中心性、社区检测和聚类系数分析，图为空时返回None
+    """
+    if timings is None:
+        timings = StageTimings('network')
+    try:
         # 如果图为空，返回None
         if G.number_of_nodes() == 0:
             return None
         
         # 分析1：连通分量
-        connected_components = list(nx.weakly_connected_components(G))
+        with timings.stage('components', G.number_of_nodes()):
+            connected_components = list(nx.weakly_connected_components(G))
         
-        # 分析2：度中心性
-        degree_centrality = nx.degree_centrality(G)
-        sorted_dc = sorted(degree_centrality.items(), key=lambda x: x[1], reverse=True)
-        
-        # 分析3：介数中心性
-        try:
-            betweenness_centrality = nx.betweenness_centrality(G)
-            sorted_bc = sorted(betweenness_centrality.items(), key=lambda x: x[1], reverse=True)
-        except:
-            # 如果计算失败（可能由于图太大），使用空列表
-            sorted_bc = []
+        # 分析2、3：度中心性、介数中心性和PageRank（稀疏矩阵计算，介数中心性受采样数和时间预算限制）
+        with timings.stage('centrality', G.number_of_nodes()):
+            centrality = compute_centrality(G, **(centrality_options or {}))
+        sorted_dc = sorted(centrality['degree_centrality'].items(), key=lambda x: x[1], reverse=True)
+        sorted_bc = sorted(centrality['betweenness_centrality'].items(), key=lambda x: x[1], reverse=True)
+        sorted_pr = sorted(centrality['pagerank'].items(), key=lambda x: x[1], reverse=True)
         
         # 分析4：社区检测
         communities = {}
         community_info = []
         try:
-            if community_louvain is not None:
-                G_undirected = G.to_undirected()
-                partition = community_louvain.best_partition(G_undirected)
-                
-                for node, community_id in partition.items():
-                    if community_id not in communities:
-                        communities[community_id] = []
-                    communities[community_id].append(node)
-                
-                # 转换为列表格式便于显示
-                for cid, nodes in communities.items():
-                    community_info.append({
-                        'id': cid,
-                        'size': len(nodes),
-                        'nodes': nodes[:10] if len(nodes) > 10 else nodes  # 只显示前10个节点
-                    })
+            G_undirected = G.to_undirected()
+            with timings.stage('communities', G.number_of_nodes()):
+                partition = detect_communities(G_undirected)
+            
+            for node, community_id in partition.items():
+                if community_id not in communities:
+                    communities[community_id] = []
+                communities[community_id].append(node)
+            
+            # 转换为列表格式便于显示
+            for cid, nodes in communities.items():
+                community_info.append({
+                    'id': cid,
+                    'size': len(nodes),
+                    'nodes': nodes[:10] if len(nodes) > 10 else nodes  # 只显示前10个节点
+                })
         except Exception as e:
             print(f"社区检测失败: {e}")
         
@@ -334,9 +473,10 @@ def perform_network_analysis(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
         clustering_info = {}
         try:
             G_undirected = G.to_undirected()
-            clustering_coeff = nx.clustering(G_undirected)
-            sorted_clustering = sorted(clustering_coeff.items(), key=lambda x: x[1], reverse=True)
-            avg_clustering = nx.average_clustering(G_undirected)
+            with timings.stage('clustering', G.number_of_nodes()):
+                clustering_coeff = nx.clustering(G_undirected)
+                sorted_clustering = sorted(clustering_coeff.items(), key=lambda x: x[1], reverse=True)
+                avg_clustering = nx.average_clustering(G_undirected)
             
             clustering_info = {
                 'average': avg_clustering,
@@ -352,6 +492,8 @@ def perform_network_analysis(df: pd.DataFrame) -> Optional[Dict[str, Any]]:
             'connected_components_sizes': [len(comp) for comp in connected_components],
             'degree_centrality_top10': sorted_dc[:10],
             'betweenness_centrality_top10': sorted_bc[:10],
+            'pagerank_top10': sorted_pr[:10],
+            'metric_modes': centrality['metric_modes'],
             'communities': community_info,
             'clustering': clustering_info,
             'is_directed': G.is_directed(),
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Iterable
+
+# 网络分析的部分聚合：每个文件读取后立即归约为(账户名称, 交易借贷标志, 对方户名)的金额合计、
+# 资金流向边和节点列表，合并后的结果与对全部数据直接聚合一致，
+# 内存占用取决于不同组合和边的数量，与总行数无关；只依赖pandas，工作进程无需导入networkx
+PARTY_KEYS = ['账户名称', '交易借贷标志', '对方户名']
+
+def normalize_counterparties(df: pd.DataFrame) -> None:
+    """
+    对方户名为空字符串的记录视为取现（原地修改）
+    """
+    df.loc[df['对方户名'] == '', '对方户名'] = '取现'
+
+def group_party_amounts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    只保留借贷标志为"借"或"贷"且对方户名有效的记录，按(账户名称, 交易借贷标志, 对方户名)汇总交易金额
+    """
+    filtered_df = df.dropna(subset=['对方户名'])
+    filtered_df = filtered_df[filtered_df['交易借贷标志'].isin(['借', '贷'])]
+    return filtered_df.groupby(PARTY_KEYS)['交易金额'].sum().reset_index()
+
+def build_flow_edges(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    按交易借贷标志确定资金流向并汇总为边表(source, target, weight)
+    借：资金流入，边从"对方户名"到"证件号码"；贷：资金流出，边从"证件号码"到"对方户名"
+    """
+    valid = df.dropna(subset=['证件号码', '对方户名'])
+    is_debit = (valid['交易借贷标志'] == '借').to_numpy()
+    is_credit = (valid['交易借贷标志'] == '贷').to_numpy()
+
+    holder = valid['证件号码'].to_numpy()
+    counterparty = valid['对方户名'].to_numpy()
+    edges = pd.DataFrame({
+        'source': np.where(is_debit, counterparty, holder),
+        'target': np.where(is_debit, holder, counterparty),
+        'weight': valid['交易金额'].to_numpy()
+    })[is_debit | is_credit]
+
+    return edges.groupby(['source', 'target'], sort=False)['weight'].sum().reset_index()
+
+def reduce_network_frame(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    将一个文件（或分块）的流水归约为可合并的部分聚合
+    holders/counterparties 为按出现顺序去重的证件号码和对方户名，用于建图时加入没有有效边的节点
+    """
+    normalize_counterparties(df)
+    has_holder = '证件号码' in df.columns
+    return {
+        'rows': len(df),
+        'grouped': group_party_amounts(df),
+        'flow_edges': build_flow_edges(df) if has_holder else None,
+        'holders': df['证件号码'].dropna().drop_duplicates() if has_holder else None,
+        'counterparties': df['对方户名'].dropna().drop_duplicates()
+    }
+
+def _concat_unique(parts: List[Optional[pd.Series]]) -> Optional[pd.Series]:
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    return pd.concat(parts, ignore_index=True).drop_duplicates()
+
+def merge_network_partials(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多个部分聚合：金额按键相加，边按(起点, 终点)相加并保持首次出现的顺序，节点按出现顺序去重
+    """
+    if len(partials) == 1:
+        return partials[0]
+
+    grouped = pd.concat([partial['grouped'] for partial in partials], ignore_index=True)
+    edges = [partial['flow_edges'] for partial in partials if partial['flow_edges'] is not None]
+    flow_edges = None
+    if edges:
+        flow_edges = pd.concat(edges, ignore_index=True).groupby(
+            ['source', 'target'], sort=False)['weight'].sum().reset_index()
+    return {
+        'rows': sum(partial['rows'] for partial in partials),
+        'grouped': grouped.groupby(PARTY_KEYS)['交易金额'].sum().reset_index(),
+        'flow_edges': flow_edges,
+        'holders': _concat_unique([partial['holders'] for partial in partials]),
+        'counterparties': _concat_unique([partial['counterparties'] for partial in partials])
+    }
+
+def _partial_size(partial: Dict[str, Any]) -> int:
+    edges = partial['flow_edges']
+    return len(partial['grouped']) + (len(edges) if edges is not None else 0)
+
+def merge_partial_stream(partials: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    逐个接收并合并部分聚合：待合并部分的总大小达到已合并结果的大小时才合并一次，
+    合并次数随文件数按对数增长，同时内存中最多保留约两倍于合并结果的数据；没有输入时返回None
+    """
+    merged = None
+    pending: List[Dict[str, Any]] = []
+    pending_size = 0
+    for partial in partials:
+        pending.append(partial)
+        pending_size += _partial_size(partial)
+        if merged is None or pending_size >= _partial_size(merged):
+            merged = merge_network_partials(([merged] if merged is not None else []) + pending)
+            pending, pending_size = [], 0
+    if pending:
+        merged = merge_network_partials([merged] + pending)
+    return merged
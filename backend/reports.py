@@ -0,0 +1,138 @@
+import io
+import os
+import threading
+import zipfile
+import pandas as pd
+from typing import Dict
+from instrumentation import observe_stage
+from frame_cache import evict_lru_files
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+REPORT_FOLDER = 'outputs'
+
+# 已生成报告的总大小上限，超过时按最近使用时间淘汰（目录中的其他文件不受影响）
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# 报告中的工作表及对应的分析结果表，按输出顺序排列
+REPORT_SHEETS = [
+    ('交易对手统计', 'counterparty_stats'),
+    ('整体统计', 'total_stats'),
+    ('交易类型分析', 'transaction_type_stats'),
+    ('交易渠道分析', 'channel_stats'),
+    ('每日交易趋势', 'daily_transactions'),
+    ('每小时分析', 'hourly_stats')
+]
+
+# 下载格式：xlsx为完整报告，csv/parquet为每个工作表一个文件的zip压缩包
+REPORT_FORMATS = {
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv.zip', 'application/zip'),
+    'parquet': ('parquet.zip', 'application/zip')
+}
+
+# 报告文件名的后缀，淘汰时只处理这些文件
+REPORT_SUFFIXES = tuple(f'_report.{extension}' for extension, _ in REPORT_FORMATS.values())
+
+# 流式写入Excel时每批转换的行数
+WRITE_CHUNK_ROWS = 10000
+
+_lock = threading.Lock()
+_build_locks: Dict[str, threading.Lock] = {}
+
+def report_file_name(analysis_id: str, fmt: str = 'xlsx') -> str:
+    """
+    返回某次分析的报告文件名，访问/api/download/<文件名>时按需生成
+    """
+    return f'{analysis_id}_report.{REPORT_FORMATS[fmt][0]}'
+
+def _iter_rows(df: pd.DataFrame):
+    """
+    分批把DataFrame转换为Python原生类型的行，缺失值转为None
+    """
+    for start in range(0, len(df), WRITE_CHUNK_ROWS):
+        chunk = df.iloc[start:start + WRITE_CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.values.tolist()
+
+def write_excel_report(tables: Dict[str, pd.DataFrame], path: str) -> None:
+    """
+    以openpyxl只写模式逐行写入报告，内存占用不随行数增长
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, key in REPORT_SHEETS:
+        df = tables[key]
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append([str(col) for col in df.columns])
+        for row in _iter_rows(df):
+            sheet.append(row)
+    workbook.save(path)
+
+def write_csv_report(tables: Dict[str, pd.DataFrame], path: str) -> None:
+    """
+    每个工作表导出为一个CSV文件（UTF-8 BOM，便于Excel直接打开），打包为zip
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, key in REPORT_SHEETS:
+            with archive.open(f'{sheet_name}.csv', 'w') as f:
+                with io.TextIOWrapper(f, encoding='utf-8-sig', newline='') as text:
+                    tables[key].to_csv(text, index=False)
+
+def write_parquet_report(tables: Dict[str, pd.DataFrame], path: str) -> None:
+    """
+    每个工作表导出为一个Parquet文件，打包为zip
+    """
+    if pyarrow is None:
+        raise ValueError('导出Parquet需要安装pyarrow')
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for sheet_name, key in REPORT_SHEETS:
+            buffer = io.BytesIO()
+            tables[key].to_parquet(buffer, index=False)
+            archive.writestr(f'{sheet_name}.parquet', buffer.getvalue())
+
+REPORT_WRITERS = {
+    'xlsx': write_excel_report,
+    'csv': write_csv_report,
+    'parquet': write_parquet_report
+}
+
+def _build_lock(path: str) -> threading.Lock:
+    with _lock:
+        return _build_locks.setdefault(path, threading.Lock())
+
+def get_or_build_report(analysis_id: str, tables: Dict[str, pd.DataFrame],
+                        fmt: str = 'xlsx') -> str:
+    """
+    返回缓存的报告文件路径，首次请求时生成；同一报告的并发请求只生成一次
+    生成后按REPORT_CACHE_MAX_BYTES淘汰最久未下载的报告
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f'不支持的报告格式: {fmt}')
+
+    path = os.path.join(REPORT_FOLDER, report_file_name(analysis_id, fmt))
+    try:
+        # 命中缓存时更新修改时间，淘汰时按最近使用排序
+        os.utime(path, None)
+        return path
+    except OSError:
+        pass
+
+    with _build_lock(path):
+        if not os.path.exists(path):
+            os.makedirs(REPORT_FOLDER, exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with observe_stage('transaction', f'report_{fmt}', len(tables['counterparty_stats'])):
+                    REPORT_WRITERS[fmt](tables, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            evict_lru_files(REPORT_FOLDER, REPORT_SUFFIXES, REPORT_CACHE_MAX_BYTES, keep=path)
+    with _lock:
+        _build_locks.pop(path, None)
+    return path
@@ -0,0 +1,76 @@
+import os
+import re
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+from frame_cache import evict_lru_files
+
+# 分析结果存储配置，可由api.py通过configure_result_store覆盖
+STORE_SETTINGS = {
+    'folder': os.environ.get('RESULT_FOLDER', os.path.join('outputs', 'results')),
+    'max_bytes': int(os.environ.get('RESULT_STORE_MAX_BYTES', 1024 * 1024 * 1024)),
+    'memory_entries': int(os.environ.get('RESULT_MEMORY_ENTRIES', 16))
+}
+
+# 分析ID只允许十六进制字符，避免拼接路径时越界
+ANALYSIS_ID_PATTERN = re.compile(r'^[0-9a-f]{8,64}$')
+
+_lock = threading.Lock()
+_memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+
+def configure_result_store(folder: Optional[str] = None, max_bytes: Optional[int] = None,
+                           memory_entries: Optional[int] = None) -> None:
+    """
+    设置结果存储目录、磁盘容量上限和内存中保留的结果数
+    """
+    if folder is not None:
+        STORE_SETTINGS['folder'] = folder
+    if max_bytes is not None:
+        STORE_SETTINGS['max_bytes'] = int(max_bytes)
+    if memory_entries is not None:
+        STORE_SETTINGS['memory_entries'] = int(memory_entries)
+
+def _result_path(analysis_id: str) -> str:
+    return os.path.join(STORE_SETTINGS['folder'], f'{analysis_id}.pkl')
+
+def _remember(analysis_id: str, result: Dict[str, Any]) -> None:
+    with _lock:
+        _memory[analysis_id] = result
+        _memory.move_to_end(analysis_id)
+        while len(_memory) > STORE_SETTINGS['memory_entries']:
+            _memory.popitem(last=False)
+
+def save_result(analysis_id: str, result: Dict[str, Any]) -> None:
+    """
+    保存分析结果：写入磁盘供其他进程读取，同时保留在内存中
+    """
+    os.makedirs(STORE_SETTINGS['folder'], exist_ok=True)
+    path = _result_path(analysis_id)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    _remember(analysis_id, result)
+    evict_lru_files(STORE_SETTINGS['folder'], '.pkl', STORE_SETTINGS['max_bytes'])
+
+def load_result(analysis_id: str) -> Optional[Dict[str, Any]]:
+    """
+    按分析ID读取结果，依次查找内存和磁盘，不存在时返回None
+    """
+    if not ANALYSIS_ID_PATTERN.match(analysis_id):
+        return None
+
+    with _lock:
+        if analysis_id in _memory:
+            _memory.move_to_end(analysis_id)
+            return _memory[analysis_id]
+
+    path = _result_path(analysis_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        result = pickle.load(f)
+    os.utime(path, None)
+    _remember(analysis_id, result)
+    return result
@@ -0,0 +1,146 @@
+import json
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Any, Mapping, Tuple
+
+# 可分页查询的分析表：名称筛选作用的键列、金额范围默认作用的金额列、默认排序列
+TABLE_VIEWS = {
+    'counterparty_stats': {'key': '对方户名', 'amount': '总交易金额', 'sort': '交易次数'},
+    'transaction_type_stats': {'key': '交易类型', 'amount': '总金额', 'sort': '交易次数'},
+    'channel_stats': {'key': '交易渠道', 'amount': '总金额', 'sort': '交易次数'},
+    'daily_transactions': {'key': '核心交易日期', 'amount': '净流量', 'sort': '核心交易日期'},
+    'hourly_stats': {'key': '交易小时', 'amount': '净流量', 'sort': '交易小时'},
+    'total_stats': {'key': '统计指标', 'amount': '数值', 'sort': None}
+}
+
+# 上传响应中各分析表最多返回的行数，完整结果通过分页接口获取
+RESPONSE_TABLE_ROWS = 10
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# 排序结果和小写键列的缓存：同一分析表按同一列排序只计算一次
+SORT_CACHE_ENTRIES = 64
+
+_lock = threading.Lock()
+_sort_cache: 'OrderedDict[Tuple[str, str, str, Any], Any]' = OrderedDict()
+
+def _sorted_positions(analysis_id: str, table: str, df: pd.DataFrame, column: str,
+                      descending: bool) -> np.ndarray:
+    """
+    返回按指定列排序后的行位置（稳定排序，缺失值排在最后），结果按LRU缓存
+    """
+    cache_key = (analysis_id, table, column, descending)
+    with _lock:
+        if cache_key in _sort_cache:
+            _sort_cache.move_to_end(cache_key)
+            return _sort_cache[cache_key]
+
+    values = df[column].reset_index(drop=True)
+    positions = values.sort_values(ascending=not descending, kind='stable',
+                                   na_position='last').index.to_numpy()
+    with _lock:
+        _sort_cache[cache_key] = positions
+        while len(_sort_cache) > SORT_CACHE_ENTRIES:
+            _sort_cache.popitem(last=False)
+    return positions
+
+def _lowercase_keys(analysis_id: str, table: str, df: pd.DataFrame, column: str) -> pd.Series:
+    """
+    键列转为小写字符串后缓存，名称筛选时不再重复转换
+    """
+    cache_key = (analysis_id, table, column, 'lower')
+    with _lock:
+        if cache_key in _sort_cache:
+            _sort_cache.move_to_end(cache_key)
+            return _sort_cache[cache_key]
+
+    keys = df[column].astype(str).str.lower().reset_index(drop=True)
+    with _lock:
+        _sort_cache[cache_key] = keys
+        while len(_sort_cache) > SORT_CACHE_ENTRIES:
+            _sort_cache.popitem(last=False)
+    return keys
+
+def _filter_mask(analysis_id: str, table: str, df: pd.DataFrame, view: Dict[str, Any],
+                 params: Mapping[str, str]) -> np.ndarray:
+    """
+    名称筛选（键列包含name，不区分大小写）和金额范围（amount_column列在min_amount到max_amount之间）
+    """
+    mask = np.ones(len(df), dtype=bool)
+    name = params.get('name')
+    if name:
+        keys = _lowercase_keys(analysis_id, table, df, view['key'])
+        mask &= keys.str.contains(name.lower(), regex=False).to_numpy(dtype=bool)
+
+    amount_column = params.get('amount_column') or view['amount']
+    if amount_column not in df.columns:
+        raise ValueError(f'不存在的金额列: {amount_column}')
+    amounts = pd.to_numeric(df[amount_column], errors='coerce').to_numpy(dtype=float)
+    if params.get('min_amount'):
+        mask &= amounts >= float(params['min_amount'])
+    if params.get('max_amount'):
+        mask &= amounts <= float(params['max_amount'])
+    return mask
+
+def _json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    转换为JSON可序列化的记录，缺失值为null，日期为ISO格式
+    """
+    return json.loads(df.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+def query_table(analysis_id: str, result: Dict[str, Any], table: str,
+                params: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    对保存的分析表做服务端筛选、排序和分页，参数非法时抛出ValueError
+    查询参数：page、page_size、sort（任意列名）、order（asc/desc）、
+    name（键列包含）、min_amount/max_amount、amount_column（金额范围作用的列）
+    """
+    if table not in TABLE_VIEWS or table not in result['tables']:
+        raise ValueError(f"不存在的分析表: {table}，可选 {', '.join(TABLE_VIEWS)}")
+    view = TABLE_VIEWS[table]
+    df = result['tables'][table]
+
+    page = int(params.get('page') or 1)
+    page_size = int(params.get('page_size') or DEFAULT_PAGE_SIZE)
+    if page < 1 or not (1 <= page_size <= MAX_PAGE_SIZE):
+        raise ValueError(f'page必须为正整数，page_size需在1-{MAX_PAGE_SIZE}之间')
+
+    sort = params.get('sort') or view['sort']
+    order = params.get('order') or ('asc' if sort == view['key'] else 'desc')
+    if sort is not None and sort not in df.columns:
+        raise ValueError(f"不存在的排序列: {sort}，可选 {', '.join(map(str, df.columns))}")
+    if order not in ('asc', 'desc'):
+        raise ValueError('order只能为asc或desc')
+
+    if sort is None:
+        positions = np.arange(len(df))
+    else:
+        positions = _sorted_positions(analysis_id, table, df, sort, order == 'desc')
+    mask = _filter_mask(analysis_id, table, df, view, params)
+    positions = positions[mask[positions]]
+
+    start = (page - 1) * page_size
+    rows = df.iloc[positions[start:start + page_size]]
+    return {
+        'analysis_id': analysis_id,
+        'table': table,
+        'total': len(df),
+        'filtered': len(positions),
+        'page': page,
+        'page_size': page_size,
+        'sort': sort,
+        'order': order,
+        'rows': _json_records(rows)
+    }
+
+def table_summary(analysis_id: str, tables: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
+    """
+    各分析表的总行数和分页查询地址，用于上传响应
+    """
+    return {
+        table: {'rows': len(tables[table]), 'url': f'/api/analyses/{analysis_id}/tables/{table}'}
+        for table in TABLE_VIEWS if table in tables
+    }
@@ -0,0 +1,121 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+# 生成数据使用的取值范围，与EAST流水中的常见取值保持一致
+TRANSACTION_TYPES = ['网银转账', 'ATM取现', 'POS消费', '代发工资', '跨行汇款', '理财赎回', '贷款放款', '手续费']
+CHANNELS = ['网上银行', '手机银行', '柜面', 'ATM', 'POS', '第三方支付']
+BANKS = ['工商银行', '建设银行', '农业银行', '中国银行', '交通银行', '招商银行', '兴业银行', '浦发银行']
+
+# Excel单个工作表的最大行数（含表头）
+XLSX_MAX_ROWS = 1048575
+
+def make_statement(rows: int = 10000, counterparties: int = 1000, accounts: int = 10,
+                   density: float = 1.0, account_overlap: float = 0.1, days: int = 365,
+                   start_date: str = '2024-01-01', cash_ratio: float = 0.05,
+                   skew: float = 1.2, seed: int = 42) -> pd.DataFrame:
+    """
+    生成EAST格式的模拟流水，相同参数和随机种子生成的数据完全一致
+    rows: 行数；counterparties: 交易对手数量；accounts: 账户（持卡人）数量
+    density: 每个账户交易过的对手占全部对手的比例，控制网络图的稠密程度
+    account_overlap: 交易对手为其他账户持有人的比例，用于产生账户之间的资金往来
+    skew: 交易对手出现频率的幂律指数，0为均匀分布
+    """
+    rng = np.random.default_rng(seed)
+    counterparties = max(1, counterparties)
+    accounts = max(1, accounts)
+
+    account_names = np.array([f'账户{i:05d}' for i in range(accounts)], dtype=object)
+    id_numbers = np.array([f'1101{i:014d}' for i in range(accounts)], dtype=object)
+    party_names = np.array([f'对手{i:07d}' for i in range(counterparties)], dtype=object)
+    # 部分交易对手替换为其他账户的持有人
+    overlap = rng.random(counterparties) < account_overlap
+    party_names[overlap] = account_names[rng.integers(0, accounts, overlap.sum())]
+    party_accounts = rng.integers(6200000000000000, 6299999999999999, counterparties).astype(str)
+    party_banks = rng.integers(0, len(BANKS), counterparties)
+
+    # 每个账户只与部分交易对手往来（density），对手出现频率服从幂律分布
+    weights = 1.0 / np.arange(1, counterparties + 1) ** skew
+    weights /= weights.sum()
+    per_account = max(1, int(round(density * counterparties)))
+    account_index = rng.integers(0, accounts, rows)
+    party_rank = rng.choice(counterparties, size=rows, p=weights) % per_account
+    # 每个账户的对手集合按账户编号错开，保证不同账户的对手不完全相同
+    offsets = (np.arange(accounts) * max(1, counterparties // accounts)) % counterparties
+    party_index = (offsets[account_index] + party_rank) % counterparties
+
+    is_credit = rng.random(rows) < 0.5
+    amounts = np.round(rng.lognormal(mean=9.0, sigma=1.6, size=rows), 2)
+    is_cash = rng.random(rows) < cash_ratio
+
+    # 先生成日期表再按下标取值，避免逐行格式化日期
+    calendar = pd.date_range(start_date, periods=days, freq='D').strftime('%Y%m%d').astype(int).to_numpy()
+    dates = calendar[rng.integers(0, days, rows)]
+    # 交易时间集中在白天
+    hours = np.clip(np.round(rng.normal(13, 4, rows)), 0, 23).astype(int)
+    times = hours * 10000 + rng.integers(0, 60, rows) * 100 + rng.integers(0, 60, rows)
+
+    return pd.DataFrame({
+        '账户名称': account_names[account_index],
+        '证件号码': id_numbers[account_index],
+        '交易借贷标志': np.where(is_credit, '贷', '借'),
+        '交易金额': amounts,
+        '对方户名': party_names[party_index],
+        '对方账号': party_accounts[party_index],
+        '对方行名': np.array(BANKS, dtype=object)[party_banks[party_index]],
+        '现转标志': np.where(is_cash, '现', '转'),
+        '交易类型': rng.choice(TRANSACTION_TYPES, rows),
+        '交易渠道': rng.choice(CHANNELS, rows),
+        '核心交易日期': dates,
+        '核心交易时间': times
+    })
+
+def write_statement_xlsx(df: pd.DataFrame, path: str) -> str:
+    """
+    将模拟流水写入单个xlsx文件
+    """
+    if len(df) > XLSX_MAX_ROWS:
+        raise ValueError(f'单个xlsx工作表最多{XLSX_MAX_ROWS}行，当前{len(df)}行')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df.to_excel(path, index=False)
+    return path
+
+def write_network_files(df: pd.DataFrame, folder: str, files: int = 4) -> List[str]:
+    """
+    按账户将模拟流水拆分为多个xlsx文件，模拟网络分析的多文件上传
+    """
+    os.makedirs(folder, exist_ok=True)
+    accounts = df['证件号码'].unique()
+    groups = np.array_split(accounts, min(files, len(accounts)))
+    paths = []
+    for i, group in enumerate(groups):
+        path = os.path.join(folder, f'statement_{i:03d}.xlsx')
+        write_statement_xlsx(df[df['证件号码'].isin(group)], path)
+        paths.append(path)
+    return paths
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='生成EAST格式的模拟流水文件')
+    parser.add_argument('--rows', type=int, default=10000, help='行数')
+    parser.add_argument('--counterparties', type=int, default=1000, help='交易对手数量')
+    parser.add_argument('--accounts', type=int, default=10, help='账户数量')
+    parser.add_argument('--density', type=float, default=1.0, help='每个账户交易过的对手比例')
+    parser.add_argument('--account-overlap', type=float, default=0.1, help='对手为其他账户持有人的比例')
+    parser.add_argument('--days', type=int, default=365, help='交易日期跨度（天）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--files', type=int, default=1, help='拆分的文件数，大于1时按账户拆分到目录中')
+    parser.add_argument('--output', required=True, help='输出文件（.xlsx）或目录')
+    args = parser.parse_args(argv)
+
+    df = make_statement(args.rows, args.counterparties, args.accounts, args.density,
+                        args.account_overlap, args.days, seed=args.seed)
+    if args.files > 1:
+        paths = write_network_files(df, args.output, args.files)
+    else:
+        paths = [write_statement_xlsx(df, args.output)]
+    print(f'已生成{len(df)}行模拟流水: {", ".join(paths)}')
+
+if __name__ == '__main__':
+    main()
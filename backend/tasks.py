@@ -0,0 +1,124 @@
+import os
+import shutil
+from typing import Dict, Any, List, Optional, Callable
+
+# 流水分析与网络分析的阶段，用于任务进度展示
+TRANSACTION_STAGES = ['read', 'analyze', 'store']
+NETWORK_STAGES = ['read', 'aggregate', 'graph', 'analysis']
+
+def build_transaction_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将流水分析结果转换为JSON可序列化格式
+    """
+    from result_views import RESPONSE_TABLE_ROWS, table_summary
+
+    # 响应大小固定：各表只返回前几行，完整结果通过/api/analyses/<analysis_id>/tables/<表名>分页查询
+    return {
+        'message': '文件分析完成！',
+        'filename': result['filename'],
+        'analysis_id': result['analysis_id'],
+        'report_file': result['report_file'],
+        'chart_files': result['chart_files'],
+        'total_stats': result['total_stats'].to_dict('records'),
+        'counterparty_stats': result['counterparty_stats'].head(RESPONSE_TABLE_ROWS).to_dict('records'),
+        'transaction_type_stats': result['transaction_type_stats'].head(RESPONSE_TABLE_ROWS).to_dict('records'),
+        'channel_stats': result['channel_stats'].head(RESPONSE_TABLE_ROWS).to_dict('records'),
+        'tables': table_summary(result['analysis_id'], result),
+        'parse_stats': result['parse_stats'],
+        'store_dataset': result.get('store_dataset'),
+        'timings': result['timings']
+    }
+
+def build_network_response(result: Dict[str, Any], saved_files: List[str]) -> Dict[str, Any]:
+    """
+    将网络分析结果转换为JSON可序列化格式
+    """
+    return {
+        'message': '网络图分析完成！',
+        'network_id': result['network_id'],
+        'html_file': result['html_file'],
+        'node_count': result['node_count'],
+        'edge_count': result['edge_count'],
+        'graph_mode': result['graph_mode'],
+        'summary': result['summary'],
+        'filename': result['filename'],
+        'stats': result['stats'],
+        'network_analysis': result['network_analysis'],
+        'node_limit': result['node_limit'],
+        'min_amount': result['min_amount'],
+        'parse_stats': result['parse_stats'],
+        'timings': result['timings'],
+        'uploaded_files': saved_files
+    }
+
+def run_transaction_analysis(file_path: str, filename: str, digest: Optional[str] = None,
+                             progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    执行流水分析并返回响应数据，结束后清理上传的临时文件
+    digest 为上传时已计算的SHA-256摘要，避免重新读取文件
+    """
+    from analysis import process_transaction_data
+
+    try:
+        result = process_transaction_data(file_path, filename, digest=digest, progress=progress)
+        return build_transaction_response(result)
+    finally:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError:
+            pass
+
+def run_account_append(file_path: str, filename: str, digest: Optional[str], account_id: str,
+                       progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    将流水文件追加到账户的累计状态并返回重建后的分析结果，结束后清理上传的临时文件
+    """
+    from incremental import append_statement
+
+    try:
+        result = append_statement(account_id, file_path, filename, digest=digest, progress=progress)
+        response = build_transaction_response(result)
+        response['message'] = '流水已追加，分析结果已更新！' if result['appended'] else '该文件已合并过，未重复计入'
+        response['account'] = result['account']
+        response['appended'] = result['appended']
+        return response
+    finally:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError:
+            pass
+
+def run_network_analysis(folder_path: str, output_filename: str, saved_files: List[str],
+                         load_workers: Optional[int] = None,
+                         network_options: Optional[Dict[str, Any]] = None,
+                         progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    执行网络分析并返回响应数据，结束后清理临时文件夹
+    network_options 为传给process_network_data的节点上限、金额阈值等参数
+    """
+    from network_analysis import process_network_data
+
+    try:
+        result = process_network_data(folder_path, output_filename, progress=progress,
+                                      load_workers=load_workers, **(network_options or {}))
+        return build_network_response(result, saved_files)
+    finally:
+        try:
+            if os.path.exists(folder_path):
+                shutil.rmtree(folder_path)
+        except OSError:
+            pass
+
+def preload_pipelines() -> None:
+    """
+    预先导入各分析流程及其依赖的绘图、网络分析库（matplotlib、seaborn、networkx、pyvis等）
+    默认在首次使用时才导入；预派生的工作进程可在启动时调用，避免首个请求承担导入耗时
+    """
+    import analysis
+    import incremental
+    import network_analysis
+    from charts import load_plotting
+
+    load_plotting()
@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# 测试直接导入backend下的模块，与api.py的运行方式一致
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """
+    api.py的测试客户端；各存储目录均为相对路径，切换到临时目录后写入其中
+    """
+    monkeypatch.chdir(tmp_path)
+    import api
+    from frame_cache import CACHE_SETTINGS
+    monkeypatch.setitem(CACHE_SETTINGS, 'enabled', False)
+    os.makedirs(api.app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(api.app.config['OUTPUT_FOLDER'], exist_ok=True)
+    return api.app.test_client()
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from aggregation import build_aggregate_state
+from analysis import build_analysis_tables, preprocess_data
+from synthetic_data import make_statement
+
+# 以下为改用共享聚合状态之前的逐表groupby实现，作为结果的参照
+
+def _groupby_preprocess(df: pd.DataFrame) -> pd.DataFrame:
+    df['交易金额_正负'] = np.where(df['交易借贷标志'] == '贷', df['交易金额'], -df['交易金额'])
+    df.loc[df['现转标志']=='现','对方行名']='取现'
+    df['对方账号'] = df['对方账号'].astype(str)
+    df['核心交易日期'] = pd.to_datetime(df['核心交易日期'].astype(str), format='%Y%m%d')
+    df['交易小时'] = df['核心交易时间'].astype(int) // 10000
+    return df
+
+def _groupby_tables(df: pd.DataFrame) -> dict:
+    counterparty_stats = df.groupby('对方户名').agg(
+        对方账号 = ('对方账号', lambda x: '-'.join(x.unique().astype(str))),
+        对方行名 = ('对方行名', lambda x: '-'.join(x.unique().astype(str))),
+        交易次数=('交易金额_正负', 'count'),
+        总交易金额=('交易金额_正负', 'sum'),
+        总收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].sum()),
+        总支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].sum()),
+        收入次数=('交易借贷标志', lambda x: (x == '贷').sum()),
+        支出次数=('交易借贷标志', lambda x: (x == '借').sum()),
+        平均收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].mean()),
+        平均支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].mean()),
+        最大交易=('交易金额_正负', 'max'),
+        最小交易=('交易金额_正负', 'min')
+    ).reset_index().sort_values('交易次数', ascending=False)
+    counterparty_stats['平均收入'] = counterparty_stats['平均收入'].fillna(0)
+    counterparty_stats['平均支出'] = counterparty_stats['平均支出'].fillna(0)
+    counterparty_stats['净方向'] = np.where(
+        counterparty_stats['总交易金额'] > 0, '净收入',
+        np.where(counterparty_stats['总交易金额'] < 0, '净支出', '平衡')
+    )
+    counterparty_stats['收入占比'] = counterparty_stats['收入次数'] / counterparty_stats['交易次数']
+    counterparty_stats['支出占比'] = counterparty_stats['支出次数'] / counterparty_stats['交易次数']
+
+    total_stats = pd.DataFrame({
+        '统计指标': ['总交易次数', '总收入', '总支出', '净收入', '平均交易额'],
+        '数值': [
+            len(df),
+            df[df['交易借贷标志'] == '贷']['交易金额'].sum(),
+            df[df['交易借贷标志'] == '借']['交易金额'].sum(),
+            df['交易金额_正负'].sum(),
+            df['交易金额'].mean()
+        ]
+    })
+
+    def count_and_sum(key, sum_column):
+        return df.groupby(key).agg(
+            交易次数=('交易金额', 'count'),
+            **{sum_column: ('交易金额_正负', 'sum')}
+        ).reset_index()
+
+    hourly_stats = df.groupby('交易小时').agg(
+        总收入=('交易金额', lambda x: x[df['交易借贷标志'] == '贷'].sum()),
+        总支出=('交易金额', lambda x: x[df['交易借贷标志'] == '借'].sum()),
+        收入次数=('交易借贷标志', lambda x: (x == '贷').sum()),
+        支出次数=('交易借贷标志', lambda x: (x == '借').sum())
+    ).reset_index()
+    all_hours = pd.DataFrame({'交易小时': range(24)})
+    hourly_stats = all_hours.merge(hourly_stats, on='交易小时', how='left').fillna(0)
+    hourly_stats['净流量'] = hourly_stats['总收入'] - hourly_stats['总支出']
+
+    return {
+        'counterparty_stats': counterparty_stats,
+        'total_stats': total_stats,
+        'transaction_type_stats': count_and_sum('交易类型', '总金额'),
+        'channel_stats': count_and_sum('交易渠道', '总金额'),
+        'daily_transactions': count_and_sum('核心交易日期', '净流量'),
+        'hourly_stats': hourly_stats
+    }
+
+def _statement_with_gaps() -> pd.DataFrame:
+    df = make_statement(3000, counterparties=80, accounts=3, days=20, seed=5)
+    rng = np.random.default_rng(9)
+    df.loc[rng.random(len(df)) < 0.05, '交易金额'] = np.nan
+    df.loc[rng.random(len(df)) < 0.03, '对方户名'] = np.nan
+    # 借贷标志既不是借也不是贷的行：计入交易次数和净额（按借方向），不计入收入/支出
+    df.loc[rng.random(len(df)) < 0.04, '交易借贷标志'] = '冲正'
+    df.loc[rng.random(len(df)) < 0.01, '交易借贷标志'] = np.nan
+    # 部分小时没有交易，检查24小时补全
+    df = df[~(df['核心交易时间'].astype(int) // 10000).isin([3, 4])]
+    return df.reset_index(drop=True)
+
+def _normalized(table: pd.DataFrame, key: str) -> pd.DataFrame:
+    # 交易次数相同的行在两种实现中的先后顺序不作要求
+    return table.sort_values(key, kind='stable').reset_index(drop=True)
+
+def test_shared_state_matches_groupby_implementation():
+    raw = _statement_with_gaps()
+    expected = _groupby_tables(_groupby_preprocess(raw.copy()))
+    actual = build_analysis_tables(build_aggregate_state(preprocess_data(raw.copy())))
+
+    assert len(actual['hourly_stats']) == 24
+    keys = {'counterparty_stats': '对方户名', 'total_stats': '统计指标',
+            'transaction_type_stats': '交易类型', 'channel_stats': '交易渠道',
+            'daily_transactions': '核心交易日期', 'hourly_stats': '交易小时'}
+    for name, key in keys.items():
+        left = _normalized(actual[name], key)
+        right = _normalized(expected[name], key)
+        # 键列的类型不同（category/int8等），比较取值；金额按分累加与浮点累加只有舍入误差
+        left[key] = left[key].astype(right[key].dtype)
+        assert_frame_equal(left, right, check_dtype=False, check_exact=False, rtol=1e-9)
@@ -0,0 +1,37 @@
+import itertools
+import networkx as nx
+import pytest
+import centrality
+from centrality import betweenness_with_budget
+
+def _graph() -> nx.DiGraph:
+    return nx.gnp_random_graph(60, 0.08, seed=3, directed=True)
+
+def test_exact_matches_networkx():
+    G = _graph()
+    betweenness, info = betweenness_with_budget(G)
+    expected = nx.betweenness_centrality(G)
+    assert info['method'] == 'exact'
+    assert all(betweenness[node] == pytest.approx(expected[node]) for node in G)
+
+def test_timed_out_run_uses_random_pivots(monkeypatch):
+    # 时钟每次读取前进1秒：预算1.5秒时只处理第一批源点
+    ticks = itertools.count()
+    processed = []
+    if centrality.sp is not None:
+        original = centrality._accumulate_sparse_batch
+        monkeypatch.setattr(centrality, '_accumulate_sparse_batch', lambda batch, *args: (
+            processed.extend(batch.tolist()), original(batch, *args)))
+    else:
+        original = centrality._accumulate_from_source
+        monkeypatch.setattr(centrality, '_accumulate_from_source', lambda source, *args: (
+            processed.append(source), original(source, *args)))
+
+    G = _graph()
+    betweenness, info = betweenness_with_budget(G, time_budget=1.5, batch_size=8,
+                                                 clock=lambda: float(next(ticks)))
+    assert info['timed_out'] and info['method'] == 'approximate'
+    assert info['pivots'] == len(processed) < G.number_of_nodes()
+    # 已处理的源点不是插入顺序最前的节点
+    assert sorted(processed) != list(range(len(processed)))
+    assert any(value > 0 for value in betweenness.values())
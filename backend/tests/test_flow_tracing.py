@@ -0,0 +1,93 @@
+import random
+import networkx as nx
+import pandas as pd
+import pytest
+from flow_tracing import build_flow_index, trace_paths, find_cycles
+
+def _edges(seed: int, n: int = 9, m: int = 30) -> pd.DataFrame:
+    rng = random.Random(seed)
+    weights = {}
+    for _ in range(m):
+        pair = (f'n{rng.randrange(n)}', f'n{rng.randrange(n)}')
+        weights[pair] = weights.get(pair, 0) + rng.choice([1, 5, 10, 50])
+    # 保证至少有一个自环
+    weights[('n0', 'n0')] = 20
+    return pd.DataFrame([(u, v, w) for (u, v), w in weights.items()], columns=['source', 'target', 'weight'])
+
+def _graph(edges: pd.DataFrame, min_amount: float) -> nx.DiGraph:
+    G = nx.DiGraph()
+    G.add_nodes_from(pd.concat([edges['source'], edges['target']]).unique())
+    kept = edges[edges['weight'] >= min_amount]
+    G.add_edges_from(zip(kept['source'], kept['target']))
+    return G
+
+def _rotated(cycle) -> tuple:
+    # 环路以最小的节点名开头，便于与networkx的结果比较
+    cycle = list(cycle)
+    start = cycle.index(min(cycle))
+    return tuple(cycle[start:] + cycle[:start])
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+@pytest.mark.parametrize('min_amount', [0, 10])
+@pytest.mark.parametrize('max_hops', [2, 4])
+def test_matches_networkx(seed, min_amount, max_hops):
+    edges = _edges(seed)
+    index = build_flow_index(edges)
+    G = _graph(edges, min_amount)
+    nodes = sorted(G)
+
+    for source in nodes:
+        for target in nodes:
+            if source == target:
+                continue
+            result = trace_paths(index, source, target, max_hops, min_amount, limit=10 ** 6)
+            assert not result['truncated']
+            assert sorted(tuple(path['nodes']) for path in result['paths']) == \
+                sorted(tuple(path) for path in nx.all_simple_paths(G, source, target, cutoff=max_hops))
+
+    # networkx的simple_cycles包含自环
+    expected = sorted(_rotated(cycle) for cycle in nx.simple_cycles(G, length_bound=max_hops))
+    result = find_cycles(index, None, max_hops, min_amount, limit=10 ** 6)
+    assert not result['truncated']
+    assert sorted(_rotated(cycle['nodes'][:-1]) for cycle in result['cycles']) == expected
+    for node in nodes:
+        cycles = find_cycles(index, node, max_hops, min_amount, limit=10 ** 6)['cycles']
+        assert sorted(_rotated(cycle['nodes'][:-1]) for cycle in cycles) == \
+            [cycle for cycle in expected if node in cycle]
+
+def test_self_loop_is_a_one_hop_cycle():
+    index = build_flow_index(pd.DataFrame({'source': ['a', 'a', 'b'], 'target': ['a', 'b', 'c'],
+                                           'weight': [30.0, 10.0, 10.0]}))
+    for node in [None, 'a']:
+        cycles = find_cycles(index, node)['cycles']
+        assert [(cycle['nodes'], cycle['amounts'], cycle['hops']) for cycle in cycles] == [(['a', 'a'], [30.0], 1)]
+    assert find_cycles(index, None, min_amount=50)['cycles'] == []
+
+def _complete_index(n: int) -> dict:
+    names = [f'n{i:02d}' for i in range(n)]
+    return build_flow_index(pd.DataFrame([(u, v, 1.0) for u in names for v in names if u != v],
+                                         columns=['source', 'target', 'weight']))
+
+def test_truncated_by_limit():
+    index = _complete_index(8)
+    result = trace_paths(index, 'n00', 'n01', max_hops=4, limit=5)
+    assert result['truncated'] and result['truncated_reason'] == 'limit'
+    assert len(result['paths']) == 5
+    result = find_cycles(index, None, max_hops=4, limit=7)
+    assert result['truncated_reason'] == 'limit' and len(result['cycles']) == 7
+
+def test_truncated_by_time_budget():
+    # 完全图上12条边以内的路径数量巨大，极短的预算在首次检查时即超时
+    index = _complete_index(12)
+    result = trace_paths(index, 'n00', 'n01', max_hops=12, limit=10 ** 9, time_budget=1e-9)
+    assert result['truncated'] and result['truncated_reason'] == 'time_budget'
+    for node in [None, 'n00']:
+        result = find_cycles(index, node, max_hops=12, limit=10 ** 9, time_budget=1e-9)
+        assert result['truncated_reason'] == 'time_budget'
+
+def test_invalid_parameters():
+    index = _complete_index(3)
+    with pytest.raises(ValueError):
+        trace_paths(index, 'n00', 'n01', max_hops=0)
+    with pytest.raises(ValueError):
+        trace_paths(index, 'n00', 'missing')
@@ -0,0 +1,26 @@
+import pytest
+from analysis import load_transaction_frame
+from frame_cache import CACHE_SETTINGS
+from instrumentation import StageTimings
+from synthetic_data import make_statement, write_statement_xlsx
+
+pytest.importorskip('pyarrow')
+
+def test_cache_hit_reports_the_same_parse_info(tmp_path, monkeypatch):
+    monkeypatch.setitem(CACHE_SETTINGS, 'folder', str(tmp_path / 'frames'))
+    monkeypatch.setitem(CACHE_SETTINGS, 'enabled', True)
+    df = make_statement(500, seed=5)
+    df['核心交易日期'] = df['核心交易日期'].astype(object)
+    df.loc[[3, 7], '核心交易日期'] = 'bad'
+    path = write_statement_xlsx(df, str(tmp_path / '20240101_120000_upload.xlsx'))
+
+    fresh, fresh_info, digest = load_transaction_frame(path, 'upload.xlsx', None, StageTimings('transaction'))
+    cached, cached_info, _ = load_transaction_frame(path, 'upload.xlsx', digest, StageTimings('transaction'))
+
+    assert fresh_info['engine'] != 'cache' and cached_info['engine'] == 'cache'
+    for key in ['file', 'rows', 'columns', 'malformed_rows']:
+        assert cached_info[key] == fresh_info[key]
+    assert fresh_info['file'] == 'upload.xlsx'
+    assert fresh_info['malformed_rows']['count'] == 2
+    assert cached.dtypes.equals(fresh.dtypes) and len(cached) == len(fresh) == 498
+    assert cached.equals(fresh.reset_index(drop=True))
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from graph_summary import ROOT_GROUP, EXTERNAL_NODE, build_group_view, group_members, summary_groups
+from synthetic_data import make_statement
+
+NODE_LIMIT = 6
+
+@pytest.fixture(scope='module')
+def grouped() -> pd.DataFrame:
+    df = make_statement(3000, counterparties=150, accounts=8, account_overlap=0.2, seed=4)
+    return df.groupby(['账户名称', '交易借贷标志', '对方户名'])['交易金额'].sum().reset_index()
+
+def _incident_flow(grouped: pd.DataFrame, members) -> float:
+    members = set(members)
+    incident = grouped['账户名称'].isin(members) | grouped['对方户名'].isin(members)
+    return grouped.loc[incident, '交易金额'].sum()
+
+def test_expand_walk_visits_each_party_once_and_conserves_flow(grouped):
+    root_groups = summary_groups(grouped, NODE_LIMIT)
+    parties = {str(party) for party in set(grouped['账户名称']) | set(grouped['对方户名'])}
+    seen = []
+    depths = []
+
+    def walk(group: str, depth: int) -> None:
+        depths.append(depth)
+        view = build_group_view(grouped, group, NODE_LIMIT, root_groups)
+        members = group_members(grouped, group, NODE_LIMIT, root_groups)
+        assert len(view['nodes']) <= NODE_LIMIT
+        assert view['member_count'] == len(members)
+        # 该层的边金额合计等于与成员有关的全部原始交易
+        assert view['total_flow'] == pytest.approx(_incident_flow(grouped, members))
+        assert sum(node['type'] == 'external' for node in view['nodes']) == (group != ROOT_GROUP)
+        for node in view['nodes']:
+            if node['type'] == 'party':
+                seen.append(node['label'])
+            elif node['type'] == 'group':
+                # 超级节点的流量和内部流量与展开后的一层一致
+                child = build_group_view(grouped, node['group'], NODE_LIMIT, root_groups)
+                assert node['flow'] == pytest.approx(child['total_flow'])
+                edges = child['edges']
+                inner = edges[(edges['账户名称'] != EXTERNAL_NODE) & (edges['对方户名'] != EXTERNAL_NODE)]
+                assert node['internal_flow'] == pytest.approx(inner['交易金额'].sum())
+                walk(node['group'], depth + 1)
+
+    walk(ROOT_GROUP, 0)
+    assert max(depths) >= 2
+    assert len(seen) == len(set(seen))
+    assert set(seen) == parties
+
+def test_root_flow_matches_all_transactions(grouped):
+    view = build_group_view(grouped, ROOT_GROUP, NODE_LIMIT)
+    assert view['total_flow'] == pytest.approx(grouped['交易金额'].sum())
+
+def test_unknown_group_is_rejected(grouped):
+    with pytest.raises(ValueError):
+        build_group_view(grouped, 'c999', NODE_LIMIT)
+    with pytest.raises(ValueError):
+        build_group_view(grouped, 'x;drop', NODE_LIMIT)
+    with pytest.raises(ValueError):
+        build_group_view(grouped, ROOT_GROUP, 2)
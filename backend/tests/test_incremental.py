@@ -0,0 +1,60 @@
+import os
+import numpy as np
+from pandas.testing import assert_frame_equal
+import aggregation
+from aggregation import build_aggregate_state
+from analysis import build_analysis_tables, load_transaction_frame
+from frame_cache import CACHE_SETTINGS
+from incremental import ACCOUNT_SETTINGS, append_statement, load_account_state
+from instrumentation import StageTimings
+from synthetic_data import make_statement, write_statement_xlsx
+
+def test_state_size_does_not_grow_with_appended_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(aggregation, 'AMOUNT_SAMPLE_SIZE', 300)
+    monkeypatch.setitem(ACCOUNT_SETTINGS, 'folder', str(tmp_path / 'accounts'))
+    monkeypatch.setitem(CACHE_SETTINGS, 'enabled', False)
+
+    # 各文件的键值（对手、日期、类型等）相同，只有行数累加
+    df = make_statement(6000, counterparties=40, accounts=2, days=20, seed=7)
+    sizes = []
+    for i in range(6):
+        path = write_statement_xlsx(df.iloc[i * 1000:(i + 1) * 1000], str(tmp_path / f'part_{i}.xlsx'))
+        append_statement('acct', path, f'part_{i}.xlsx')
+        sizes.append(os.path.getsize(tmp_path / 'accounts' / 'acct.pkl'))
+
+    state = load_account_state('acct')
+    assert state['aggregate']['row_count'] == 6000
+    assert state['aggregate']['amount_sample']['population'] == 6000
+    assert len(state['aggregate']['amount_sample']['values']) == 300
+    assert 'signed_amounts' not in state
+    assert sizes[-1] <= sizes[1] * 1.05
+
+def test_merged_sample_is_bounded_and_drawn_from_both_sides():
+    left = aggregation.sample_amounts(np.zeros(1000), size=100)
+    right = aggregation.sample_amounts(np.ones(3000), size=100)
+    merged = aggregation.merge_amount_samples(left, right, size=100)
+    assert merged['population'] == 4000
+    assert len(merged['values']) == 100
+    # 按行数加权：约四分之三的样本来自右侧
+    assert 50 < merged['values'].sum() < 95
+
+def test_appending_in_parts_matches_single_shot_analysis(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(ACCOUNT_SETTINGS, 'folder', str(tmp_path / 'accounts'))
+    monkeypatch.setitem(CACHE_SETTINGS, 'enabled', False)
+
+    df = make_statement(4000, counterparties=60, accounts=3, days=30, seed=11)
+    whole = write_statement_xlsx(df, str(tmp_path / 'whole.xlsx'))
+    frame, _, _ = load_transaction_frame(whole, 'whole.xlsx', None, StageTimings('transaction'))
+    expected = build_analysis_tables(build_aggregate_state(frame))
+
+    for i, (start, end) in enumerate([(0, 1300), (1300, 1301), (1301, 2900), (2900, 4000)]):
+        path = write_statement_xlsx(df.iloc[start:end], str(tmp_path / f'part_{i}.xlsx'))
+        append_statement('acct', path, f'part_{i}.xlsx')
+    actual = build_analysis_tables(load_account_state('acct')['aggregate'])
+
+    # 金额在状态中按整数分合并，分批追加与一次性分析的结果逐位相同
+    assert expected.keys() == actual.keys()
+    for name in expected:
+        assert_frame_equal(actual[name], expected[name], check_exact=True)
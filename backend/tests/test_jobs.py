@@ -0,0 +1,35 @@
+import pytest
+import jobs
+from ingestion import LOAD_SETTINGS, configure_loading, iter_excel_files
+
+def _load_limit(progress) -> dict:
+    return {'max_workers': LOAD_SETTINGS['max_workers']}
+
+@pytest.fixture
+def job_pool(monkeypatch):
+    monkeypatch.setitem(jobs.JOB_SETTINGS, 'workers', 2)
+    monkeypatch.setattr(jobs, '_executor', None)
+    yield
+    if jobs._executor is not None:
+        jobs._executor.shutdown()
+
+def test_job_workers_share_cpus_for_file_loading(job_pool, monkeypatch):
+    monkeypatch.setattr(jobs.os, 'cpu_count', lambda: 8)
+    assert jobs.nested_load_workers(2) == 4
+    assert jobs.nested_load_workers(16) == 1
+
+    job = jobs.get_job(jobs.submit_job('test', _load_limit, (), ['run']))
+    assert job['future'].result(timeout=60) == {'max_workers': 4}
+    # 主进程不受限制
+    assert LOAD_SETTINGS['max_workers'] is None
+
+def test_single_load_worker_reads_in_process(monkeypatch):
+    monkeypatch.setitem(LOAD_SETTINGS, 'max_workers', None)
+    configure_loading(1)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError('不应创建进程池')
+
+    monkeypatch.setattr('ingestion.ProcessPoolExecutor', no_pool)
+    monkeypatch.setattr('ingestion._read_excel_task', lambda task: (task[0], {}))
+    assert [path for path, _ in iter_excel_files(['a.xlsx', 'b.xlsx'], [], workers=8)] == ['a.xlsx', 'b.xlsx']
@@ -0,0 +1,73 @@
+import uuid
+import numpy as np
+import pandas as pd
+import pytest
+import result_views
+from result_store import save_result
+
+def _counterparty_stats() -> pd.DataFrame:
+    # 交易次数有重复（检查稳定排序），总交易金额含缺失值（检查排在最后）
+    return pd.DataFrame({
+        '对方户名': ['Alpha', 'beta', 'Gamma', 'delta', 'ALPHA二', 'epsilon', 'zeta'],
+        '交易次数': [5, 3, 5, 1, 3, 5, 2],
+        '总交易金额': [100.0, -50.0, np.nan, 20.0, 300.0, -10.0, 0.0]
+    })
+
+@pytest.fixture
+def analysis(client):
+    analysis_id = uuid.uuid4().hex[:24]
+    save_result(analysis_id, {'analysis_id': analysis_id, 'tables': {'counterparty_stats': _counterparty_stats()}})
+    return f'/api/analyses/{analysis_id}/tables/counterparty_stats', analysis_id
+
+def _names(response) -> list:
+    assert response.status_code == 200, response.get_json()
+    return [row['对方户名'] for row in response.get_json()['rows']]
+
+def test_default_sort_and_page_bounds(client, analysis):
+    url, _ = analysis
+    # 默认按交易次数降序，次数相同时保持原有顺序
+    assert _names(client.get(url)) == ['Alpha', 'Gamma', 'epsilon', 'beta', 'ALPHA二', 'zeta', 'delta']
+    body = client.get(f'{url}?page=2&page_size=3').get_json()
+    assert [row['对方户名'] for row in body['rows']] == ['beta', 'ALPHA二', 'zeta']
+    assert (body['total'], body['filtered'], body['page'], body['page_size']) == (7, 7, 2, 3)
+    assert _names(client.get(f'{url}?page=3&page_size=3')) == ['delta']
+    # 超出范围的页返回空结果
+    assert _names(client.get(f'{url}?page=4&page_size=3')) == []
+
+    for query in ['page=0', 'page=-1', 'page_size=0', f'page_size={result_views.MAX_PAGE_SIZE + 1}', 'page=x']:
+        response = client.get(f'{url}?{query}')
+        assert response.status_code == 400, query
+        assert response.get_json()['error'].startswith('参数错误')
+
+def test_sort_column_must_exist(client, analysis):
+    url, _ = analysis
+    assert _names(client.get(f'{url}?sort=对方户名'))[:2] == ['ALPHA二', 'Alpha']
+    for query in ['sort=不存在的列', 'sort=__class__', 'order=up', 'amount_column=不存在的列']:
+        assert client.get(f'{url}?{query}').status_code == 400, query
+    assert client.get(url.replace('counterparty_stats', 'channel_stats')).status_code == 400
+    assert client.get('/api/analyses/0123456789abcdef01234567/tables/counterparty_stats').status_code == 404
+
+def test_filters(client, analysis):
+    url, _ = analysis
+    # 名称筛选不区分大小写、按字面匹配；金额范围包含两端，缺失金额不满足任何范围
+    assert _names(client.get(f'{url}?name=alpha')) == ['Alpha', 'ALPHA二']
+    assert _names(client.get(f'{url}?name=.')) == []
+    assert _names(client.get(f'{url}?min_amount=0&max_amount=100&sort=总交易金额&order=asc')) == ['zeta', 'delta', 'Alpha']
+    assert _names(client.get(f'{url}?min_amount=3&amount_column=交易次数&name=a')) == ['Alpha', 'Gamma', 'beta', 'ALPHA二']
+    body = client.get(f'{url}?name=a&page_size=1').get_json()
+    assert (body['total'], body['filtered'], len(body['rows'])) == (7, 6, 1)
+
+def test_cached_sort_order(client, analysis):
+    url, analysis_id = analysis
+    df = _counterparty_stats()
+    assert _names(client.get(f'{url}?sort=总交易金额&order=desc')) == ['ALPHA二', 'Alpha', 'delta', 'zeta', 'epsilon', 'beta', 'Gamma']
+    cached = result_views._sort_cache[(analysis_id, 'counterparty_stats', '总交易金额', True)]
+    # 缓存的是行位置：稳定的降序排列，缺失值在最后
+    np.testing.assert_array_equal(cached, [4, 0, 3, 6, 5, 1, 2])
+    assert _names(client.get(f'{url}?sort=总交易金额&order=asc'))[-1] == 'Gamma'
+    np.testing.assert_array_equal(result_views._sort_cache[(analysis_id, 'counterparty_stats', '总交易金额', False)],
+                                  df['总交易金额'].sort_values(kind='stable', na_position='last').index)
+
+    # 同一排序再次查询（含筛选）时复用缓存
+    assert _names(client.get(f'{url}?sort=总交易金额&order=desc&name=a')) == ['ALPHA二', 'Alpha', 'delta', 'zeta', 'beta', 'Gamma']
+    assert result_views._sort_cache[(analysis_id, 'counterparty_stats', '总交易金额', True)] is cached
@@ -0,0 +1,41 @@
+import sqlite3
+import pandas as pd
+import pytest
+import transaction_store
+from analysis import preprocess_data
+from synthetic_data import make_statement
+from transaction_store import (TRANSACTION_STORE_SETTINGS, store_transactions, query_transactions,
+                               aggregate_transactions, delete_dataset)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / 'transactions.sqlite3')
+    monkeypatch.setitem(TRANSACTION_STORE_SETTINGS, 'path', path)
+    return path
+
+def test_dataset_ids_differing_only_by_case_are_separate(store):
+    upper = preprocess_data(make_statement(300, counterparties=20, seed=1))
+    lower = preprocess_data(make_statement(200, counterparties=20, seed=2))
+    assert store_transactions('Acct', 'digest-a', upper) == 300
+    assert store_transactions('acct', 'digest-b', lower) == 200
+
+    assert query_transactions('Acct', {})['total'] == 300
+    assert query_transactions('acct', {})['total'] == 200
+    assert sum(row['交易次数'] for row in aggregate_transactions('acct', 'direction', {})['rows']) == 200
+
+    assert delete_dataset('Acct') == 300
+    assert query_transactions('Acct', {})['total'] == 0
+    assert query_transactions('acct', {})['total'] == 200
+
+def test_rows_are_inserted_in_chunks(store, monkeypatch):
+    monkeypatch.setattr(transaction_store, 'INSERT_CHUNK_ROWS', 64)
+    df = preprocess_data(make_statement(300, counterparties=10, seed=3))
+    df.loc[df.index[::7], '交易金额_分'] = pd.NA
+    assert store_transactions('chunked', 'digest', df) == 300
+
+    with sqlite3.connect(store) as conn:
+        table = transaction_store._table('chunked')
+        stored = conn.execute(f'SELECT COUNT(*), COUNT(amount_cents), SUM(signed_cents) FROM {table}').fetchone()
+        assert conn.execute('SELECT rows FROM files WHERE dataset = ?', ('chunked',)).fetchone() == (300,)
+    signed = df['交易金额_分'] * df['借贷方向'].astype(int)
+    assert stored == (300, int(df['交易金额_分'].notna().sum()), int(signed.sum()))
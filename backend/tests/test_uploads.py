@@ -0,0 +1,59 @@
+import hashlib
+import os
+import time
+import uploads
+from uploads import UPLOAD_SETTINGS, create_upload_session, prune_sessions
+from synthetic_data import make_statement, write_statement_xlsx
+
+def test_chunked_upload_resumes_from_server_offset(client, tmp_path):
+    path = write_statement_xlsx(make_statement(500, seed=3), str(tmp_path / 'statement.xlsx'))
+    with open(path, 'rb') as f:
+        data = f.read()
+    half = len(data) // 2
+
+    response = client.post('/api/uploads', json={'filename': 'statement.xlsx', 'size': len(data)})
+    assert response.status_code == 201
+    session = response.get_json()
+    assert session['offset'] == 0
+    url = session['upload_url']
+
+    assert client.put(f'{url}?offset=0', data=data[:half]).get_json()['offset'] == half
+
+    # 起始位置与已接收的大小不一致时返回409和应继续的位置
+    response = client.put(f'{url}?offset=0', data=data[:half])
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == half
+    response = client.put(url, data=data[half:], headers={'Upload-Offset': str(half + 1)})
+    assert response.status_code == 409
+
+    # 未上传完成时不能完成
+    assert client.post(session['complete_url']).status_code == 400
+
+    # 模拟服务重启：增量摘要丢失后按断点续传，完成时重新计算摘要
+    uploads._hashers.clear()
+    assert client.get(url).get_json()['offset'] == half
+    assert client.put(url, data=data[half:], headers={'Upload-Offset': str(half)}).get_json()['offset'] == len(data)
+
+    response = client.post(session['complete_url'])
+    assert response.status_code == 200
+    assert response.get_json()['analysis_id'] == hashlib.sha256(data).hexdigest()[:24]
+    assert client.get(url).status_code == 404
+    assert session['upload_id'] not in uploads._session_locks
+
+def test_prune_uses_latest_activity_and_removes_whole_session(tmp_path, monkeypatch):
+    monkeypatch.setitem(UPLOAD_SETTINGS, 'folder', str(tmp_path))
+    monkeypatch.setitem(UPLOAD_SETTINGS, 'session_ttl', 60)
+    active = create_upload_session('active.xlsx', 100)
+    stale = create_upload_session('stale.xlsx', 100)
+    uploads._session_lock(stale['upload_id'])
+    folder = tmp_path / 'sessions'
+    old = time.time() - 3600
+
+    # 元数据很旧但最近仍在接收分块的会话保留
+    os.utime(folder / f"{active['upload_id']}.json", (old, old))
+    for suffix in ['json', 'part']:
+        os.utime(folder / f"{stale['upload_id']}.{suffix}", (old, old))
+    prune_sessions()
+
+    assert sorted(os.listdir(folder)) == sorted(f"{active['upload_id']}.{suffix}" for suffix in ['json', 'part'])
+    assert stale['upload_id'] not in uploads._session_locks
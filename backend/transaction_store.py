@@ -0,0 +1,335 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from contextlib import closing
+from typing import Dict, List, Any, Iterator, Optional, Mapping, Tuple
+
+# 交易明细存储配置，可由api.py通过configure_transaction_store覆盖
+TRANSACTION_STORE_SETTINGS = {
+    'path': os.environ.get('TRANSACTION_STORE_PATH', os.path.join('outputs', 'transactions.sqlite3')),
+    'enabled': os.environ.get('TRANSACTION_STORE_ENABLED', '0') == '1'
+}
+
+# 数据集标识：单次上传为analysis_id，增量分析为账户标识
+DATASET_ID_PATTERN = re.compile(r'^[0-9A-Za-z_-]{1,64}$')
+
+# 每批写入的行数
+INSERT_CHUNK_ROWS = 50000
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# 每个数据集一张明细表（删除数据集时直接DROP），files表记录已写入的文件
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    dataset TEXT NOT NULL,
+    file_digest TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (dataset, file_digest)
+);
+"""
+
+TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    counterparty TEXT,
+    counterparty_account TEXT,
+    counterparty_bank TEXT,
+    direction TEXT,
+    amount_cents INTEGER,
+    signed_cents INTEGER,
+    transaction_type TEXT,
+    channel TEXT,
+    cash_flag TEXT,
+    trade_date INTEGER NOT NULL,
+    trade_ts INTEGER NOT NULL,
+    trade_hour INTEGER NOT NULL
+)
+"""
+
+# 首次写入数据集时在批量插入之后再建索引，比逐行维护索引快数倍
+INDEX_SCHEMA = [
+    ('counterparty', 'counterparty, trade_date'),
+    ('date', 'trade_date, trade_ts'),
+    ('amount', 'amount_cents')
+]
+
+# SQLite页缓存（KB），批量插入和建索引时减少磁盘读写
+CACHE_KB = 131072
+
+# 预处理后的列与存储列的对应关系
+STORED_COLUMNS = [
+    ('对方户名', 'counterparty'),
+    ('对方账号', 'counterparty_account'),
+    ('对方行名', 'counterparty_bank'),
+    ('交易借贷标志', 'direction'),
+    ('交易类型', 'transaction_type'),
+    ('交易渠道', 'channel'),
+    ('现转标志', 'cash_flag')
+]
+
+# 查询结果的列名，与分析表保持一致
+OUTPUT_COLUMNS = {
+    'trade_time': '交易时间',
+    'counterparty': '对方户名',
+    'counterparty_account': '对方账号',
+    'counterparty_bank': '对方行名',
+    'direction': '交易借贷标志',
+    'amount': '交易金额',
+    'signed_amount': '交易金额_正负',
+    'transaction_type': '交易类型',
+    'channel': '交易渠道',
+    'cash_flag': '现转标志'
+}
+
+# 允许排序的字段，均有索引支持
+SORT_COLUMNS = {
+    'time': ['trade_date', 'trade_ts'],
+    'amount': ['amount_cents'],
+    'counterparty': ['counterparty', 'trade_date']
+}
+
+# 允许的分组维度及对应的SQL表达式
+GROUP_BY_EXPRESSIONS = {
+    'counterparty': 'counterparty',
+    'date': 'trade_date',
+    'month': 'trade_date / 100',
+    'hour': 'trade_hour',
+    'type': 'transaction_type',
+    'channel': 'channel',
+    'direction': 'direction'
+}
+
+def configure_transaction_store(path: Optional[str] = None, enabled: Optional[bool] = None) -> None:
+    """
+    设置SQLite文件路径和开关
+    """
+    if path is not None:
+        TRANSACTION_STORE_SETTINGS['path'] = path
+    if enabled is not None:
+        TRANSACTION_STORE_SETTINGS['enabled'] = bool(enabled)
+
+def store_enabled() -> bool:
+    return TRANSACTION_STORE_SETTINGS['enabled']
+
+def validate_dataset_id(dataset: str) -> str:
+    """
+    校验数据集标识，非法时抛出ValueError
+    """
+    if not DATASET_ID_PATTERN.match(dataset or ''):
+        raise ValueError('数据集标识只能包含字母、数字、下划线和连字符，长度不超过64')
+    return dataset
+
+def _table_name(dataset: str) -> str:
+    """
+    数据集的明细表名（不含引号）；数据集标识已校验，只含字母、数字、下划线和连字符
+    SQLite的表名和索引名不区分大小写：标识转为小写后附加原标识的摘要，只有大小写不同的数据集对应不同的表
+    """
+    suffix = hashlib.sha1(validate_dataset_id(dataset).encode('utf-8')).hexdigest()[:8]
+    return f'tx_{dataset.lower()}_{suffix}'
+
+def _table(dataset: str) -> str:
+    return f'"{_table_name(dataset)}"'
+
+def _connect() -> sqlite3.Connection:
+    """
+    每次调用打开新连接（连接开销很小，避免跨线程共享）；WAL模式下读写互不阻塞
+    """
+    path = TRANSACTION_STORE_SETTINGS['path']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_KB}')
+    conn.executescript(SCHEMA)
+    return conn
+
+def _table_exists(conn: sqlite3.Connection, dataset: str) -> bool:
+    """
+    数据集的明细表是否存在
+    """
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                        (_table_name(dataset),)).fetchone() is not None
+
+def _python_values(series: pd.Series) -> List[Any]:
+    """
+    转换为SQLite可接受的Python原生值，缺失值为None
+    """
+    values = series.astype(object)
+    return values.where(series.notna(), None).tolist()
+
+def _row_chunks(df: pd.DataFrame) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    按INSERT_CHUNK_ROWS行分块转换为插入用的元组，内存中只保留当前一块的Python对象
+    """
+    for start in range(0, len(df), INSERT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + INSERT_CHUNK_ROWS]
+        cents = chunk['交易金额_分']
+        amount = cents.to_numpy(dtype=np.int64, na_value=0)
+        signed = amount * chunk['借贷方向'].to_numpy(dtype=np.int64)
+        has_amount = cents.notna().to_numpy()
+        dates = chunk['核心交易日期']
+        columns = [_python_values(chunk[source]) for source, _ in STORED_COLUMNS[:4]]
+        columns.append([int(v) if ok else None for v, ok in zip(amount.tolist(), has_amount.tolist())])
+        columns.append([int(v) if ok else None for v, ok in zip(signed.tolist(), has_amount.tolist())])
+        columns += [_python_values(chunk[source]) for source, _ in STORED_COLUMNS[4:]]
+        columns.append((dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype(np.int64).tolist())
+        columns.append((chunk['交易时间'].to_numpy(dtype='datetime64[s]').astype(np.int64)).tolist())
+        columns.append(chunk['交易小时'].astype(np.int64).tolist())
+        yield list(zip(*columns))
+
+def store_transactions(dataset: str, digest: str, df: pd.DataFrame) -> int:
+    """
+    将预处理后的流水写入存储，同一数据集中已写入过的文件（内容摘要相同）跳过
+    返回写入的行数
+    """
+    table = _table(dataset)
+    names = ([name for _, name in STORED_COLUMNS[:4]] + ['amount_cents', 'signed_cents'] +
+             [name for _, name in STORED_COLUMNS[4:]] + ['trade_date', 'trade_ts', 'trade_hour'])
+    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+    with closing(_connect()) as conn:
+        with conn:
+            stored = conn.execute('SELECT 1 FROM files WHERE dataset = ? AND file_digest = ?',
+                                  (dataset, digest)).fetchone()
+            if stored:
+                return 0
+            is_new = not _table_exists(conn, dataset)
+            conn.execute(TABLE_SCHEMA.format(table=table))
+            for rows in _row_chunks(df):
+                conn.executemany(sql, rows)
+            if is_new:
+                for name, index_columns in INDEX_SCHEMA:
+                    conn.execute(f'CREATE INDEX "idx_{_table_name(dataset)[3:]}_{name}" '
+                                 f'ON {table} ({index_columns})')
+            conn.execute('INSERT INTO files (dataset, file_digest, rows, stored_at) VALUES (?, ?, ?, ?)',
+                         (dataset, digest, len(df), time.time()))
+    return len(df)
+
+def _parse_date(value: str) -> int:
+    """
+    将YYYY-MM-DD或YYYYMMDD转换为整数日期
+    """
+    return int(pd.Timestamp(value).strftime('%Y%m%d'))
+
+def build_filters(params: Mapping[str, str]) -> Tuple[str, List[Any]]:
+    """
+    由查询参数生成WHERE子句和参数，参数非法时抛出ValueError
+    支持：counterparty（精确）、counterparty_like（包含）、date_from/date_to、
+    min_amount/max_amount（元，按金额绝对值）、direction（借/贷）、type、channel
+    """
+    clauses: List[str] = []
+    args: List[Any] = []
+    if params.get('counterparty'):
+        clauses.append('counterparty = ?')
+        args.append(params['counterparty'])
+    if params.get('counterparty_like'):
+        clauses.append("counterparty LIKE ? ESCAPE '\\'")
+        escaped = re.sub(r'([\\%_])', r'\\\1', params['counterparty_like'])
+        args.append(f'%{escaped}%')
+    if params.get('date_from'):
+        clauses.append('trade_date >= ?')
+        args.append(_parse_date(params['date_from']))
+    if params.get('date_to'):
+        clauses.append('trade_date <= ?')
+        args.append(_parse_date(params['date_to']))
+    if params.get('min_amount'):
+        clauses.append('amount_cents >= ?')
+        args.append(int(round(float(params['min_amount']) * 100)))
+    if params.get('max_amount'):
+        clauses.append('amount_cents <= ?')
+        args.append(int(round(float(params['max_amount']) * 100)))
+    for key, column in [('direction', 'direction'), ('type', 'transaction_type'), ('channel', 'channel')]:
+        if params.get(key):
+            clauses.append(f'{column} = ?')
+            args.append(params[key])
+    return ''.join(f' AND {clause}' for clause in clauses), args
+
+def query_transactions(dataset: str, params: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    按条件分页查询交易明细；sort为time/amount/counterparty，
+    前缀'-'表示降序，默认按交易时间升序；数据集不存在时返回空结果
+    """
+    table = _table(dataset)
+    where, args = build_filters(params)
+    page = int(params.get('page') or 1)
+    page_size = int(params.get('page_size') or DEFAULT_PAGE_SIZE)
+    if page < 1 or not (1 <= page_size <= MAX_PAGE_SIZE):
+        raise ValueError(f'page必须为正整数，page_size需在1-{MAX_PAGE_SIZE}之间')
+    sort = params.get('sort') or 'time'
+    descending = sort.startswith('-')
+    if sort.lstrip('-') not in SORT_COLUMNS:
+        raise ValueError(f"sort只能为{', '.join(SORT_COLUMNS)}，可加前缀'-'表示降序")
+    order = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f'{column} {order}' for column in SORT_COLUMNS[sort.lstrip('-')] + ['rowid'])
+
+    sql = ("SELECT datetime(trade_ts, 'unixepoch') AS trade_time, counterparty, counterparty_account, "
+           "counterparty_bank, direction, amount_cents / 100.0 AS amount, signed_cents / 100.0 AS signed_amount, "
+           "transaction_type, channel, cash_flag "
+           f"FROM {table} WHERE 1 = 1{where} ORDER BY {order_by} LIMIT ? OFFSET ?")
+    total, rows = 0, []
+    with closing(_connect()) as conn:
+        if _table_exists(conn, dataset):
+            total = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE 1 = 1{where}', args).fetchone()[0]
+            cursor = conn.execute(sql, args + [page_size, (page - 1) * page_size])
+            names = [OUTPUT_COLUMNS[column[0]] for column in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    return {'dataset': dataset, 'total': total, 'page': page, 'page_size': page_size,
+            'sort': sort, 'rows': rows}
+
+def aggregate_transactions(dataset: str, group_by: str, params: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    按维度汇总满足条件的交易：交易次数、净金额、收入、支出，按交易次数降序，
+    limit限制返回的分组数（默认100）
+    """
+    table = _table(dataset)
+    if group_by not in GROUP_BY_EXPRESSIONS:
+        raise ValueError(f"group_by只能为{', '.join(GROUP_BY_EXPRESSIONS)}")
+    where, args = build_filters(params)
+    limit = int(params.get('limit') or 100)
+    if not (1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f'limit需在1-{MAX_PAGE_SIZE}之间')
+
+    sql = (f"SELECT {GROUP_BY_EXPRESSIONS[group_by]} AS key, COUNT(*) AS count, "
+           "SUM(signed_cents) / 100.0 AS net, "
+           "SUM(CASE WHEN direction = '贷' THEN amount_cents ELSE 0 END) / 100.0 AS income, "
+           "SUM(CASE WHEN direction = '借' THEN amount_cents ELSE 0 END) / 100.0 AS expense "
+           f"FROM {table} WHERE 1 = 1{where} GROUP BY key ORDER BY count DESC, key LIMIT ?")
+    rows = []
+    with closing(_connect()) as conn:
+        if _table_exists(conn, dataset):
+            rows = conn.execute(sql, args + [limit]).fetchall()
+    return {
+        'dataset': dataset,
+        'group_by': group_by,
+        'rows': [{'key': key, '交易次数': count, '净金额': net or 0.0, '总收入': income or 0.0,
+                  '总支出': expense or 0.0} for key, count, net, income, expense in rows]
+    }
+
+def list_datasets() -> List[Dict[str, Any]]:
+    """
+    列出已存储的数据集及其文件数和行数
+    """
+    with closing(_connect()) as conn:
+        rows = conn.execute('SELECT dataset, COUNT(*), SUM(rows), MAX(stored_at) FROM files '
+                            'GROUP BY dataset ORDER BY MAX(stored_at) DESC').fetchall()
+    return [{'dataset': dataset, 'files': files, 'rows': total, 'stored_at': stored_at}
+            for dataset, files, total, stored_at in rows]
+
+def delete_dataset(dataset: str) -> int:
+    """
+    删除数据集的全部交易明细，返回删除的行数
+    """
+    table = _table(dataset)
+    with closing(_connect()) as conn:
+        with conn:
+            deleted = conn.execute('SELECT COALESCE(SUM(rows), 0) FROM files WHERE dataset = ?',
+                                   (dataset,)).fetchone()[0]
+            if _table_exists(conn, dataset):
+                conn.execute(f'DROP TABLE {table}')
+            conn.execute('DELETE FROM files WHERE dataset = ?', (dataset,))
+    return deleted
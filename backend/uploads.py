@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import Request
+
+# 上传配置，可由api.py通过configure_uploads覆盖
+UPLOAD_SETTINGS = {
+    'folder': 'uploads',
+    'max_bytes': int(os.environ.get('MAX_CONTENT_LENGTH', 1024 * 1024 * 1024)),
+    'chunk_size': 1024 * 1024,
+    'session_ttl': int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+}
+
+class UploadError(ValueError):
+    """分块上传参数或状态错误"""
+
+class UploadOffsetError(UploadError):
+    """分块的起始位置与服务器已接收的大小不一致"""
+
+    def __init__(self, expected: int):
+        super().__init__(f'分块起始位置错误，应从第{expected}字节继续上传')
+        self.expected = expected
+
+_lock = threading.Lock()
+_session_locks: Dict[str, threading.Lock] = {}
+# 分块上传过程中的增量摘要，仅在当前进程中有效，缺失时完成上传后重新计算
+_hashers: Dict[str, Tuple[int, Any]] = {}
+
+def configure_uploads(folder: Optional[str] = None, max_bytes: Optional[int] = None,
+                      chunk_size: Optional[int] = None, session_ttl: Optional[int] = None) -> None:
+    """
+    设置上传目录、单个文件大小上限、读写块大小和未完成分块上传的保留时间
+    """
+    if folder is not None:
+        UPLOAD_SETTINGS['folder'] = folder
+    if max_bytes is not None:
+        UPLOAD_SETTINGS['max_bytes'] = int(max_bytes)
+    if chunk_size is not None:
+        UPLOAD_SETTINGS['chunk_size'] = int(chunk_size)
+    if session_ttl is not None:
+        UPLOAD_SETTINGS['session_ttl'] = int(session_ttl)
+
+class HashingSpool:
+    """
+    上传文件直接写入上传目录的临时文件，写入时同步计算SHA-256并检查大小上限
+    """
+
+    def __init__(self, folder: str, max_bytes: int):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix='incoming_', suffix='.part', dir=folder)
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha = hashlib.sha256()
+        self._max_bytes = max_bytes
+        self._persisted = False
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self._max_bytes:
+            self.close()
+            raise RequestEntityTooLarge()
+        self._sha.update(data)
+        return self._file.write(data)
+
+    def read(self, *args) -> bytes:
+        return self._file.read(*args)
+
+    def readline(self, *args) -> bytes:
+        return self._file.readline(*args)
+
+    def seek(self, *args) -> int:
+        return self._file.seek(*args)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
+    def persist(self, dest_path: str) -> None:
+        """
+        将临时文件移动到目标路径，无需再次复制
+        """
+        self._file.close()
+        os.replace(self.path, dest_path)
+        self._persisted = True
+
+    def close(self) -> None:
+        # 未被保存的上传（如格式校验失败）在请求结束时删除
+        if not self._file.closed:
+            self._file.close()
+        if not self._persisted and os.path.exists(self.path):
+            os.remove(self.path)
+
+class StreamingRequest(Request):
+    """
+    multipart上传的文件不经过内存或系统临时目录，直接流式写入上传目录
+    """
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None,
+                         content_length: Optional[int] = None) -> BinaryIO:
+        return HashingSpool(UPLOAD_SETTINGS['folder'], UPLOAD_SETTINGS['max_bytes'])
+
+def save_upload(file, dest_path: str) -> Tuple[int, str]:
+    """
+    保存上传文件并返回(字节数, SHA-256摘要)
+    由StreamingRequest接收的文件直接移动；其他来源的文件按块复制并同时计算摘要
+    """
+    stream = getattr(file, 'stream', file)
+    if isinstance(stream, HashingSpool):
+        stream.persist(dest_path)
+        return stream.size, stream.hexdigest()
+
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(UPLOAD_SETTINGS['chunk_size']), b''):
+                size += len(chunk)
+                if size > UPLOAD_SETTINGS['max_bytes']:
+                    raise RequestEntityTooLarge()
+                sha.update(chunk)
+                f.write(chunk)
+    except Exception:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return size, sha.hexdigest()
+
+def _session_folder() -> str:
+    return os.path.join(UPLOAD_SETTINGS['folder'], 'sessions')
+
+def _session_paths(upload_id: str) -> Tuple[str, str]:
+    if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('上传ID无效')
+    folder = _session_folder()
+    return os.path.join(folder, f'{upload_id}.json'), os.path.join(folder, f'{upload_id}.part')
+
+def _session_lock(upload_id: str) -> threading.Lock:
+    with _lock:
+        return _session_locks.setdefault(upload_id, threading.Lock())
+
+def _write_session(session: Dict[str, Any]) -> None:
+    meta_path, _ = _session_paths(session['upload_id'])
+    temp_path = f'{meta_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(temp_path, meta_path)
+
+def _read_session(upload_id: str) -> Dict[str, Any]:
+    meta_path, part_path = _session_paths(upload_id)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError('上传会话不存在或已过期')
+    with open(meta_path, encoding='utf-8') as f:
+        session = json.load(f)
+    session['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return session
+
+def prune_sessions() -> None:
+    """
+    删除超过保留时间仍未完成的分块上传
+    会话的.json和.part按两者中较新的修改时间计算空闲时长（每个分块都会更新.part），
+    过期时一并删除并释放会话锁；正在写入分块的会话跳过
+    """
+    folder = _session_folder()
+    if not os.path.isdir(folder):
+        return
+    sessions: Dict[str, List[str]] = {}
+    for name in os.listdir(folder):
+        sessions.setdefault(name.split('.', 1)[0], []).append(os.path.join(folder, name))
+
+    now = time.time()
+    for upload_id, paths in sessions.items():
+        try:
+            last_active = max(os.path.getmtime(path) for path in paths)
+        except OSError:
+            continue
+        if now - last_active <= UPLOAD_SETTINGS['session_ttl']:
+            continue
+        lock = _session_lock(upload_id)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            _hashers.pop(upload_id, None)
+        finally:
+            lock.release()
+        with _lock:
+            _session_locks.pop(upload_id, None)
+
+def create_upload_session(filename: str, total_size: int) -> Dict[str, Any]:
+    """
+    创建分块上传会话，返回上传ID和建议的分块大小
+    """
+    if total_size <= 0:
+        raise UploadError('文件大小必须为正整数')
+    if total_size > UPLOAD_SETTINGS['max_bytes']:
+        raise UploadError(f"文件超过大小上限（{UPLOAD_SETTINGS['max_bytes']}字节）")
+
+    prune_sessions()
+    os.makedirs(_session_folder(), exist_ok=True)
+    session = {
+        'upload_id': uuid.uuid4().hex,
+        'filename': filename,
+        'size': total_size,
+        'created_at': time.time()
+    }
+    _write_session(session)
+    open(_session_paths(session['upload_id'])[1], 'wb').close()
+    session['offset'] = 0
+    session['chunk_size'] = UPLOAD_SETTINGS['chunk_size']
+    return session
+
+def upload_status(upload_id: str) -> Dict[str, Any]:
+    """
+    查询分块上传进度，断线后客户端从offset处继续上传
+    """
+    return _read_session(upload_id)
+
+def append_chunk(upload_id: str, offset: int, stream: BinaryIO) -> Dict[str, Any]:
+    """
+    从offset处追加一个分块，按块读取请求体，同时更新增量摘要
+    """
+    with _session_lock(upload_id):
+        session = _read_session(upload_id)
+        if offset != session['offset']:
+            raise UploadOffsetError(session['offset'])
+
+        _, part_path = _session_paths(upload_id)
+        hashed_offset, sha = _hashers.get(upload_id, (0, hashlib.sha256()))
+        # 增量摘要与文件内容不同步（如服务重启）时放弃，完成上传后重新计算
+        keep_hash = hashed_offset == offset
+        size = offset
+        with open(part_path, 'r+b') as f:
+            f.seek(offset)
+            try:
+                for chunk in iter(lambda: stream.read(UPLOAD_SETTINGS['chunk_size']), b''):
+                    size += len(chunk)
+                    if size > session['size']:
+                        raise UploadError('上传的数据超过声明的文件大小')
+                    if keep_hash:
+                        sha.update(chunk)
+                    f.write(chunk)
+            except Exception:
+                # 丢弃本次写入的不完整分块，增量摘要已包含部分数据，同样丢弃
+                f.truncate(offset)
+                _hashers.pop(upload_id, None)
+                raise
+
+        if keep_hash:
+            _hashers[upload_id] = (size, sha)
+        else:
+            _hashers.pop(upload_id, None)
+        session['offset'] = size
+        return session
+
+def complete_upload(upload_id: str, dest_path: str) -> Tuple[Dict[str, Any], str]:
+    """
+    校验分块上传已全部接收，将文件移动到dest_path，返回会话信息和SHA-256摘要
+    """
+    with _session_lock(upload_id):
+        session = _read_session(upload_id)
+        if session['offset'] != session['size']:
+            raise UploadError(f"文件尚未上传完成（{session['offset']}/{session['size']}字节）")
+
+        meta_path, part_path = _session_paths(upload_id)
+        hashed_offset, sha = _hashers.pop(upload_id, (0, None))
+        if sha is not None and hashed_offset == session['size']:
+            digest = sha.hexdigest()
+        else:
+            sha = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(UPLOAD_SETTINGS['chunk_size']), b''):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+
+        os.replace(part_path, dest_path)
+        os.remove(meta_path)
+    with _lock:
+        _session_locks.pop(upload_id, None)
+    return session, digest